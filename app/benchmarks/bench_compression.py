@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Compression benchmark for AgenticBot history
+Reports bytes saved and load-time impact of each session compression method
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_backends import JsonDirectoryBackend
+from history_codec import COMPRESSION_SUFFIXES
+
+TOPICS = ["weather in Atlanta", "busiest malls in the US", "quantum computing news", "cheap flights to Paris",
+          "python asyncio tutorial", "best pizza in Chicago", "stock market today", "how do vaccines work"]
+LOG_STEPS = [
+    ('agent_step', "🎯 Delegating to Search Agent"),
+    ('tool_call', "🔧 Calling web_search with query"),
+    ('tool_result', "📥 Received 5 search results"),
+    ('agent_step', "🧠 Summarizing results for the user"),
+]
+
+
+def make_session(session_id: str, exchanges: int, rng: random.Random) -> dict:
+    """Synthetic session shaped like the ones streamlit_app saves"""
+    chat_history, agentic_logs = [], []
+    for i in range(exchanges):
+        topic = rng.choice(TOPICS)
+        stamp = f"2025-07-11 12:{i % 60:02d}:00"
+        chat_history.append({'role': 'user', 'content': f"Tell me about {topic}", 'timestamp': stamp})
+        results = "".join(
+            f"{n}. <b>{topic.title()} result {n}</b><br>Snippet about {topic} number {rng.randint(0, 10**6)}<br><br>"
+            for n in range(1, 6)
+        )
+        chat_history.append({'role': 'assistant', 'content': f"Search results:<br><br>{results}",
+                             'image_data': None, 'timestamp': stamp})
+        for step_type, message in LOG_STEPS:
+            agentic_logs.append({'timestamp': f"[12:{i % 60:02d}:00] ", 'type': step_type, 'message': message,
+                                 'full_message': f"[12:{i % 60:02d}:00] {message}"})
+    return {
+        'session_id': session_id,
+        'created_at': "2025-07-11 12:00:00",
+        'updated_at': "2025-07-11 13:00:00",
+        'title': chat_history[0]['content'],
+        'chat_history': chat_history,
+        'agentic_logs': agentic_logs,
+        'metadata': {'total_messages': len(chat_history), 'tools_used': ['web_search']},
+    }
+
+
+def measure(sessions: list, compression, repeat: int) -> dict:
+    """Write sessions with one method, then time loading all of them"""
+    directory = tempfile.mkdtemp(prefix="bench_compression_")
+    try:
+        backend = JsonDirectoryBackend(directory, compression=compression)
+        start = time.perf_counter()
+        paths = [backend.write_session(session) for session in sessions]
+        write_seconds = time.perf_counter() - start
+        total_bytes = sum(os.path.getsize(path) for path in paths)
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for path in paths:
+                backend.read_session(path)
+            timings.append(time.perf_counter() - start)
+        return {
+            'method': compression or 'none',
+            'bytes': total_bytes,
+            'write_ms_per_session': write_seconds * 1000 / len(sessions),
+            'load_ms_per_session': min(timings) * 1000 / len(sessions),
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark compressed session storage")
+    parser.add_argument("--sessions", type=int, default=200, help="number of synthetic sessions")
+    parser.add_argument("--exchanges", type=int, default=20, help="question/answer pairs per session")
+    parser.add_argument("--history-dir", help="benchmark real sessions from this directory instead")
+    parser.add_argument("--repeat", type=int, default=3, help="load passes; the fastest is reported")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    if args.history_dir:
+        source = JsonDirectoryBackend(args.history_dir)
+        sessions = [s for s in (source.read_session(path) for path in source.session_files()) if s]
+    else:
+        rng = random.Random(42)
+        sessions = [make_session(f"bench{i:06d}", args.exchanges, rng) for i in range(args.sessions)]
+    if not sessions:
+        print("No sessions to benchmark.")
+        return
+
+    results = [measure(sessions, method, args.repeat) for method in [None] + list(COMPRESSION_SUFFIXES)]
+    baseline = results[0]
+    for result in results:
+        result['bytes_saved'] = baseline['bytes'] - result['bytes']
+        result['ratio'] = result['bytes'] / baseline['bytes']
+        result['load_slowdown'] = result['load_ms_per_session'] / baseline['load_ms_per_session']
+
+    if args.json:
+        print(json.dumps({'sessions': len(sessions), 'results': results}, indent=2))
+        return
+
+    print(f"{len(sessions)} sessions")
+    print(f"{'method':<8}{'bytes':>14}{'saved':>14}{'ratio':>8}{'write ms':>10}{'load ms':>10}{'load x':>8}")
+    for r in results:
+        print(f"{r['method']:<8}{r['bytes']:>14,}{r['bytes_saved']:>14,}{r['ratio']:>8.1%}"
+              f"{r['write_ms_per_session']:>10.3f}{r['load_ms_per_session']:>10.3f}{r['load_slowdown']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for AgenticBot history
+Times HistoryManager operations on synthetic histories of 1k / 10k / 100k sessions
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_backends import JsonDirectoryBackend
+from history_codec import encode_session
+from history_manager import HistoryManager
+
+WORDS = ("weather forecast atlanta mall shopping quantum computing news flights paris python asyncio tutorial "
+         "pizza chicago stock market vaccine immune research climate policy election results recipe pasta "
+         "marathon training budget travel museum history telescope galaxy battery electric vehicle garden "
+         "tomato guitar chords jazz piano startup funding interest rates mortgage coffee espresso").split()
+SEARCH_MODES = ('index', 'ranked')
+GENERATE_BATCH = 1000
+
+
+def percentiles(samples: list) -> dict:
+    """p50/p95/p99 (nearest rank), mean and max of timings in seconds, as milliseconds"""
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))] * 1000
+
+    return {
+        'n': len(ordered),
+        'p50_ms': rank(50),
+        'p95_ms': rank(95),
+        'p99_ms': rank(99),
+        'mean_ms': sum(ordered) * 1000 / len(ordered),
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class SyntheticHistory:
+    """Generates sessions shaped like the ones streamlit_app saves"""
+
+    def __init__(self, config: dict, seed: int = 42):
+        self.config = config
+        self.rng = random.Random(seed)
+        self.images = [bytes(self.rng.getrandbits(8) for _ in range(config['image_bytes'])) for _ in range(32)]
+        self.now = datetime(2025, 7, 11, 12, 0, 0)
+
+    def text(self) -> str:
+        words, length = [], 0
+        while length < self.config['message_length']:
+            word = self.rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        return " ".join(words)
+
+    def session(self, session_id, image_refs: list) -> dict:
+        created = self.now - timedelta(minutes=self.rng.randrange(2 * 365 * 24 * 60))
+        updated = created + timedelta(minutes=self.rng.randrange(1, 180))
+        chat_history = []
+        for i in range(self.config['exchanges']):
+            stamp = (created + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S")
+            chat_history.append({'role': 'user', 'content': self.text(), 'timestamp': stamp})
+            reply = {'role': 'assistant', 'content': self.text(), 'image_data': None, 'timestamp': stamp}
+            if image_refs and self.rng.random() < self.config['image_ratio']:
+                reply['image_ref'] = self.rng.choice(image_refs)
+            chat_history.append(reply)
+        return {
+            'session_id': session_id,
+            'created_at': created.strftime("%Y-%m-%d %H:%M:%S"),
+            'updated_at': updated.strftime("%Y-%m-%d %H:%M:%S"),
+            'title': chat_history[0]['content'][:50],
+            'chat_history': chat_history,
+            'agentic_logs': [{'timestamp': "[12:00:00] ", 'type': 'agent_step', 'message': "🎯 Delegating to Search Agent",
+                              'full_message': "[12:00:00] 🎯 Delegating to Search Agent"}],
+            'metadata': {
+                'total_messages': len(chat_history),
+                'tools_used': ['web_search'],
+                'image_refs': sorted({m['image_ref'] for m in chat_history if m.get('image_ref')}),
+            },
+        }
+
+    def populate(self, manager: HistoryManager, count: int):
+        """Write ``count`` sessions (plus duplicate files) straight to the backend's storage
+
+        JSON files are written directly rather than through ``save_session``
+        so that generating 100k sessions does not take longer than the
+        benchmark; the first list/search then pays for building the indexes,
+        which is reported as a cold timing.
+        """
+        image_refs = [manager.blob_store.put(data) for data in self.images] if self.config['image_ratio'] > 0 else []
+        backend = manager.backend
+        for first in range(0, count, GENERATE_BATCH):
+            batch = [self.session(f"bench{i:07d}", image_refs) for i in range(first, min(count, first + GENERATE_BATCH))]
+            if not isinstance(backend, JsonDirectoryBackend):
+                backend.write_sessions(batch)
+                continue
+            for session_data in batch:
+                self.write_file(backend, session_data)
+                if self.rng.random() < self.config['duplicate_ratio']:
+                    stale = dict(session_data, chat_history=session_data['chat_history'][:1],
+                                 updated_at=session_data['created_at'])
+                    self.write_file(backend, stale, offset=timedelta(seconds=1))
+
+    def write_file(self, backend: JsonDirectoryBackend, session_data: dict, offset: timedelta = timedelta()):
+        created = datetime.strptime(session_data['created_at'], "%Y-%m-%d %H:%M:%S") + offset
+        filename = f"chat_{created.strftime('%Y%m%d_%H%M%S')}_{session_data['session_id']}.json"
+        filepath = backend.layout_path(filename)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'wb') as f:
+            f.write(encode_session(session_data, backend.compression))
+        updated = datetime.strptime(session_data['updated_at'], "%Y-%m-%d %H:%M:%S").timestamp()
+        os.utime(filepath, (updated, updated))
+
+
+def timed(func, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def open_manager(directory: str, config: dict) -> HistoryManager:
+    options = {}
+    if config['backend'] == 'json':
+        options = {'journal': config['journal'], 'layout': config['layout']}
+    return HistoryManager(history_dir=directory, backend=config['backend'], **options)
+
+
+def run_size(count: int, config: dict) -> dict:
+    """Generate a history of ``count`` sessions and time every operation on it"""
+    directory = tempfile.mkdtemp(prefix=f"bench_history_{count}_", dir=config['workdir'])
+    rng = random.Random(7)
+    synthetic = SyntheticHistory(config)
+    operations = {}
+
+    def record(name, samples):
+        operations[name] = dict(percentiles(samples), peak_rss_mb=peak_rss_mb())
+
+    try:
+        start = time.perf_counter()
+        synthetic.populate(open_manager(directory, config), count)
+        generate_seconds = time.perf_counter() - start
+        samples = config['samples']
+
+        # A fresh manager pays for building the session index from the files
+        manager = open_manager(directory, config)
+        record('list_sessions_cold', [timed(manager.list_sessions)])
+        record('list_sessions', [timed(manager.list_sessions) for _ in range(samples)])
+        record('list_sessions_page', [timed(manager.list_sessions, limit=50) for _ in range(samples)])
+
+        queries = [" ".join(rng.sample(WORDS, rng.choice((1, 2)))) for _ in range(samples)]
+        for mode in config['search_modes']:
+            # The first search builds (or catches up) the search index
+            record(f'search_sessions_{mode}_cold', [timed(manager.search_sessions, queries[0], mode=mode, limit=20)])
+            record(f'search_sessions_{mode}', [timed(manager.search_sessions, query, mode=mode, limit=20)
+                                               for query in queries])
+
+        sessions = manager.list_sessions()
+        record('save_session_new', [timed(manager.save_session, synthetic.session(None, []))
+                                    for _ in range(samples)])
+        update_samples = []
+        for summary in rng.sample(list(sessions), min(samples, len(sessions))):
+            session_data = manager.load_session(summary['filepath'])
+            session_data['chat_history'].append({'role': 'user', 'content': synthetic.text(),
+                                                 'timestamp': "2025-07-11 12:00:00"})
+            update_samples.append(timed(manager.save_session, session_data))
+        record('save_session_update', update_samples)
+
+        for export_format in ('json', 'txt'):
+            export_samples = []
+            for summary in rng.sample(list(sessions), min(samples, len(sessions))):
+                start = time.perf_counter()
+                export_path = manager.export_session(summary['filepath'], export_format)
+                export_samples.append(time.perf_counter() - start)
+                if export_path:
+                    os.remove(export_path)
+            record(f'export_session_{export_format}', export_samples)
+
+        # Runs once: afterwards there is nothing left to clean up
+        record('cleanup_duplicate_sessions', [timed(manager.cleanup_duplicate_sessions)])
+
+        disk_bytes = sum(os.path.getsize(os.path.join(root, name))
+                         for root, _, names in os.walk(directory) for name in names)
+        return {
+            'sessions': count,
+            'generate_seconds': generate_seconds,
+            'disk_bytes': disk_bytes,
+            'peak_rss_mb': peak_rss_mb(),
+            'operations': operations,
+        }
+    finally:
+        if not config['keep']:
+            shutil.rmtree(directory, ignore_errors=True)
+        else:
+            print(f"Kept {directory}", file=sys.stderr)
+
+
+def run_size_quietly(count: int, config: dict) -> dict:
+    """run_size with the manager's progress messages kept off stdout (which may carry the JSON)"""
+    with redirect_stdout(sys.stderr):
+        return run_size(count, config)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HistoryManager operations as the history grows")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated session counts")
+    parser.add_argument("--backend", default="json", choices=["json", "sqlite"], help="storage backend")
+    parser.add_argument("--layout", default="flat", choices=["flat", "date"], help="JSON directory layout")
+    parser.add_argument("--journal", action="store_true", help="journal JSON saves")
+    parser.add_argument("--exchanges", type=int, default=5, help="question/answer pairs per session")
+    parser.add_argument("--message-length", type=int, default=200, help="approximate characters per message")
+    parser.add_argument("--image-ratio", type=float, default=0.05, help="fraction of replies with an image")
+    parser.add_argument("--image-bytes", type=int, default=20000, help="size of each synthetic image")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.01,
+                        help="fraction of JSON sessions with a stale duplicate file")
+    parser.add_argument("--search-modes", default=",".join(SEARCH_MODES), help="comma-separated search modes")
+    parser.add_argument("--samples", type=int, default=50, help="timed calls per operation")
+    parser.add_argument("--workdir", default=None, help="where to generate histories (default: system temp)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated histories")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    config = {
+        'backend': args.backend,
+        'layout': args.layout,
+        'journal': args.journal,
+        'exchanges': args.exchanges,
+        'message_length': args.message_length,
+        'image_ratio': args.image_ratio,
+        'image_bytes': args.image_bytes,
+        'duplicate_ratio': args.duplicate_ratio,
+        'search_modes': [mode for mode in args.search_modes.split(",") if mode],
+        'samples': args.samples,
+        'workdir': args.workdir,
+        'keep': args.keep,
+    }
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    results = []
+    for count in sizes:
+        print(f"Benchmarking {count:,} sessions...", file=sys.stderr)
+        # One process per size so peak RSS is measured per size
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            results.append(pool.submit(run_size_quietly, count, config).result())
+
+    report = {
+        'benchmark': 'history',
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {key: value for key, value in config.items() if key not in ('workdir', 'keep')},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for result in results:
+        print(f"\n{result['sessions']:,} sessions  (generated in {result['generate_seconds']:.1f}s, "
+              f"{result['disk_bytes'] / 1e6:.1f} MB on disk, peak RSS {result['peak_rss_mb'] or 0:.0f} MB)")
+        print(f"{'operation':<32}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name, stats in result['operations'].items():
+            print(f"{name:<32}{stats['n']:>5}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for AgenticBot chat state
+Compares sessions held as plain dicts with the slotted records of history_records
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_backends import JsonDirectoryBackend
+from history_codec import decode_session, encode_session
+from history_records import logs_from_dicts, messages_from_dicts
+from bench_compression import make_session
+
+
+def retained_bytes(build) -> int:
+    """Bytes still allocated after ``build()`` while its result is kept alive"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return after - before
+
+
+def measure(sessions: list) -> dict:
+    """Memory of every session's messages and logs as dicts versus records
+
+    Sessions are decoded from their stored bytes first, as the app would
+    load them, so the dict figures include json's per-object overhead.
+    """
+    encoded = [encode_session(session) for session in sessions]
+
+    def as_dicts():
+        return [(s.get('chat_history', []), s.get('agentic_logs', [])) for s in map(decode_session, encoded)]
+
+    def as_records():
+        return [(messages_from_dicts(s.get('chat_history', [])), logs_from_dicts(s.get('agentic_logs', [])))
+                for s in map(decode_session, encoded)]
+
+    messages = sum(len(s.get('chat_history', [])) for s in sessions)
+    logs = sum(len(s.get('agentic_logs', [])) for s in sessions)
+    dict_bytes = retained_bytes(as_dicts)
+    record_bytes = retained_bytes(as_records)
+    return {
+        'sessions': len(sessions),
+        'messages': messages,
+        'log_entries': logs,
+        'dict_bytes': dict_bytes,
+        'record_bytes': record_bytes,
+        'bytes_saved_per_session': (dict_bytes - record_bytes) / len(sessions),
+        'dict_bytes_per_session': dict_bytes / len(sessions),
+        'record_bytes_per_session': record_bytes / len(sessions),
+        'ratio': record_bytes / dict_bytes if dict_bytes else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory of chat state as dicts versus slotted records")
+    parser.add_argument("--sessions", type=int, default=100, help="number of synthetic sessions")
+    parser.add_argument("--exchanges", type=int, default=50, help="question/answer pairs per session")
+    parser.add_argument("--history-dir", help="measure real sessions from this directory instead")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    if args.history_dir:
+        source = JsonDirectoryBackend(args.history_dir)
+        sessions = [s for s in (source.read_session(path) for path in source.session_files()) if s]
+    else:
+        rng = random.Random(42)
+        sessions = [make_session(f"bench{i:06d}", args.exchanges, rng) for i in range(args.sessions)]
+    if not sessions:
+        print("No sessions to benchmark.")
+        return
+
+    result = measure(sessions)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{result['sessions']} sessions, {result['messages']:,} messages, {result['log_entries']:,} log entries")
+    print(f"{'':<10}{'total bytes':>14}{'per session':>14}")
+    print(f"{'dicts':<10}{result['dict_bytes']:>14,}{result['dict_bytes_per_session']:>14,.0f}")
+    print(f"{'records':<10}{result['record_bytes']:>14,}{result['record_bytes_per_session']:>14,.0f}")
+    print(f"Saved {result['bytes_saved_per_session']:,.0f} bytes per session ({1 - result['ratio']:.1%})")
+
+
+if __name__ == "__main__":
+    main()
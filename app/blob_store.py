@@ -0,0 +1,108 @@
+"""
+Content-addressed blob store for AgenticBot
+Keeps generated images out of session JSON; messages reference them by digest
+"""
+
+import base64
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Iterator, Optional, Set
+
+from history_io import atomic_write
+
+REF_PREFIX = "sha256:"
+
+
+class BlobStore:
+    """Stores each distinct blob once under its SHA-256 digest
+
+    Blobs live at ``<root>/<first two hex chars>/<digest>``.  References have
+    the form ``sha256:<digest>``; identical images map to the same reference,
+    so they are stored once no matter how many messages use them.
+    """
+
+    def __init__(self, root: str, cache_size: int = 16):
+        self.root = root
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+
+    @staticmethod
+    def is_ref(value) -> bool:
+        """Check whether a value looks like a blob reference"""
+        return isinstance(value, str) and value.startswith(REF_PREFIX)
+
+    def path_for(self, ref: str) -> str:
+        """Filesystem path of a blob reference"""
+        digest = ref[len(REF_PREFIX):]
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, data: bytes) -> str:
+        """Store bytes (if not already present) and return their reference"""
+        ref = REF_PREFIX + hashlib.sha256(data).hexdigest()
+        path = self.path_for(ref)
+        try:
+            # Storing it again restarts the blob's gc grace period
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, data)
+        return ref
+
+    def put_base64(self, image_data: str) -> str:
+        """Store base64-encoded data such as the image_data returned by generate_image"""
+        return self.put(base64.b64decode(image_data))
+
+    def get(self, ref: str) -> Optional[bytes]:
+        """Load a blob, keeping the most recently used ones in memory"""
+        if ref in self._cache:
+            self._cache.move_to_end(ref)
+            return self._cache[ref]
+        try:
+            with open(self.path_for(ref), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        self._cache[ref] = data
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return data
+
+    def exists(self, ref: str) -> bool:
+        """Check whether a blob is stored"""
+        return os.path.exists(self.path_for(ref))
+
+    def iter_refs(self) -> Iterator[str]:
+        """Yield the reference of every stored blob"""
+        if not os.path.isdir(self.root):
+            return
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if len(shard) != 2 or not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if not name.startswith("."):
+                    yield REF_PREFIX + name
+
+    def gc(self, referenced: Set[str], grace_seconds: float = 3600) -> int:
+        """Delete blobs no session references
+
+        Blobs stored (or stored again) within ``grace_seconds`` are kept: an
+        image is stored as soon as it is generated, before the session
+        referencing it is saved.
+        """
+        cutoff = time.time() - grace_seconds
+        removed = 0
+        for ref in list(self.iter_refs()):
+            if ref in referenced:
+                continue
+            path = self.path_for(ref)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    self._cache.pop(ref, None)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
@@ -19,14 +19,10 @@ def main():
     # Initialize history manager
     history_manager = HistoryManager()
     
-    # List current sessions before cleanup
-    sessions_before = history_manager.list_sessions()
-    print(f"📊 Sessions found: {len(sessions_before)}")
-    
-    # Get all files count before cleanup
-    import glob
-    pattern = os.path.join(history_manager.history_dir, "chat_*.json")
-    files_before = len(glob.glob(pattern))
+    # Count files per session from their headers (no session bodies are loaded)
+    session_counts = history_manager.session_file_counts()
+    files_before = sum(session_counts.values())
+    print(f"📊 Sessions found: {len(session_counts)}")
     print(f"📁 Total files: {files_before}")
     
     if files_before == 0:
@@ -35,13 +31,6 @@ def main():
     
     # Show some examples of duplicates
     print("\n🔍 Analyzing for duplicates...")
-    session_counts = {}
-    for session in sessions_before:
-        session_id = session['session_id']
-        if session_id not in session_counts:
-            session_counts[session_id] = 0
-        session_counts[session_id] += 1
-    
     duplicates = {sid: count for sid, count in session_counts.items() if count > 1}
     
     if duplicates:
@@ -55,7 +44,7 @@ def main():
         return
     
     # Ask for confirmation
-    print(f"\n🗑️  This will delete {files_before - len(sessions_before)} duplicate files")
+    print(f"\n🗑️  This will delete {files_before - len(session_counts)} duplicate files")
     response = input("Continue? (y/N): ").strip().lower()
     
     if response != 'y':
@@ -67,15 +56,15 @@ def main():
     deleted_count = history_manager.cleanup_duplicate_sessions()
     
     # Get counts after cleanup
-    sessions_after = history_manager.list_sessions()
-    files_after = len(glob.glob(pattern))
+    counts_after = history_manager.session_file_counts()
+    files_after = sum(counts_after.values())
     
     # Report results
     print("\n📊 Cleanup Results:")
     print(f"   Files before: {files_before}")
     print(f"   Files after: {files_after}")
     print(f"   Files deleted: {deleted_count}")
-    print(f"   Unique sessions: {len(sessions_after)}")
+    print(f"   Unique sessions: {len(counts_after)}")
     
     if deleted_count > 0:
         print(f"\n✅ Successfully cleaned up {deleted_count} duplicate files!")
@@ -83,6 +72,11 @@ def main():
     else:
         print("\n✅ No duplicates found or removed.")
     
+    # Remove images no remaining session references
+    removed_images = history_manager.gc_blobs()
+    if removed_images > 0:
+        print(f"🖼️  Removed {removed_images} unreferenced images")
+    
     print("\n🎉 Cleanup complete! You can now use AgenticBot without duplicate issues.")
 
 if __name__ == "__main__":
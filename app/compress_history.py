@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Compression migration for AgenticBot history
+Run this script to convert an existing history directory to (or back from) compressed session files
+"""
+
+import argparse
+import sys
+import os
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from history_codec import COMPRESSION_SUFFIXES
+from history_manager import HistoryManager
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert AgenticBot session files to a compressed format")
+    parser.add_argument("--history-dir", default="history", help="history directory to convert")
+    parser.add_argument("--method", default="gzip", choices=["none"] + list(COMPRESSION_SUFFIXES),
+                        help="compression to convert to ('none' restores plain JSON)")
+    args = parser.parse_args()
+
+    print("🗜️  AgenticBot History Compression Tool")
+    print("=" * 40)
+
+    history_manager = HistoryManager(history_dir=args.history_dir, compression=args.method)
+    print(f"📁 Converting {args.history_dir} to: {args.method}")
+
+    report = history_manager.convert_sessions()
+    if report['converted'] == 0:
+        print("✅ All session files already use this format. Nothing to convert.")
+        return
+
+    saved = report['bytes_before'] - report['bytes_after']
+    ratio = report['bytes_after'] / report['bytes_before'] if report['bytes_before'] else 1.0
+    print("\n📊 Conversion Results:")
+    print(f"   Files converted: {report['converted']}")
+    print(f"   Size before: {report['bytes_before']:,} bytes")
+    print(f"   Size after: {report['bytes_after']:,} bytes ({ratio:.1%})")
+    print(f"   Bytes saved: {saved:,}")
+    print("\n🎉 Conversion complete! Start the app with the same compression setting to keep new saves compressed.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Bulk export tool for AgenticBot history
+Run this script to stream all (or selected) sessions to an NDJSON file or a tar bundle
+"""
+
+import argparse
+import sys
+import os
+from datetime import datetime
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from history_export import EXPORT_FORMATS, SessionExporter
+from history_manager import HistoryManager
+
+def parse_date(value: str) -> datetime:
+    """Accept "YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS" """
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"invalid date: {value!r}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export AgenticBot sessions in bulk")
+    parser.add_argument("output", help="file to write ('-' for stdout)")
+    parser.add_argument("--format", default="ndjson", choices=EXPORT_FORMATS,
+                        help="ndjson: one line per message; tar: one JSON file per session")
+    parser.add_argument("--history-dir", default="history", help="history directory to export")
+    parser.add_argument("--backend", default="json", choices=["json", "sqlite"], help="storage backend")
+    parser.add_argument("--since", type=parse_date, help="only sessions updated on or after this date")
+    parser.add_argument("--until", type=parse_date, help="only sessions created on or before this date")
+    parser.add_argument("--session", action="append", dest="session_ids", help="session id to export (repeatable)")
+    parser.add_argument("--no-archived", action="store_true", help="skip archived sessions")
+    parser.add_argument("--gzip", action="store_true", help="gzip the tar bundle")
+    parser.add_argument("--workers", type=int, default=1, help="encode sessions on this many worker processes")
+    args = parser.parse_args()
+
+    history_manager = HistoryManager(history_dir=args.history_dir, backend=args.backend)
+    exporter = SessionExporter(history_manager, since=args.since, until=args.until, session_ids=args.session_ids,
+                               include_archived=not args.no_archived, workers=args.workers)
+
+    to_stdout = args.output == "-"
+    out = sys.stdout.buffer if to_stdout else open(args.output, "wb")
+    try:
+        if args.format == "tar":
+            stats = exporter.write_tar(out, compression="gz" if args.gzip else None)
+        else:
+            stats = exporter.write_ndjson(out)
+    finally:
+        if not to_stdout:
+            out.close()
+
+    # Keep stdout clean for the export itself
+    report = sys.stderr if to_stdout else sys.stdout
+    print("📦 AgenticBot History Export", file=report)
+    print(f"   Sessions exported: {stats['sessions']}", file=report)
+    print(f"   Messages exported: {stats['messages']}", file=report)
+    print(f"   Bytes written: {stats['bytes']:,}", file=report)
+    if stats['skipped']:
+        print(f"⚠️  Sessions skipped after errors: {stats['skipped']}", file=report)
+
+if __name__ == "__main__":
+    main()
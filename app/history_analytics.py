@@ -0,0 +1,304 @@
+"""
+Usage analytics for AgenticBot history
+Rollups maintained incrementally on every save, so statistics never rescan the history
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from history_io import atomic_write, path_lock
+
+# Replies the app writes when a tool or the model failed
+ERROR_PREFIXES = ("❌", "Search failed:", "Scraping failed:", "Research failed:", "<b>Image Generation Failed</b>")
+
+# Upper bounds (seconds) of the session duration buckets; the last one is open-ended
+DURATION_BUCKETS = ((60, "< 1 min"), (300, "1-5 min"), (900, "5-15 min"), (3600, "15-60 min"),
+                    (10800, "1-3 h"), (86400, "3-24 h"), (None, "> 1 day"))
+
+# Log phrases older sessions (saved without tool_events) used to name the agent that ran
+LEGACY_TOOL_PHRASES = (('search agent', 'web_search'), ('web extraction agent', 'web_scraping'),
+                       ('research agent', 'deep_research'), ('image generation agent', 'image_generation'))
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """Parse a "YYYY-MM-DD HH:MM:SS" session timestamp (fromisoformat is much cheaper than strptime)"""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def session_seconds(session_data: Dict) -> Optional[float]:
+    """Seconds between a session's creation and its last update"""
+    created = parse_timestamp(session_data.get('created_at'))
+    updated = parse_timestamp(session_data.get('updated_at'))
+    if created is None or updated is None:
+        return None
+    return max(0.0, (updated - created).total_seconds())
+
+
+def duration_bucket(seconds: float) -> str:
+    for limit, label in DURATION_BUCKETS:
+        if limit is None or seconds < limit:
+            return label
+
+
+def tool_counts(session_data: Dict) -> Dict[str, int]:
+    """Tool invocations of a session
+
+    Sessions record each invocation in ``tool_events``; for older ones the
+    tools are inferred from the agentic log, once per tool.
+    """
+    counts: Dict[str, int] = {}
+    events = session_data.get('tool_events')
+    if events:
+        for event in events:
+            tool = event.get('tool')
+            if tool:
+                counts[tool] = counts.get(tool, 0) + 1
+        return counts
+    for log in session_data.get('agentic_logs', []):
+        message = (log.get('message') or '').lower()
+        for phrase, tool in LEGACY_TOOL_PHRASES:
+            if phrase in message:
+                counts[tool] = 1
+                break
+    return counts
+
+
+def is_error_reply(message: Dict) -> bool:
+    return message.get('role') == 'assistant' and (message.get('content') or '').startswith(ERROR_PREFIXES)
+
+
+def build_fact(session_data: Dict) -> Dict:
+    """A session's contribution to the rollups"""
+    days: Dict[str, int] = {}
+    replies = errors = 0
+    fallback_day = (session_data.get('created_at') or '')[:10]
+    for message in session_data.get('chat_history', []):
+        day = (message.get('timestamp') or '')[:10] or fallback_day
+        if day:
+            days[day] = days.get(day, 0) + 1
+        if message.get('role') == 'assistant':
+            replies += 1
+            if is_error_reply(message):
+                errors += 1
+    return {
+        'updated_at': session_data.get('updated_at'),
+        'messages': len(session_data.get('chat_history', [])),
+        'replies': replies,
+        'errors': errors,
+        'days': days,
+        'tools': tool_counts(session_data),
+        'seconds': session_seconds(session_data),
+    }
+
+
+class UsageAnalytics:
+    """Cross-session usage rollups persisted as a snapshot plus an append-only log
+
+    Each session contributes one small *fact* (message counts per day,
+    tool invocations, error replies, duration).  Saving a session replaces
+    its fact and adjusts the rollups by the difference, so updates cost the
+    size of one session and ``summary`` never reads session files.  Like
+    the search index, the log is shared by every process and compacted
+    into the snapshot every ``COMPACT_AFTER`` records.
+    """
+
+    SNAPSHOT_FILENAME = ".analytics.json"
+    LOG_FILENAME = ".analytics.log"
+    VERSION = 1
+    COMPACT_AFTER = 500  # log records before the snapshot is rewritten
+
+    def __init__(self, history_dir: str):
+        self.history_dir = history_dir
+        self.path = os.path.join(history_dir, self.SNAPSHOT_FILENAME)
+        self.log_path = os.path.join(history_dir, self.LOG_FILENAME)
+        self.facts: Dict[str, Dict] = {}
+        self._reset()
+        self._stamp = None
+
+    # --- Persistence ---
+
+    def load(self):
+        """Bring the rollups up to date with the files on disk"""
+        try:
+            stat = os.stat(self.path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stamp = None
+
+        if stamp != self._stamp:
+            self._reset()
+            if stamp is not None:
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    if data.get('version') == self.VERSION:
+                        for session_id, fact in data.get('facts', {}).items():
+                            self._set_fact(session_id, fact)
+                except Exception as e:
+                    print(f"Error loading analytics {self.path}: {e}")
+            self._stamp = stamp
+        self._replay_log()
+
+    def _reset(self):
+        self.facts = {}
+        self.totals = {'sessions': 0, 'messages': 0, 'replies': 0, 'errors': 0, 'timed_sessions': 0, 'seconds': 0.0}
+        self.tools: Dict[str, int] = {}
+        self.messages_per_day: Dict[str, int] = {}
+        self.durations: Dict[str, int] = {label: 0 for _, label in DURATION_BUCKETS}
+        self._log_offset = 0
+        self._log_records = 0
+
+    def _replay_log(self):
+        """Apply log records appended since the last read (by any process)"""
+        try:
+            size = os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            return
+        if size < self._log_offset:
+            # Log was compacted by another process; reload from scratch
+            self._stamp = None
+            self.load()
+            return
+        if size == self._log_offset:
+            return
+
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._log_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partially written record, pick it up next time
+                self._log_offset += len(line)
+                self._log_records += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('v') == self.VERSION:
+                    self._set_fact(record['sid'], record.get('fact'))
+
+    def _append_log(self, session_id: str, fact: Optional[Dict]):
+        line = json.dumps({'sid': session_id, 'fact': fact, 'v': self.VERSION}, ensure_ascii=False,
+                          separators=(',', ':')) + "\n"
+        # Appends share the log lock; compaction takes it exclusively
+        with path_lock(self.log_path, shared=True):
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        # Replaying (rather than applying directly) also picks up other processes' records
+        self._replay_log()
+        if self._log_records >= self.COMPACT_AFTER:
+            self.compact()
+
+    def compact(self):
+        """Fold the update log into a fresh snapshot"""
+        with path_lock(self.log_path):
+            self.load()
+            data = json.dumps({'version': self.VERSION, 'facts': self.facts}, ensure_ascii=False, separators=(',', ':'))
+            atomic_write(self.path, data, fsync=False)
+            open(self.log_path, 'w').close()
+            stat = os.stat(self.path)
+            self._stamp = (stat.st_mtime_ns, stat.st_size)
+            self._log_offset = 0
+            self._log_records = 0
+
+    # --- Rollups ---
+
+    def _apply(self, fact: Dict, sign: int):
+        totals = self.totals
+        totals['sessions'] += sign
+        for key in ('messages', 'replies', 'errors'):
+            totals[key] += sign * fact[key]
+        for day, count in fact['days'].items():
+            self._bump(self.messages_per_day, day, sign * count)
+        for tool, count in fact['tools'].items():
+            self._bump(self.tools, tool, sign * count)
+        if fact['seconds'] is not None:
+            totals['timed_sessions'] += sign
+            totals['seconds'] += sign * fact['seconds']
+            self.durations[duration_bucket(fact['seconds'])] += sign
+
+    @staticmethod
+    def _bump(counter: Dict[str, int], key: str, delta: int):
+        value = counter.get(key, 0) + delta
+        if value:
+            counter[key] = value
+        else:
+            counter.pop(key, None)
+
+    def _set_fact(self, session_id: str, fact: Optional[Dict]):
+        previous = self.facts.pop(session_id, None)
+        if previous is not None:
+            self._apply(previous, -1)
+        if fact is not None:
+            self.facts[session_id] = fact
+            self._apply(fact, 1)
+
+    # --- Updates ---
+
+    def add_session(self, session_data: Dict):
+        """Count (or recount) a saved session"""
+        self.load()
+        session_id = str(session_data.get('session_id'))
+        fact = build_fact(session_data)
+        self._set_fact(session_id, fact)
+        self._append_log(session_id, fact)
+
+    def remove_session(self, session_id):
+        """Stop counting a deleted session"""
+        self.load()
+        session_id = str(session_id)
+        if session_id in self.facts:
+            self._set_fact(session_id, None)
+            self._append_log(session_id, None)
+
+    def sync(self, sessions: List[Dict], loader: Callable[[str], Optional[Dict]]) -> int:
+        """Count sessions saved before analytics existed (or by other tools); drop missing ones
+
+        This reads every session whose ``updated_at`` differs from its fact,
+        so it is meant for a one-off backfill, not for every query.  Returns
+        the number of sessions counted.
+        """
+        self.load()
+        live = set()
+        for session_meta in sessions:
+            session_id = str(session_meta['session_id'])
+            live.add(session_id)
+            fact = self.facts.get(session_id)
+            if fact is not None and fact['updated_at'] == session_meta['updated_at']:
+                continue
+            session_data = loader(session_meta['filepath'])
+            if session_data:
+                self.add_session(session_data)
+        for session_id in [key for key in self.facts if key not in live]:
+            self._set_fact(session_id, None)
+            self._append_log(session_id, None)
+        return len(self.facts)
+
+    # --- Queries ---
+
+    def summary(self, days: Optional[int] = 30) -> Dict:
+        """Current rollups; costs the same however many sessions there are
+
+        ``messages_per_day`` holds the most recent ``days`` days with
+        activity (all of them with ``days=None``).
+        """
+        self.load()
+        totals = self.totals
+        recent_days = sorted(self.messages_per_day)
+        if days is not None:
+            recent_days = recent_days[-days:]
+        return {
+            'sessions': totals['sessions'],
+            'messages': totals['messages'],
+            'replies': totals['replies'],
+            'errors': totals['errors'],
+            'error_rate': totals['errors'] / totals['replies'] if totals['replies'] else 0.0,
+            'mean_session_seconds': totals['seconds'] / totals['timed_sessions'] if totals['timed_sessions'] else 0.0,
+            'tools': dict(sorted(self.tools.items(), key=lambda item: (-item[1], item[0]))),
+            'messages_per_day': {day: self.messages_per_day[day] for day in recent_days},
+            'session_durations': dict(self.durations),
+        }
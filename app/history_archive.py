@@ -0,0 +1,277 @@
+"""
+Archive bundles for cold AgenticBot sessions
+Old sessions are packed into compressed bundles that stay listable, searchable and loadable
+"""
+
+import json
+import os
+import tempfile
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from history_index import SUMMARY_FIELDS, SessionPage, build_session_summary, decode_cursor, encode_cursor, recency_key
+from history_io import FileLock, atomic_write, path_lock
+from history_pack import PackReader, write_pack
+
+ARCHIVE_DIRNAME = "archive"
+LOCATOR_SEPARATOR = "#"
+
+
+class ArchiveStore:
+    """Read-only bundles of archived sessions plus a manifest of their summaries
+
+    Each bundle is a pack (see history_pack) opened with mmap, so one
+    session, or one range of its messages, is decoded without reading the
+    rest of the bundle.  The manifest maps session ids to their
+    bundle and sidebar summary, which is all that listing and search need.
+    Archived sessions are addressed by locators of the form
+    ``<bundle path>#<session_id>``.
+    """
+
+    MANIFEST_FILENAME = "manifest.json"
+    BUNDLE_PREFIX = "bundle_"
+    BUNDLE_SUFFIX = ".pack"
+    VERSION = 1
+    # Open pack readers kept per store; bundles never change once written
+    MAX_OPEN_PACKS = 8
+
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest_path = os.path.join(root, self.MANIFEST_FILENAME)
+        self.sessions: Dict[str, Dict] = {}
+        self._stamp: Optional[Tuple[int, int]] = None
+        # Recency keys of the manifest's sessions, oldest first; rebuilt after it changes
+        self._order: Optional[List[tuple]] = None
+        self._packs: "OrderedDict[str, PackReader]" = OrderedDict()
+        self._packs_lock = threading.Lock()
+
+    # --- Manifest ---
+
+    def load(self):
+        """Load the manifest if it changed since it was last read"""
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            self.sessions, self._stamp, self._order = {}, None, None
+            return
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.sessions = data.get('sessions', {}) if data.get('version') == self.VERSION else {}
+        except Exception as e:
+            print(f"Error loading archive manifest {self.manifest_path}: {e}")
+            self.sessions = {}
+        self._stamp = stamp
+        self._order = None
+
+    def locked(self) -> FileLock:
+        """Lock to hold around manifest load/modify/save"""
+        return path_lock(self.manifest_path)
+
+    def save(self):
+        """Write the manifest atomically"""
+        os.makedirs(self.root, exist_ok=True)
+        data = json.dumps({'version': self.VERSION, 'sessions': self.sessions}, ensure_ascii=False, separators=(',', ':'))
+        atomic_write(self.manifest_path, data)
+        stat = os.stat(self.manifest_path)
+        self._stamp = (stat.st_mtime_ns, stat.st_size)
+        self._order = None
+
+    # --- Locators ---
+
+    def locator(self, bundle: str, session_id: str) -> str:
+        """Locator of an archived session"""
+        return f"{os.path.join(self.root, bundle)}{LOCATOR_SEPARATOR}{session_id}"
+
+    def parse_locator(self, locator: str) -> Optional[Tuple[str, str]]:
+        """(bundle, session_id) of an archive locator, or None for other locators"""
+        if not isinstance(locator, str) or LOCATOR_SEPARATOR not in locator:
+            return None
+        path, session_id = locator.rsplit(LOCATOR_SEPARATOR, 1)
+        bundle = os.path.basename(path)
+        if not bundle.startswith(self.BUNDLE_PREFIX):
+            return None
+        return bundle, session_id
+
+    def is_locator(self, locator: str) -> bool:
+        """Check whether a locator points into the archive"""
+        return self.parse_locator(locator) is not None
+
+    # --- Bundles ---
+
+    def _pack(self, bundle: str) -> PackReader:
+        """Shared reader of a pack bundle, opened on first use"""
+        with self._packs_lock:
+            reader = self._packs.get(bundle)
+            if reader is not None:
+                self._packs.move_to_end(bundle)
+                return reader
+        reader = PackReader(os.path.join(self.root, bundle))
+        with self._packs_lock:
+            self._packs[bundle] = reader
+            # Evicted readers are unmapped once in-flight reads drop them
+            while len(self._packs) > self.MAX_OPEN_PACKS:
+                self._packs.popitem(last=False)
+        return reader
+
+    def _write_bundle(self, sessions: List[Dict]) -> str:
+        """Write sessions to a new pack bundle and return its name"""
+        os.makedirs(self.root, exist_ok=True)
+        bundle = f"{self.BUNDLE_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}{self.BUNDLE_SUFFIX}"
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{bundle}.", suffix=".tmp", dir=self.root)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write_pack(f, sessions)
+            os.replace(tmp_path, os.path.join(self.root, bundle))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return bundle
+
+    def _delete_bundle(self, bundle: str):
+        """Remove a bundle no manifest entry refers to any more"""
+        with self._packs_lock:
+            self._packs.pop(bundle, None)
+        try:
+            os.remove(os.path.join(self.root, bundle))
+        except FileNotFoundError:
+            pass
+
+    def add(self, sessions: List[Dict], replace: bool = True) -> Optional[str]:
+        """Pack fully loaded sessions into a new bundle and return its name
+
+        With ``replace=False`` sessions that are already archived keep
+        their existing entry (``prune`` drops the bundle if that leaves it
+        unused).
+        """
+        if not sessions:
+            return None
+        bundle = self._write_bundle(sessions)
+        path = os.path.join(self.root, bundle)
+
+        with self.locked():
+            self.load()
+            for session_data in sessions:
+                if not replace and str(session_data['session_id']) in self.sessions:
+                    continue
+                summary = build_session_summary(session_data, path)
+                entry = {field: summary[field] for field in SUMMARY_FIELDS}
+                entry['bundle'] = bundle
+                self.sessions[str(session_data['session_id'])] = entry
+            self.save()
+        return bundle
+
+    def read(self, locator: str) -> Optional[Dict]:
+        """Load one archived session without unpacking the rest of its bundle"""
+        parsed = self.parse_locator(locator)
+        if parsed is None:
+            return None
+        bundle, session_id = parsed
+        try:
+            return self._pack(bundle).read_session(session_id)
+        except Exception as e:
+            print(f"Error loading archived session {locator}: {e}")
+            return None
+
+    def read_messages(self, locator: str, start: int = 0, stop: Optional[int] = None) -> Optional[List[Dict]]:
+        """Load messages ``start:stop`` of an archived session, reading only their blocks of the bundle"""
+        parsed = self.parse_locator(locator)
+        if parsed is None:
+            return None
+        bundle, session_id = parsed
+        try:
+            return self._pack(bundle).read_messages(session_id, start, stop)
+        except Exception as e:
+            print(f"Error loading archived messages {locator}: {e}")
+            return None
+
+    def header(self, locator: str) -> Optional[Dict]:
+        """Manifest summary of an archived session"""
+        parsed = self.parse_locator(locator)
+        if parsed is None:
+            return None
+        self.load()
+        return self.sessions.get(parsed[1])
+
+    def iter_messages(self, locator: str) -> Iterator[Dict]:
+        """Stream one archived session's messages straight out of its bundle"""
+        parsed = self.parse_locator(locator)
+        if parsed is None:
+            return
+        bundle, session_id = parsed
+        yield from self._pack(bundle).iter_messages(session_id)
+
+    def find(self, session_id) -> Optional[str]:
+        """Locator of an archived session, if it is archived"""
+        self.load()
+        entry = self.sessions.get(str(session_id))
+        return self.locator(entry['bundle'], str(session_id)) if entry else None
+
+    def remove(self, session_id, bundle: Optional[str] = None) -> bool:
+        """Drop a session from the archive; bundles left empty are deleted
+
+        With ``bundle`` the session is only dropped while its entry still
+        points into that bundle.
+        """
+        with self.locked():
+            self.load()
+            entry = self.sessions.get(str(session_id))
+            if entry is None or (bundle is not None and entry['bundle'] != bundle):
+                return False
+            del self.sessions[str(session_id)]
+            self.save()
+            if not any(other['bundle'] == entry['bundle'] for other in self.sessions.values()):
+                self._delete_bundle(entry['bundle'])
+        return True
+
+    def prune(self, bundle: str) -> bool:
+        """Delete a bundle if no manifest entry refers to it; returns whether it was deleted"""
+        with self.locked():
+            self.load()
+            if any(entry['bundle'] == bundle for entry in self.sessions.values()):
+                return False
+            self._delete_bundle(bundle)
+        return True
+
+    def _summary(self, session_id: str, entry: Dict) -> Dict:
+        summary = {
+            'filepath': self.locator(entry['bundle'], session_id),
+            'filename': entry['bundle'],
+            'archived': True,
+        }
+        summary.update({field: entry[field] for field in SUMMARY_FIELDS})
+        return summary
+
+    def summary(self, session_id) -> Optional[Dict]:
+        """Sidebar summary of one archived session, if it is archived"""
+        self.load()
+        entry = self.sessions.get(str(session_id))
+        return self._summary(str(session_id), entry) if entry else None
+
+    def page(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> SessionPage:
+        """One page of archived summaries, most recently updated first, starting after ``cursor``"""
+        self.load()
+        if self._order is None:
+            self._order = sorted(recency_key(entry) for entry in self.sessions.values())
+        end = len(self._order)
+        if cursor is not None:
+            end = bisect_left(self._order, tuple(decode_cursor(cursor)))
+        start = 0 if limit is None else max(0, end - limit)
+        heads = self._order[start:end][::-1]
+
+        page = SessionPage(self._summary(session_id, self.sessions[session_id]) for _, session_id in heads)
+        if start > 0 and heads:
+            page.next_cursor = encode_cursor(*heads[-1])
+        return page
+
+    def summaries(self) -> List[Dict]:
+        """Sidebar summaries of every archived session, most recently updated first"""
+        return self.page()
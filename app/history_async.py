@@ -0,0 +1,105 @@
+"""
+Async front-end for AgenticBot history
+Runs HistoryManager calls on a bounded thread pool so an asyncio loop never waits on disk
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional
+
+from history_index import SessionPage
+
+
+class AsyncHistoryManager:
+    """Awaitable save/load/list/search/delete on top of a HistoryManager
+
+    Calls run on a pool of ``max_workers`` threads.  At most ``max_pending``
+    operations are queued or running at once; further callers wait (without
+    blocking the loop) for a slot, so a burst of requests cannot pile up an
+    unbounded backlog.  The manager serializes its own index and archive
+    manifest state behind ``history_manager.lock``: loads hold it only to
+    look up archived sessions and read session files in parallel, while
+    saves, deletes, listings and searches hold it throughout and take turns.
+
+    Use one instance from one event loop, and ``await close()`` (or
+    ``async with``) to shut the pool down.
+    """
+
+    def __init__(self, history_manager, max_workers: int = 4, max_pending: int = 64):
+        self.history_manager = history_manager
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="history-io")
+        self._slots = asyncio.Semaphore(max_pending)
+
+    async def __aenter__(self) -> 'AsyncHistoryManager':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _run(self, func: Callable, *args, **kwargs):
+        """Run a blocking call on the pool once a slot is free"""
+        call = partial(func, *args, **kwargs)
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    # --- Single operations ---
+
+    async def save(self, session_data: Dict) -> Optional[str]:
+        """Save a session; resolves to its file path (None if saving failed)"""
+        return await self._run(self.history_manager.save_session, session_data)
+
+    async def load(self, filepath: str) -> Optional[Dict]:
+        """Load a session by file path, archive locator or archived session id"""
+        return await self._run(self.history_manager.load_session, filepath)
+
+    async def load_header(self, filepath: str) -> Optional[Dict]:
+        """Load a session's title, timestamps and metadata without its messages"""
+        return await self._run(self.history_manager.load_session_header, filepath)
+
+    async def load_messages(self, filepath: str, start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+        """Load messages ``start:stop`` of a session"""
+        return await self._run(self.history_manager.load_messages, filepath, start, stop)
+
+    async def list(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                   include_archived: bool = False) -> SessionPage:
+        """List sessions newest first (see HistoryManager.list_sessions)"""
+        return await self._run(self.history_manager.list_sessions, limit, cursor, include_archived)
+
+    async def search(self, query: str, **options) -> SessionPage:
+        """Search sessions (see HistoryManager.search_sessions for the options)"""
+        return await self._run(self.history_manager.search_sessions, query, **options)
+
+    async def delete(self, filepath: str) -> bool:
+        """Delete a session by file path or archive locator"""
+        return await self._run(self.history_manager.delete_session, filepath)
+
+    # --- Batches ---
+
+    async def load_many(self, filepaths: Iterable[str]) -> List[Optional[Dict]]:
+        """Load several sessions concurrently, in the order given
+
+        A session that cannot be loaded comes back as None instead of
+        failing the whole batch.
+        """
+        async def load_one(filepath):
+            try:
+                return await self.load(filepath)
+            except Exception as e:
+                print(f"Error loading session {filepath}: {e}")
+                return None
+        return list(await asyncio.gather(*(load_one(filepath) for filepath in filepaths)))
+
+    async def save_many(self, sessions: Iterable[Dict]) -> List[Optional[str]]:
+        """Save several sessions; resolves to their file paths in order"""
+        return list(await asyncio.gather(*(self.save(session_data) for session_data in sessions)))
+
+    async def delete_many(self, filepaths: Iterable[str]) -> int:
+        """Delete several sessions; resolves to how many were deleted"""
+        return sum(await asyncio.gather(*(self.delete(filepath) for filepath in filepaths)))
+
+    async def close(self):
+        """Wait for running operations and shut the thread pool down"""
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
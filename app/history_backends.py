@@ -0,0 +1,1053 @@
+"""
+Storage backends for AgenticBot chat history
+The JSON directory backend is the default; SQLite is available for large histories
+"""
+
+import json
+import os
+import re
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional
+
+from history_codec import (
+    BODY_KEYS, check_compression, compression_suffix, decode_session, encode_session, iter_session_stream,
+    open_session_stream, read_session_header, strip_compression_suffix
+)
+from history_ids import new_session_id, session_id_time
+from history_index import SessionIndex, SessionPage, build_session_summary, decode_cursor, encode_cursor
+from history_io import atomic_write, session_lock
+from history_journal import (
+    JOURNAL_SUFFIX, JournalState, append_records, iter_journal_records, journal_path, new_snapshot_id,
+    read_journal_header, remove_journal, replay_journal
+)
+
+
+# Ids found in files written while session_id was None, e.g. chat_..._None.json
+UNNAMED_SESSION_IDS = ('', 'None', 'null')
+
+
+FILENAME_TIME_FORMAT = "%Y%m%d_%H%M%S"
+
+# 'flat' keeps every session file in the history directory; 'date' puts new
+# ones in YYYY/MM shards by creation time
+LAYOUTS = ('flat', 'date')
+YEAR_DIR_RE = re.compile(r"^\d{4}$")
+MONTH_DIR_RE = re.compile(r"^\d{2}$")
+
+
+def shard_dir(created: datetime) -> str:
+    """Relative YYYY/MM directory of a session created at the given time"""
+    return os.path.join(created.strftime("%Y"), created.strftime("%m"))
+
+
+def shard_overlaps(shard: str, since: Optional[datetime], until: Optional[datetime]) -> bool:
+    """Check whether a YYYY/MM shard can hold sessions created within [since, until]"""
+    year, month = (int(part) for part in shard.split(os.sep))
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    return (until is None or start <= until) and (since is None or end > since)
+
+
+def session_filename(session_id: str, compression: Optional[str] = None) -> str:
+    """Generate filename for a session
+
+    The timestamp is the session's creation time (taken from a ULID id),
+    so names sort by age and retention can work from a directory listing.
+    """
+    created = session_id_time(session_id) or datetime.now()
+    return f"chat_{created.strftime(FILENAME_TIME_FORMAT)}_{session_id}.json{compression_suffix(compression)}"
+
+
+def parse_time(value: str) -> Optional[datetime]:
+    """Parse a "YYYY-MM-DD HH:MM:SS" session timestamp"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return None
+
+
+def created_in_range(created: Optional[datetime], since: Optional[datetime], until: Optional[datetime]) -> bool:
+    """Check a creation time against an optional ``since``/``until`` range"""
+    if since is None and until is None:
+        return True
+    return created is not None and (since is None or created >= since) and (until is None or created <= until)
+
+
+def session_created_at(filepath: str) -> Optional[datetime]:
+    """Creation time of a session from its file name alone
+
+    ULID ids give millisecond precision; older ids fall back to the
+    second-precision timestamp in the name.
+    """
+    created = session_id_time(session_id_from_filename(filepath))
+    if created is not None:
+        return created
+    try:
+        return datetime.strptime(os.path.basename(filepath)[len("chat_"):len("chat_YYYYMMDD_HHMMSS")], FILENAME_TIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def session_id_from_filename(filepath: str) -> str:
+    """Recover the session_id embedded in a chat_YYYYMMDD_HHMMSS_<id>.json name"""
+    name = strip_compression_suffix(os.path.basename(filepath))
+    if name.endswith(".json"):
+        name = name[:-len(".json")]
+    return name[len("chat_YYYYMMDD_HHMMSS_"):]
+
+
+class HistoryBackend:
+    """Base class for chat session storage backends
+
+    A backend stores fully prepared session dicts (HistoryManager fills in
+    ids, titles and metadata) and identifies stored sessions by a locator
+    string.  For the JSON backend the locator is the file path.
+
+    ``on_change(op, session_id)``, set by the owning HistoryManager, is
+    called for sessions a backend writes on its own (e.g. naming unnamed
+    sessions while syncing its index), so the change feed sees them too.
+    """
+
+    on_change: Optional[Callable[[str, Optional[str]], None]] = None
+
+    def find_session(self, session_id: str, sync: bool = True) -> Optional[str]:
+        """Return the locator of a stored session, if any
+
+        With ``sync=False`` a backend that caches its listing answers from
+        the cache without checking for sessions added behind its back.
+        """
+        raise NotImplementedError
+
+    def write_session(self, session_data: Dict, new: bool = False) -> Optional[str]:
+        """Persist a prepared session and return its locator
+
+        ``new=True`` promises that the session id was just minted, so no
+        stored copy can exist and backends may skip looking for one.
+        """
+        raise NotImplementedError
+
+    def write_sessions(self, sessions: List[Dict]) -> List[Optional[str]]:
+        """Persist a batch of prepared sessions; backends may do this in one go"""
+        return [self.write_session(session_data) for session_data in sessions]
+
+    def read_session(self, locator: str) -> Optional[Dict]:
+        """Load a stored session"""
+        raise NotImplementedError
+
+    def read_header(self, locator: str) -> Optional[Dict]:
+        """Load everything but a session's messages and logs"""
+        session_data = self.read_session(locator)
+        if session_data is None:
+            return None
+        return {key: value for key, value in session_data.items() if key not in BODY_KEYS}
+
+    def iter_messages(self, locator: str) -> Iterator[Dict]:
+        """Yield a session's messages in order
+
+        Backends override this to stream messages without loading the
+        whole session.
+        """
+        session_data = self.read_session(locator)
+        if session_data:
+            yield from session_data.get('chat_history', [])
+
+    def list_sessions(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> SessionPage:
+        """Return session summaries, most recently updated first
+
+        With ``limit`` only one page is returned; pass its ``next_cursor``
+        back to get the following page.
+        """
+        raise NotImplementedError
+
+    def delete_session(self, locator: str, expected_stamp=None) -> bool:
+        """Delete a stored session
+
+        With ``expected_stamp`` (the ``stamp`` of a ``listing()`` entry) the
+        session is only deleted if it has not been saved since.
+        """
+        raise NotImplementedError
+
+    def delete_all_session_files(self, session_id: str) -> int:
+        """Delete every stored copy of a session"""
+        raise NotImplementedError
+
+    def cleanup_duplicate_sessions(self) -> int:
+        """Remove duplicate copies of sessions, keeping the newest"""
+        return 0
+
+    def session_file_counts(self) -> Dict[str, int]:
+        """Number of stored copies of each session_id"""
+        return {session['session_id']: 1 for session in self.list_sessions()}
+
+    def listing(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[Dict]:
+        """Describe every stored session for retention, most recent first
+
+        Entries carry filepath (locator), session_id, created_at and
+        modified (datetimes), size in bytes and an opaque change stamp.
+        With ``since``/``until`` only sessions created in that range are
+        described.
+        """
+        entries = []
+        for session in self.list_sessions():
+            created = parse_time(session['created_at'])
+            if not created_in_range(created, since, until):
+                continue
+            modified = parse_time(session['updated_at']) or datetime.min
+            entries.append({
+                'filename': session['filename'],
+                'filepath': session['filepath'],
+                'session_id': session['session_id'],
+                'created_at': created,
+                'modified': modified,
+                'size': 0,
+                'stamp': session['updated_at'],
+            })
+        return entries
+
+    def convert_sessions(self) -> Dict[str, int]:
+        """Rewrite stored sessions in the backend's configured format"""
+        return {'converted': 0, 'bytes_before': 0, 'bytes_after': 0}
+
+    def relocate_sessions(self) -> Dict[str, int]:
+        """Move stored sessions into the backend's configured layout"""
+        return {'moved': 0, 'kept': 0}
+
+
+class JsonDirectoryBackend(HistoryBackend):
+    """Stores one pretty-printed JSON file per session in a directory
+
+    With ``compression`` set to 'gzip', 'zlib' or 'lzma' snapshots are
+    written compressed as ``<file>.json.gz``/``.zz``/``.xz``; files in any
+    format are read back regardless of the setting.
+
+    With ``journal=True`` a save only appends the new messages, log
+    entries and tool events to ``<file>.journal``; the snapshot is rewritten when the journal
+    reaches ``compact_after`` records or when earlier messages changed.
+
+    With ``layout='date'`` new session files go into ``YYYY/MM``
+    subdirectories by creation time.  Files are found in either layout, and
+    ``relocate_sessions`` moves existing ones to the configured layout.
+    """
+
+    def __init__(self, history_dir: str = "history", journal: bool = False, compact_after: int = 200,
+                 compression: Optional[str] = None, layout: str = 'flat'):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown history layout: {layout!r} (expected one of {', '.join(LAYOUTS)})")
+        self.history_dir = history_dir
+        self.layout = layout
+        self.compression = check_compression(compression)
+        if not os.path.exists(self.history_dir):
+            os.makedirs(self.history_dir)
+        self.index = SessionIndex(history_dir)
+        self.journal = journal
+        self.compact_after = compact_after
+        self._journal_states: Dict[str, JournalState] = {}
+        self._scanned_dir_stamp = None
+        self._known_dirs: Optional[List[str]] = None
+
+    @staticmethod
+    def is_session_file(filename: str) -> bool:
+        """Check whether a directory entry is a session file"""
+        return filename.startswith("chat_") and strip_compression_suffix(filename).endswith(".json")
+
+    def shard_dirs(self) -> List[str]:
+        """Relative YYYY and YYYY/MM directories that exist, years before their months"""
+        dirs = []
+        with os.scandir(self.history_dir) as years:
+            for year in sorted(entry.name for entry in years if YEAR_DIR_RE.match(entry.name) and entry.is_dir()):
+                dirs.append(year)
+                with os.scandir(os.path.join(self.history_dir, year)) as months:
+                    dirs.extend(os.path.join(year, month) for month in sorted(
+                        entry.name for entry in months if MONTH_DIR_RE.match(entry.name) and entry.is_dir()))
+        return dirs
+
+    def scan(self, since: Optional[datetime] = None, until: Optional[datetime] = None,
+             shard_dirs: Optional[List[str]] = None) -> Dict[str, tuple]:
+        """Stat session files without opening them: index key -> (mtime_ns, size)
+
+        Covers the history directory itself and its YYYY/MM shards.  With
+        ``since``/``until`` only files created in that range are returned
+        and shards outside it are not listed at all.  A session's journal is
+        folded into the stamp of its snapshot, so an append by another
+        process invalidates the index entry.
+        """
+        bounded = since is not None or until is not None
+        if shard_dirs is None:
+            shard_dirs = self.shard_dirs()
+        months = [d for d in shard_dirs if os.sep in d and (not bounded or shard_overlaps(d, since, until))]
+
+        stamps, journals = {}, {}
+        for directory in [''] + months:
+            with os.scandir(os.path.join(self.history_dir, directory)) as entries:
+                for entry in entries:
+                    key = os.path.join(directory, entry.name) if directory else entry.name
+                    if self.is_session_file(entry.name) and entry.is_file():
+                        stat = entry.stat()
+                        stamps[key] = (stat.st_mtime_ns, stat.st_size)
+                    elif entry.name.endswith(JOURNAL_SUFFIX):
+                        stat = entry.stat()
+                        journals[key[:-len(JOURNAL_SUFFIX)]] = (stat.st_mtime_ns, stat.st_size)
+        for key, (mtime, size) in journals.items():
+            if key in stamps:
+                stamps[key] = (max(stamps[key][0], mtime), stamps[key][1] + size)
+
+        if bounded:
+            def created_in_range(key):
+                created = session_created_at(key)
+                return created is not None and (since is None or created >= since) and (until is None or created <= until)
+            stamps = {key: stamp for key, stamp in stamps.items() if created_in_range(key)}
+        return stamps
+
+    def _dirs_stamp(self, shard_dirs: List[str]) -> tuple:
+        """mtimes of the history directory and the given shard directories
+
+        Adding or removing a file changes its directory's mtime, and a new
+        shard changes its parent's, so this changes whenever the scan would.
+        """
+        stamp = []
+        for directory in [''] + shard_dirs:
+            try:
+                stamp.append(os.stat(os.path.join(self.history_dir, directory)).st_mtime_ns)
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    @staticmethod
+    def file_stamp(filepath: str) -> tuple:
+        """(mtime_ns, size) of a session file and its journal combined"""
+        stat = os.stat(filepath)
+        mtime, size = stat.st_mtime_ns, stat.st_size
+        try:
+            journal_stat = os.stat(journal_path(filepath))
+            mtime, size = max(mtime, journal_stat.st_mtime_ns), size + journal_stat.st_size
+        except FileNotFoundError:
+            pass
+        return mtime, size
+
+    def listing(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[Dict]:
+        """Describe every session file from the directory listing alone, most recent first
+
+        Creation time and session id come from the file name and recency
+        from the entry's mtime (folded with its journal), so no file is
+        opened.  With ``since``/``until`` only the shards covering that
+        creation-time range are listed.
+        """
+        entries = [
+            {
+                'filename': os.path.basename(key),
+                'filepath': os.path.join(self.history_dir, key),
+                'session_id': session_id_from_filename(key),
+                'created_at': session_created_at(key),
+                'modified': datetime.fromtimestamp(mtime / 1e9),
+                'size': size,
+                'stamp': (mtime, size),
+            }
+            for key, (mtime, size) in self.scan(since, until).items()
+        ]
+        entries.sort(key=lambda entry: entry['modified'], reverse=True)
+        return entries
+
+    def session_files(self) -> List[str]:
+        """Return the paths of all session files"""
+        return [os.path.join(self.history_dir, key) for key in self.scan()]
+
+    def _dirs_scanned(self) -> bool:
+        """Whether the last scan still matches the directory mtimes"""
+        return self._known_dirs is not None and self._dirs_stamp(self._known_dirs) == self._scanned_dir_stamp
+
+    def _mark_scanned(self, filepath: str):
+        """Count our own write of ``filepath`` as seen by the last scan
+
+        Called only if the directories were unchanged before the write (and
+        the index already records it), so the next listing does not rescan
+        every file just because this save touched a directory mtime.  A
+        file another tool drops in at that very moment is picked up with
+        the next directory change.
+        """
+        directory = os.path.relpath(os.path.dirname(filepath), self.history_dir)
+        if directory != os.curdir and directory not in self._known_dirs:
+            self._known_dirs = self.shard_dirs()
+        self._scanned_dir_stamp = self._dirs_stamp(self._known_dirs)
+
+    def _sync_index(self):
+        """Bring the metadata index up to date with the directory
+
+        Saves made through any backend instance keep the index current, so
+        the directory is only re-scanned (to catch files created, replaced
+        or deleted by other tools) when its mtime, or that of a shard,
+        changes.  Files left by saves without a session_id are given one on
+        the way.
+        """
+        self.index.load()
+        if self._dirs_scanned():
+            return
+        shard_dirs = self.shard_dirs()
+        dir_stamp = self._dirs_stamp(shard_dirs)
+        stamps = self.scan(shard_dirs=shard_dirs)
+        unnamed = [f for f in stamps if session_id_from_filename(f) in UNNAMED_SESSION_IDS]
+        if unnamed:
+            self._name_sessions(unnamed)
+            dir_stamp = self._dirs_stamp(shard_dirs)
+            stamps = self.scan(shard_dirs=shard_dirs)
+        if self.index.is_stale(stamps):
+            with self.index.locked():
+                self.index.load()
+                if self.index.refresh(stamps, self.read_header):
+                    self.index.save()
+        self._known_dirs = shard_dirs
+        self._scanned_dir_stamp = dir_stamp
+
+    def _name_sessions(self, filenames: List[str]):
+        """Give sessions saved without an id (chat_..._None.json) a fresh one
+
+        Without an id such a session could never be found again, so every
+        later save of it created another file.
+        """
+        for filename in filenames:
+            filepath = os.path.join(self.history_dir, filename)
+            session_data = self._read_unlocked(filepath)
+            if session_data is None:
+                continue
+            if str(session_data.get('session_id')) in UNNAMED_SESSION_IDS:
+                session_data['session_id'] = new_session_id()
+            stem = strip_compression_suffix(filename)[:-len(".json")]
+            prefix = stem[:len(stem) - len(session_id_from_filename(filename))]
+            target = os.path.join(os.path.dirname(filepath), f"{prefix}{session_data['session_id']}.json")
+            target = self.snapshot_path(target)
+            with session_lock(self.history_dir, session_data['session_id']):
+                atomic_write(target, encode_session(session_data, self.compression))
+            self._remove_session_file(filepath)
+            self._forget([filepath])
+            print(f"Assigned session id {session_data['session_id']} to {filename}")
+            if self.on_change is not None:
+                self.on_change('save', session_data['session_id'])
+
+    def find_session(self, session_id: str, sync: bool = True) -> Optional[str]:
+        """Find existing session file by session_id
+
+        Looked up in the index's session_id -> file map.  A miss (normally a
+        brand-new session) re-syncs the index first in case another tool
+        added the file, unless ``sync`` is False.
+        """
+        if not session_id or str(session_id) in UNNAMED_SESSION_IDS:
+            return None
+
+        self.index.load()
+        for filepath in self.index.files_for(session_id):
+            if os.path.exists(filepath):
+                return filepath
+        if not sync:
+            return None
+        self._sync_index()
+        files = self.index.files_for(session_id)
+        return files[0] if files else None
+
+    def layout_path(self, filepath: str) -> str:
+        """Where a session file belongs under the configured layout"""
+        filename = os.path.basename(filepath)
+        if self.layout == 'date':
+            created = session_created_at(filename) or datetime.fromtimestamp(os.path.getmtime(filepath))
+            return os.path.join(self.history_dir, shard_dir(created), filename)
+        return os.path.join(self.history_dir, filename)
+
+    def snapshot_path(self, filepath: str) -> str:
+        """Where the next snapshot of a session file goes under the configured compression"""
+        stem = strip_compression_suffix(filepath)
+        return stem + compression_suffix(self.compression)
+
+    def write_session(self, session_data: Dict, new: bool = False) -> Optional[str]:
+        """Write a session to its existing file or a new one
+
+        The session's lock is held from locating the file to the index
+        update, so concurrent writers (other tabs or server processes) of
+        the same session take turns; other sessions are not blocked.  Locks
+        are always taken session first, then index.
+        """
+        session_id = session_data.get('session_id')
+        if not session_id or str(session_id) in UNNAMED_SESSION_IDS:
+            raise ValueError("Cannot write a session without a session_id")
+        # Re-syncing the index reads other sessions, so do it before locking
+        # (a freshly minted id cannot be on disk, so there is nothing to find)
+        if not new:
+            self.find_session(session_id)
+        scanned = self._dirs_scanned()
+        with session_lock(self.history_dir, session_id):
+            filepath = self.find_session(session_id, sync=False)
+            if not filepath:
+                filepath = self.layout_path(session_filename(session_id, self.compression))
+                os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+            records = self._journal_records(filepath, session_data) if self.journal else None
+            previous = None
+            if records is None:
+                filepath, previous = self._write_snapshot(filepath, session_data), filepath
+            else:
+                state = self._journal_states[filepath]
+                append_records(filepath, state.snapshot_id, records, start=state.records == 0)
+                state.apply(records)
+                state.stamp = self.file_stamp(filepath)
+            stamp = self.file_stamp(filepath)
+
+            with self.index.locked():
+                self.index.load()
+                if previous and previous != filepath:
+                    self.index.remove(previous)
+                self.index.update(filepath, session_data, stamp)
+                self.index.save()
+        if scanned:
+            self._mark_scanned(filepath)
+        return filepath
+
+    def _journal_records(self, filepath: str, session_data: Dict) -> Optional[List[Dict]]:
+        """Records to append for this save, or None if a snapshot is due"""
+        if not os.path.exists(filepath):
+            return None
+        state = self._journal_states.get(filepath)
+        if state is None or state.stamp != self.file_stamp(filepath):
+            # First save of this session in this process, or another writer got in between
+            persisted, records = self._read(filepath)
+            if persisted is None:
+                return None
+            state = JournalState.from_session(persisted, (persisted.get('metadata') or {}).get('snapshot_id'), records)
+            state.stamp = self.file_stamp(filepath)
+            self._journal_states[filepath] = state
+        if state.snapshot_id is None:
+            return None  # legacy snapshot, rewrite it once with an id
+
+        records = state.diff(session_data)
+        if records is None or state.records + len(records) > self.compact_after:
+            return None
+        return records
+
+    def _write_snapshot(self, filepath: str, session_data: Dict) -> str:
+        """Rewrite the full session file and discard its journal
+
+        Returns the path written, which differs from ``filepath`` when the
+        file's compression does not match the configured one; the old file
+        is then removed.
+        """
+        data = session_data
+        snapshot_id = None
+        if self.journal:
+            snapshot_id = new_snapshot_id()
+            data = dict(session_data, metadata=dict(session_data.get('metadata') or {}, snapshot_id=snapshot_id))
+
+        target = self.snapshot_path(filepath)
+        atomic_write(target, encode_session(data, self.compression))
+        remove_journal(filepath)
+        if target != filepath:
+            self._journal_states.pop(filepath, None)
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+        if self.journal:
+            state = JournalState.from_session(session_data, snapshot_id)
+            state.stamp = self.file_stamp(target)
+            self._journal_states[target] = state
+        return target
+
+    def _read(self, filepath: str) -> tuple:
+        """Load a snapshot and replay its journal: (session_data, journal records)"""
+        with open(filepath, 'rb') as f:
+            session_data = decode_session(f.read())
+        return session_data, replay_journal(filepath, session_data)
+
+    def read_session(self, locator: str) -> Optional[Dict]:
+        """Load a chat session from file"""
+        # Snapshot and journal are read under the session lock so a
+        # concurrent compaction cannot pair one with the other's state
+        with session_lock(self.history_dir, session_id_from_filename(locator), shared=True):
+            return self._read_unlocked(locator)
+
+    def iter_messages(self, locator: str) -> Iterator[Dict]:
+        """Stream a session's messages from its snapshot, then its journal
+
+        Only one message is decoded at a time, so memory does not grow with
+        the session.  The session stays read-locked until the iterator is
+        exhausted or closed.
+        """
+        with session_lock(self.history_dir, session_id_from_filename(locator), shared=True):
+            header = {}
+            with open(locator, 'rb') as f:
+                for key, value in iter_session_stream(open_session_stream(f)):
+                    if key == 'chat_history':
+                        yield value
+                    elif key not in BODY_KEYS:
+                        header[key] = value
+            snapshot_id = (header.get('metadata') or {}).get('snapshot_id')
+            for record in iter_journal_records(locator, snapshot_id):
+                if record.get('op') == 'message':
+                    yield record['data']
+
+    def read_header(self, filepath: str) -> Optional[Dict]:
+        """Load everything but a session's messages and logs
+
+        Reads only the first few KB of the snapshot and the tail of its
+        journal; files written before headers came first are parsed in full.
+        Like ``_read_unlocked`` this takes no lock.
+        """
+        try:
+            header = read_session_header(filepath)
+            if header is not None:
+                found, journal_header = read_journal_header(filepath, (header.get('metadata') or {}).get('snapshot_id'))
+                if found:
+                    if journal_header:
+                        header.update(journal_header)
+                    return header
+        except Exception as e:
+            print(f"Error reading session header {filepath}: {e}")
+            return None
+        session_data = self._read_unlocked(filepath)
+        if session_data is None:
+            return None
+        return {key: value for key, value in session_data.items() if key not in BODY_KEYS}
+
+    def _read_unlocked(self, filepath: str) -> Optional[Dict]:
+        """Load a session without taking its lock (used while the index lock is held)
+
+        A read torn by a concurrent compaction only yields a stale summary;
+        the file's new stamp makes the next refresh read it again.
+        """
+        try:
+            return self._read(filepath)[0]
+        except Exception as e:
+            print(f"Error loading session {filepath}: {e}")
+            return None
+
+    def _remove_session_file(self, filepath: str, expected_stamp: Optional[tuple] = None) -> bool:
+        """Delete a session file together with its journal and cached state
+
+        With ``expected_stamp`` nothing is deleted (and False returned) if the
+        file changed since that stamp was taken.
+        """
+        with session_lock(self.history_dir, session_id_from_filename(filepath)):
+            if expected_stamp is not None and self.file_stamp(filepath) != tuple(expected_stamp):
+                return False
+            os.remove(filepath)
+            remove_journal(filepath)
+        self._journal_states.pop(filepath, None)
+        return True
+
+    def _forget(self, filepaths: List[str]):
+        """Drop deleted files from the metadata index"""
+        with self.index.locked():
+            self.index.load()
+            for filepath in filepaths:
+                self.index.remove(filepath)
+            self.index.save()
+
+    def list_sessions(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> SessionPage:
+        """List chat sessions from the metadata index, one page at a time"""
+        self._sync_index()
+        return self.index.page(limit, cursor)
+
+    def delete_session(self, locator: str, expected_stamp: Optional[tuple] = None) -> bool:
+        """Delete a chat session file"""
+        try:
+            scanned = self._dirs_scanned()
+            if os.path.exists(locator) and self._remove_session_file(locator, expected_stamp):
+                self._forget([locator])
+                if scanned:
+                    self._mark_scanned(locator)
+                return True
+            return False
+        except Exception as e:
+            print(f"Error deleting session {locator}: {e}")
+            return False
+
+    def delete_all_session_files(self, session_id: str) -> int:
+        """Delete all files for a given session_id (to clean up duplicates)"""
+        deleted_count = 0
+        self._sync_index()
+
+        deleted = []
+        for filepath in self.index.files_for(session_id):
+            try:
+                self._remove_session_file(filepath)
+                deleted.append(filepath)
+                deleted_count += 1
+            except Exception as e:
+                print(f"Error deleting {filepath}: {e}")
+
+        if deleted:
+            self._forget(deleted)
+        return deleted_count
+
+    def cleanup_duplicate_sessions(self) -> int:
+        """Clean up duplicate session files (keep only the most recent for each session_id)
+
+        Duplicates are found from the metadata index, which only reads the
+        headers of files that changed, so no session body is loaded.
+        """
+        self._sync_index()
+        deleted = []
+        for filepath in self.index.duplicates():
+            try:
+                self._remove_session_file(filepath)
+                deleted.append(filepath)
+                print(f"Removed duplicate: {filepath}")
+            except Exception as e:
+                print(f"Error deleting duplicate {filepath}: {e}")
+
+        if deleted:
+            self._forget(deleted)
+        return len(deleted)
+
+    def session_file_counts(self) -> Dict[str, int]:
+        """Number of files holding each session_id"""
+        self._sync_index()
+        return self.index.file_counts()
+
+    def convert_sessions(self) -> Dict[str, int]:
+        """Rewrite every session file in the configured compression
+
+        Files already in that format are left alone.  Journals are folded
+        into the rewritten snapshots.  Returns the number of files converted
+        and the total bytes before and after.
+        """
+        report = {'converted': 0, 'bytes_before': 0, 'bytes_after': 0}
+        converted = []
+        for filepath in self.session_files():
+            if self.snapshot_path(filepath) == filepath:
+                continue
+            session_id = session_id_from_filename(filepath)
+            with session_lock(self.history_dir, session_id):
+                if not os.path.exists(filepath):
+                    continue
+                try:
+                    size_before = self.file_stamp(filepath)[1]
+                    session_data = self._read(filepath)[0]
+                    target = self._write_snapshot(filepath, session_data)
+                    stamp = self.file_stamp(target)
+                except Exception as e:
+                    print(f"Error converting {filepath}: {e}")
+                    continue
+            converted.append((filepath, target, session_data, stamp))
+            report['converted'] += 1
+            report['bytes_before'] += size_before
+            report['bytes_after'] += stamp[1]
+
+        if converted:
+            with self.index.locked():
+                self.index.load()
+                for filepath, target, session_data, stamp in converted:
+                    self.index.remove(filepath)
+                    self.index.update(target, session_data, stamp)
+                self.index.save()
+        return report
+
+    def relocate_sessions(self) -> Dict[str, int]:
+        """Move session files to where the configured layout puts them
+
+        Files without a journal are renamed; journaled ones are written as
+        a fresh snapshot at the new place first, so an interruption leaves at
+        worst a duplicate (removed by ``cleanup_duplicate_sessions``), never
+        a snapshot separated from its journal.  Shards left empty are removed.
+        """
+        report = {'moved': 0, 'kept': 0}
+        moved = []
+        for filepath in self.session_files():
+            target = self.layout_path(filepath)
+            if target == filepath:
+                report['kept'] += 1
+                continue
+            with session_lock(self.history_dir, session_id_from_filename(filepath)):
+                if not os.path.exists(filepath) or os.path.exists(target):
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                try:
+                    if os.path.exists(journal_path(filepath)):
+                        target = self._write_snapshot(target, self._read(filepath)[0])
+                        remove_journal(filepath)
+                        os.remove(filepath)
+                    else:
+                        os.replace(filepath, target)
+                    self._journal_states.pop(filepath, None)
+                    stamp = self.file_stamp(target)
+                except Exception as e:
+                    print(f"Error moving {filepath}: {e}")
+                    continue
+            moved.append((filepath, target, stamp))
+            report['moved'] += 1
+
+        if moved:
+            with self.index.locked():
+                self.index.load()
+                for filepath, target, stamp in moved:
+                    self.index.rename(filepath, target, stamp)
+                self.index.save()
+        for directory in reversed(self.shard_dirs()):
+            try:
+                os.rmdir(os.path.join(self.history_dir, directory))
+            except OSError:
+                pass  # not empty
+        return report
+
+
+class SQLiteBackend(HistoryBackend):
+    """Stores sessions, messages and logs in a single SQLite database
+
+    Locators are session ids, so ``list_sessions()`` results can be passed
+    straight back to ``read_session``/``delete_session`` like file paths.
+    """
+
+    SESSION_COLUMNS = ('session_id', 'title', 'created_at', 'updated_at', 'metadata')
+    MESSAGE_COLUMNS = ('role', 'content', 'timestamp', 'image_data')
+    LOG_COLUMNS = ('timestamp', 'type', 'message', 'full_message')
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            title TEXT,
+            created_at TEXT,
+            updated_at TEXT,
+            total_messages INTEGER NOT NULL DEFAULT 0,
+            metadata TEXT,
+            extra TEXT
+        );
+        DROP INDEX IF EXISTS idx_sessions_updated_at;
+        CREATE INDEX IF NOT EXISTS idx_sessions_recency ON sessions (COALESCE(updated_at, ''), session_id);
+
+        CREATE TABLE IF NOT EXISTS messages (
+            session_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            role TEXT,
+            content TEXT,
+            timestamp TEXT,
+            image_data TEXT,
+            extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages (session_id, seq);
+
+        CREATE TABLE IF NOT EXISTS logs (
+            session_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            timestamp TEXT,
+            type TEXT,
+            message TEXT,
+            full_message TEXT,
+            extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_logs_session_id ON logs (session_id, seq);
+    """
+
+    def __init__(self, db_path: str = os.path.join("history", "history.sqlite3")):
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        with closing(self._connect()) as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection; one per operation keeps Streamlit threads independent"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @staticmethod
+    def _split(record: Dict, columns: tuple) -> tuple:
+        """Split a dict into known column values and a JSON blob of the rest"""
+        values = [record.get(column) for column in columns]
+        extra = {key: value for key, value in record.items() if key not in columns}
+        return values, json.dumps(extra, ensure_ascii=False) if extra else None
+
+    @staticmethod
+    def _join(row: sqlite3.Row, columns: tuple) -> Dict:
+        """Rebuild a dict from column values and its extra JSON blob"""
+        record = {column: row[column] for column in columns}
+        if row['extra']:
+            record.update(json.loads(row['extra']))
+        return record
+
+    def find_session(self, session_id: str, sync: bool = True) -> Optional[str]:
+        """Return the session id if the session is stored"""
+        if not session_id:
+            return None
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return session_id if row else None
+
+    def write_session(self, session_data: Dict, new: bool = False) -> Optional[str]:
+        """Replace the stored rows of a session in one transaction"""
+        return self.write_sessions([session_data])[0]
+
+    def write_sessions(self, sessions: List[Dict]) -> List[Optional[str]]:
+        """Replace the stored rows of a batch of sessions in one transaction"""
+        for session_data in sessions:
+            session_id = session_data.get('session_id')
+            if not session_id or str(session_id) in UNNAMED_SESSION_IDS:
+                raise ValueError("Cannot write a session without a session_id")
+        with closing(self._connect()) as conn, conn:
+            return [self._insert_session(conn, session_data) for session_data in sessions]
+
+    def _insert_session(self, conn: sqlite3.Connection, session_data: Dict) -> str:
+        session_id = session_data['session_id']
+        header = {key: value for key, value in session_data.items() if key not in ('chat_history', 'agentic_logs')}
+        header['metadata'] = json.dumps(header.get('metadata', {}), ensure_ascii=False)
+        session_values, session_extra = self._split(header, self.SESSION_COLUMNS)
+        messages = session_data.get('chat_history', [])
+        logs = session_data.get('agentic_logs', [])
+
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, title, created_at, updated_at, metadata, total_messages, extra) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (*session_values, len(messages), session_extra)
+        )
+        conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM logs WHERE session_id = ?", (session_id,))
+        conn.executemany(
+            "INSERT INTO messages (session_id, seq, role, content, timestamp, image_data, extra) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(session_id, seq, *values, extra)
+             for seq, (values, extra) in enumerate(self._split(m, self.MESSAGE_COLUMNS) for m in messages)]
+        )
+        conn.executemany(
+            "INSERT INTO logs (session_id, seq, timestamp, type, message, full_message, extra) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(session_id, seq, *values, extra)
+             for seq, (values, extra) in enumerate(self._split(log, self.LOG_COLUMNS) for log in logs)]
+        )
+        return session_id
+
+    def read_session(self, locator: str) -> Optional[Dict]:
+        """Load a session and its messages and logs"""
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute("SELECT * FROM sessions WHERE session_id = ?", (locator,)).fetchone()
+                if row is None:
+                    return None
+                session_data = self._join(row, self.SESSION_COLUMNS)
+                session_data['metadata'] = json.loads(session_data['metadata'] or '{}')
+                session_data['chat_history'] = [
+                    self._join(message, self.MESSAGE_COLUMNS)
+                    for message in conn.execute("SELECT * FROM messages WHERE session_id = ? ORDER BY seq", (locator,))
+                ]
+                session_data['agentic_logs'] = [
+                    self._join(log, self.LOG_COLUMNS)
+                    for log in conn.execute("SELECT * FROM logs WHERE session_id = ? ORDER BY seq", (locator,))
+                ]
+            return session_data
+        except Exception as e:
+            print(f"Error loading session {locator}: {e}")
+            return None
+
+    def read_header(self, locator: str) -> Optional[Dict]:
+        """Load a session's row without its messages and logs"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM sessions WHERE session_id = ?", (locator,)).fetchone()
+        if row is None:
+            return None
+        header = self._join(row, self.SESSION_COLUMNS)
+        header['metadata'] = json.loads(header['metadata'] or '{}')
+        return header
+
+    def iter_messages(self, locator: str) -> Iterator[Dict]:
+        """Stream a session's messages row by row"""
+        with closing(self._connect()) as conn:
+            for row in conn.execute("SELECT * FROM messages WHERE session_id = ? ORDER BY seq", (locator,)):
+                yield self._join(row, self.MESSAGE_COLUMNS)
+
+    def list_sessions(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> SessionPage:
+        """List session summaries straight from the sessions table
+
+        Pages are keyset queries on the (updated_at, session_id) index.
+        """
+        query = "SELECT session_id, title, created_at, updated_at, metadata FROM sessions"
+        params = []
+        if cursor is not None:
+            updated_at, session_id = decode_cursor(cursor)
+            # Spelled out (rather than a row-value comparison) so SQLite seeks the index
+            query += " WHERE COALESCE(updated_at, '') <= ? AND (COALESCE(updated_at, '') < ? OR session_id < ?)"
+            params.extend([updated_at, updated_at, session_id])
+        query += " ORDER BY COALESCE(updated_at, '') DESC, session_id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit + 1)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['updated_at'] or '', rows[-1]['session_id'])
+        return SessionPage((
+            build_session_summary({
+                'session_id': row['session_id'],
+                'title': row['title'],
+                'created_at': row['created_at'],
+                'updated_at': row['updated_at'],
+                'metadata': json.loads(row['metadata'] or '{}')
+            }, row['session_id'])
+            for row in rows
+        ), next_cursor)
+
+    def listing(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[Dict]:
+        """Describe every stored session, most recent first
+
+        ``size`` is the UTF-8 size of the session's text columns and those
+        of its messages and logs, summed in one query.
+        """
+        query = """
+            SELECT s.session_id, s.created_at, s.updated_at,
+                   LENGTH(CAST(COALESCE(s.title, '') || COALESCE(s.metadata, '') || COALESCE(s.extra, '') AS BLOB))
+                   + COALESCE((SELECT SUM(LENGTH(CAST(COALESCE(m.content, '') || COALESCE(m.image_data, '')
+                                                      || COALESCE(m.extra, '') AS BLOB)))
+                               FROM messages m WHERE m.session_id = s.session_id), 0)
+                   + COALESCE((SELECT SUM(LENGTH(CAST(COALESCE(l.message, '') || COALESCE(l.full_message, '')
+                                                      || COALESCE(l.extra, '') AS BLOB)))
+                               FROM logs l WHERE l.session_id = s.session_id), 0) AS size
+            FROM sessions s
+            ORDER BY COALESCE(s.updated_at, '') DESC, s.session_id DESC
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query).fetchall()
+        entries = []
+        for row in rows:
+            created = parse_time(row['created_at'])
+            if not created_in_range(created, since, until):
+                continue
+            entries.append({
+                'filename': row['session_id'],
+                'filepath': row['session_id'],
+                'session_id': row['session_id'],
+                'created_at': created,
+                'modified': parse_time(row['updated_at']) or datetime.min,
+                'size': row['size'],
+                'stamp': row['updated_at'],
+            })
+        return entries
+
+    def delete_session(self, locator: str, expected_stamp: Optional[str] = None) -> bool:
+        """Delete a session and its messages and logs
+
+        ``expected_stamp`` is the session's updated_at as listed.
+        """
+        try:
+            with closing(self._connect()) as conn, conn:
+                if expected_stamp is None:
+                    deleted = conn.execute("DELETE FROM sessions WHERE session_id = ?", (locator,)).rowcount
+                else:
+                    deleted = conn.execute("DELETE FROM sessions WHERE session_id = ? AND updated_at = ?",
+                                           (locator, expected_stamp)).rowcount
+                if deleted:
+                    conn.execute("DELETE FROM messages WHERE session_id = ?", (locator,))
+                    conn.execute("DELETE FROM logs WHERE session_id = ?", (locator,))
+            return deleted > 0
+        except Exception as e:
+            print(f"Error deleting session {locator}: {e}")
+            return False
+
+    def delete_all_session_files(self, session_id: str) -> int:
+        """Sessions are unique by id in SQLite, so this deletes at most one"""
+        return 1 if self.delete_session(session_id) else 0
+
+
+def create_backend(kind: str, history_dir: str = "history", **options) -> HistoryBackend:
+    """Create a backend by name ('json' or 'sqlite'); options go to its constructor"""
+    if kind == 'json':
+        return JsonDirectoryBackend(history_dir, **options)
+    if kind == 'sqlite':
+        return SQLiteBackend(os.path.join(history_dir, "history.sqlite3"), **options)
+    raise ValueError(f"Unknown history backend: {kind}")
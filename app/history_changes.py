@@ -0,0 +1,135 @@
+"""
+Change feed for AgenticBot history
+An append-only log of session changes shared by every process writing the history directory
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional, Set
+
+from history_io import atomic_write, path_lock
+
+
+class ChangeFeed:
+    """Generation-numbered log of saves, deletes and archivings
+
+    Every change appends one record carrying the next generation number.
+    A reader remembers the generation it last saw and asks whether
+    anything changed since: ``changed_since`` costs a single ``stat`` when
+    nothing did, and ``changes_since`` / ``changed_sessions`` return only
+    the records after it, so caches can drop just the affected sessions.
+
+    Writers assign generations under the log's lock.  Once the log holds
+    ``COMPACT_AFTER`` records it is rewritten with the latest ``KEEP``;
+    readers that fell further behind get None, meaning "invalidate
+    everything".  Bulk operations (conversion, relocation, duplicate
+    cleanup) are recorded as one ``reset`` with no session id.
+    """
+
+    LOG_FILENAME = ".changes.log"
+    COMPACT_AFTER = 2000  # records before the log is truncated
+    KEEP = 500  # records kept by compaction
+
+    def __init__(self, history_dir: str):
+        self.history_dir = history_dir
+        self.log_path = os.path.join(history_dir, self.LOG_FILENAME)
+        self.records: List[Dict] = []
+        self._stamp = None
+        self._offset = 0
+
+    # --- Reading ---
+
+    def refresh(self):
+        """Read records appended since the last refresh (by any process)"""
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            self.records = []
+            self._stamp = None
+            self._offset = 0
+            return
+        if (stat.st_ino, stat.st_size) == self._stamp:
+            return
+        if self._stamp is None or stat.st_ino != self._stamp[0] or stat.st_size < self._offset:
+            # First read, or the log was compacted (replaced) meanwhile
+            self.records, self._offset = [], 0
+        appended = self._read_from(self._offset)
+        if appended and self.records and appended[0]['generation'] != self.records[-1]['generation'] + 1:
+            # A compacted log reused the old inode; read it from the start
+            self.records, self._offset = [], 0
+            appended = self._read_from(0)
+        self.records.extend(appended)
+        # Only a fully read log may be skipped on the next refresh
+        self._stamp = (stat.st_ino, self._offset)
+
+    def _read_from(self, offset: int) -> List[Dict]:
+        records = []
+        self._offset = offset
+        with open(self.log_path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partially written record, pick it up next time
+                self._offset += len(line)
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+        return records
+
+    def generation(self) -> int:
+        """Generation of the latest change (0 for a history never changed)"""
+        self.refresh()
+        return self.records[-1]['generation'] if self.records else 0
+
+    def changed_since(self, generation: int) -> bool:
+        return self.generation() != generation
+
+    def changes_since(self, generation: int) -> Optional[List[Dict]]:
+        """Records after ``generation``, oldest first
+
+        Returns None if they are no longer all in the log (the reader fell
+        behind a compaction, or the history was recreated), in which case
+        everything cached should be dropped.
+        """
+        self.refresh()
+        current = self.records[-1]['generation'] if self.records else 0
+        if generation == current:
+            return []
+        if generation > current or not self.records or self.records[0]['generation'] > generation + 1:
+            return None
+        # Generations are consecutive, so the first wanted record sits at a known offset
+        return self.records[generation + 1 - self.records[0]['generation']:]
+
+    def changed_sessions(self, generation: int) -> Optional[Set[str]]:
+        """Ids of the sessions changed after ``generation``; None means all of them"""
+        changes = self.changes_since(generation)
+        if changes is None or any(change['session_id'] is None for change in changes):
+            return None
+        return {change['session_id'] for change in changes}
+
+    # --- Writing ---
+
+    def record(self, op: str, session_id=None) -> int:
+        """Append a change (``save``, ``delete``, ``archive`` or ``reset``); returns its generation"""
+        with path_lock(self.log_path):
+            self.refresh()
+            generation = (self.records[-1]['generation'] if self.records else 0) + 1
+            change = {'generation': generation, 'op': op,
+                      'session_id': None if session_id is None else str(session_id), 'at': time.time()}
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(change, ensure_ascii=False, separators=(',', ':')) + "\n")
+            self.refresh()
+            if len(self.records) >= self.COMPACT_AFTER:
+                self._compact()
+        return generation
+
+    def _compact(self):
+        """Keep only the latest records; the caller holds the log lock"""
+        self.records = self.records[-self.KEEP:]
+        data = "".join(json.dumps(change, ensure_ascii=False, separators=(',', ':')) + "\n" for change in self.records)
+        atomic_write(self.log_path, data, fsync=False)
+        stat = os.stat(self.log_path)
+        self._offset = stat.st_size
+        self._stamp = (stat.st_ino, stat.st_size)
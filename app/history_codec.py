@@ -0,0 +1,298 @@
+"""
+Session file encoding for AgenticBot history
+Sessions are stored as plain JSON or compressed with zlib, gzip or lzma
+"""
+
+import gzip
+import io
+import json
+import lzma
+import zlib
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+# File suffix appended after ".json" for each compression method
+COMPRESSION_SUFFIXES = {
+    'gzip': '.gz',
+    'zlib': '.zz',
+    'lzma': '.xz',
+}
+
+# Top-level session keys written first, so they can be read without the body
+HEADER_KEYS = ('session_id', 'created_at', 'updated_at', 'title', 'metadata')
+BODY_KEYS = ('chat_history', 'agentic_logs')
+
+# Prefix sizes tried by read_session_header before giving up on a partial read
+HEADER_READ_SIZES = (4096, 65536)
+
+GZIP_MAGIC = b"\x1f\x8b"
+LZMA_MAGIC = b"\xfd7zXZ\x00"
+
+
+def check_compression(compression: Optional[str]) -> Optional[str]:
+    """Validate a compression method name; None or 'none' means plain JSON"""
+    if compression in (None, '', 'none'):
+        return None
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unknown compression '{compression}', expected one of: none, {', '.join(COMPRESSION_SUFFIXES)}")
+    return compression
+
+
+def compression_suffix(compression: Optional[str]) -> str:
+    """Suffix for files written with a compression method"""
+    return COMPRESSION_SUFFIXES[compression] if compression else ""
+
+
+def strip_compression_suffix(filename: str) -> str:
+    """Name of a session file without its compression suffix"""
+    for suffix in COMPRESSION_SUFFIXES.values():
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+
+def detect_compression(raw: bytes) -> Optional[str]:
+    """Identify the compression of file contents from their magic bytes
+
+    JSON documents start with ``{`` or whitespace, which none of the
+    compressed formats do, so detection does not depend on the file name.
+    """
+    if raw.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if raw.startswith(LZMA_MAGIC):
+        return 'lzma'
+    if len(raw) >= 2 and raw[0] & 0x0f == 8 and (raw[0] << 8 | raw[1]) % 31 == 0:
+        return 'zlib'
+    return None
+
+
+def header_first(session_data: Dict) -> Dict:
+    """Reorder a session's keys: header, other small keys, then messages and logs"""
+    ordered = {key: session_data[key] for key in HEADER_KEYS if key in session_data}
+    ordered.update((key, value) for key, value in session_data.items() if key not in BODY_KEYS)
+    ordered.update((key, session_data[key]) for key in BODY_KEYS if key in session_data)
+    return ordered
+
+
+def encode_session(session_data: Dict, compression: Optional[str] = None) -> bytes:
+    """Serialize a session, compressed if a method is given
+
+    Header keys are written first so ``read_session_header`` can stop
+    before the chat history.
+    """
+    session_data = header_first(session_data)
+    if not compression:
+        return json.dumps(session_data, indent=2, ensure_ascii=False).encode('utf-8')
+
+    # Compressed files are not meant to be read by eye, so skip the indentation
+    raw = json.dumps(session_data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if compression == 'gzip':
+        return gzip.compress(raw, mtime=0)
+    if compression == 'zlib':
+        return zlib.compress(raw, 6)
+    if compression == 'lzma':
+        return lzma.compress(raw)
+    raise ValueError(f"Unknown compression '{compression}'")
+
+
+def decode_session(raw: bytes) -> Dict:
+    """Parse session file contents in any supported format"""
+    compression = detect_compression(raw)
+    if compression == 'gzip':
+        raw = gzip.decompress(raw)
+    elif compression == 'zlib':
+        raw = zlib.decompress(raw)
+    elif compression == 'lzma':
+        raw = lzma.decompress(raw)
+    return json.loads(raw)
+
+
+class _ZlibReader(io.RawIOBase):
+    """Minimal readable stream over zlib-compressed data"""
+
+    def __init__(self, raw: BinaryIO):
+        self._raw = raw
+        self._decompressor = zlib.decompressobj()
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            chunk = self._decompressor.unconsumed_tail or self._raw.read(65536)
+            if not chunk:
+                self._buffer = self._decompressor.flush()
+                break
+            self._buffer = self._decompressor.decompress(chunk, 65536)
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self):
+        self._raw.close()
+        super().close()
+
+
+def open_session_stream(raw: BinaryIO) -> BinaryIO:
+    """Wrap a binary stream of session file contents so it reads decompressed bytes
+
+    The stream must support ``peek`` or ``seek`` to sniff the format.
+    """
+    if hasattr(raw, 'peek'):
+        magic = raw.peek(len(LZMA_MAGIC))[:len(LZMA_MAGIC)]
+    else:
+        magic = raw.read(len(LZMA_MAGIC))
+        raw.seek(0)
+    compression = detect_compression(magic)
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw)
+    if compression == 'lzma':
+        return lzma.LZMAFile(raw)
+    if compression == 'zlib':
+        return io.BufferedReader(_ZlibReader(raw))
+    return raw
+
+
+def read_prefix(filepath: str, limit: int) -> bytes:
+    """Read at most ``limit`` bytes of a session file's decoded contents"""
+    with open(filepath, 'rb') as f:
+        return open_session_stream(f).read(limit)
+
+
+def iter_session_stream(stream: BinaryIO, chunk_size: int = 65536) -> Iterator[Tuple[str, object]]:
+    """Walk a session document without loading it whole
+
+    Yields (key, value) for each top-level key, except that the body arrays
+    (chat_history, agentic_logs) are yielded one element at a time as
+    (key, element).  Memory use is bounded by the largest single element.
+    """
+    decoder = json.JSONDecoder()
+    text = io.TextIOWrapper(stream, encoding='utf-8')
+    buf, pos, eof = "", 0, False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        chunk = text.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buf, pos = buf[pos:] + chunk, 0
+        return True
+
+    def peek() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or not fill():
+                break
+        if pos >= len(buf):
+            raise ValueError("Unexpected end of session data")
+        return buf[pos]
+
+    def expect(char: str):
+        nonlocal pos
+        if peek() != char:
+            raise ValueError(f"Expected {char!r} in session data at {pos}")
+        pos += 1
+
+    def value():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                result, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if not fill():
+                    raise
+                continue
+            # A number or literal cut off by the chunk boundary decodes too early
+            if end == len(buf) and fill():
+                continue
+            pos = end
+            return result
+
+    expect('{')
+    if peek() == '}':
+        return
+    while True:
+        key = value()
+        expect(':')
+        if key in BODY_KEYS and peek() == '[':
+            pos += 1
+            if peek() == ']':
+                pos += 1
+            else:
+                while True:
+                    yield key, value()
+                    if peek() == ',':
+                        pos += 1
+                        continue
+                    expect(']')
+                    break
+        else:
+            yield key, value()
+        if peek() == ',':
+            pos += 1
+            continue
+        expect('}')
+        return
+
+
+def _skip_ws(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos] in " \t\r\n":
+        pos += 1
+    return pos
+
+
+def parse_header(text: str) -> Tuple[Optional[Dict], bool]:
+    """Parse the top-level keys before the session body from a JSON prefix
+
+    Returns (header, complete).  ``complete`` is True when parsing reached
+    the first body key or the end of the object; a prefix that ends sooner
+    gives (None, False).
+    """
+    decoder = json.JSONDecoder()
+    header = {}
+    try:
+        pos = _skip_ws(text, 0)
+        if text[pos] != '{':
+            return None, False
+        pos = _skip_ws(text, pos + 1)
+        if text[pos] == '}':
+            return header, True
+        while True:
+            key, pos = decoder.raw_decode(text, pos)
+            pos = _skip_ws(text, pos)
+            if text[pos] != ':':
+                return None, False
+            if key in BODY_KEYS:
+                return header, True
+            value, pos = decoder.raw_decode(text, _skip_ws(text, pos + 1))
+            header[key] = value
+            pos = _skip_ws(text, pos)
+            if text[pos] == '}':
+                return header, True
+            pos = _skip_ws(text, pos + 1)
+    except (ValueError, IndexError):
+        return None, False
+
+
+def read_session_header(filepath: str) -> Optional[Dict]:
+    """Read a session's header keys with a bounded partial read
+
+    Returns None if the header is not within the first few KB, e.g. in
+    files written before headers came first (their chat history precedes
+    ``updated_at`` and ``metadata``); callers then parse the whole file.
+    """
+    for size in HEADER_READ_SIZES:
+        raw = read_prefix(filepath, size)
+        header, complete = parse_header(raw.decode('utf-8', errors='ignore'))
+        if complete:
+            return header if all(key in header for key in ('session_id', 'updated_at', 'metadata')) else None
+        if len(raw) < size:
+            return None
+    return None
@@ -0,0 +1,182 @@
+"""
+Bulk export for AgenticBot history
+Streams every session, or a filtered subset, to NDJSON or a tar bundle without loading the store into memory
+"""
+
+import io
+import json
+import shutil
+import tarfile
+import tempfile
+from datetime import datetime
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, Optional
+
+from history_backends import parse_time
+from history_codec import encode_session
+from history_io import ordered_map
+
+EXPORT_FORMATS = ('ndjson', 'tar')
+
+# Manager used by pool workers; forked workers inherit it from the exporter
+_worker_manager = None
+
+
+def message_record(summary: Dict, index: int, message: Dict) -> Dict:
+    """One NDJSON record: a message tagged with its session"""
+    record = {
+        'session_id': summary['session_id'],
+        'session_title': summary.get('title'),
+        'message_index': index,
+    }
+    record.update(message)
+    return record
+
+
+def _ndjson_lines(history_manager, summary: Dict) -> Iterator[bytes]:
+    for index, message in enumerate(history_manager.iter_messages(summary['filepath'])):
+        record = message_record(summary, index, message)
+        yield (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+
+
+def _encode_ndjson(summary: Dict) -> Optional[bytes]:
+    try:
+        return b"".join(_ndjson_lines(_worker_manager, summary))
+    except Exception as e:
+        print(f"Error exporting session {summary['filepath']}: {e}")
+        return None
+
+
+def _encode_tar_member(summary: Dict) -> Optional[bytes]:
+    session_data = _worker_manager.load_session(summary['filepath'])
+    return encode_session(session_data) if session_data else None
+
+
+class SessionExporter:
+    """Streams sessions out of a HistoryManager for compliance dumps
+
+    Sessions are selected with ``session_ids`` and a ``since``/``until``
+    date range (a session matches if its lifetime overlaps the range) and
+    are read one page of summaries and one message at a time.  Archived
+    sessions are included unless ``include_archived`` is False.  A session
+    is spooled (in memory up to ``SPOOL_SIZE`` bytes, on disk beyond) and
+    only written out once it has been read completely, so a read error
+    never leaves part of a session in the output.
+
+    With ``workers`` > 1 sessions are encoded in parallel; each in-flight
+    session is then held in memory whole, but output order is unchanged.
+    """
+
+    PAGE_SIZE = 200
+    SPOOL_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, history_manager, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 session_ids: Optional[Iterable[str]] = None, include_archived: bool = True, workers: int = 1):
+        self.history_manager = history_manager
+        self.since = since
+        self.until = until
+        self.session_ids = set(session_ids) if session_ids else None
+        self.include_archived = include_archived
+        self.workers = workers
+
+    def matches(self, summary: Dict) -> bool:
+        """Check a session summary against the filters"""
+        if self.session_ids is not None and summary['session_id'] not in self.session_ids:
+            return False
+        if self.since is not None:
+            updated = parse_time(summary.get('updated_at'))
+            if updated is None or updated < self.since:
+                return False
+        if self.until is not None:
+            created = parse_time(summary.get('created_at'))
+            if created is None or created > self.until:
+                return False
+        return True
+
+    def sessions(self) -> Iterator[Dict]:
+        """Summaries of the sessions to export, most recently updated first"""
+        cursor = None
+        while True:
+            page = self.history_manager.list_sessions(limit=self.PAGE_SIZE, cursor=cursor,
+                                                      include_archived=self.include_archived)
+            for summary in page:
+                if self.matches(summary):
+                    yield summary
+            cursor = page.next_cursor
+            if cursor is None:
+                return
+
+    def _encoded(self, encode: Callable) -> Iterator:
+        """(summary, encoded bytes) per session, encoded on a pool if enabled"""
+        global _worker_manager
+        _worker_manager = self.history_manager
+        if self.workers > 1:
+            yield from ordered_map(encode, self.sessions(), self.workers)
+        else:
+            for summary in self.sessions():
+                yield summary, encode(summary)
+
+    def write_ndjson(self, out: BinaryIO) -> Dict[str, int]:
+        """Write one JSON line per message to a binary stream"""
+        stats = {'sessions': 0, 'messages': 0, 'skipped': 0, 'bytes': 0}
+        if self.workers > 1:
+            for summary, data in self._encoded(_encode_ndjson):
+                if data is None:
+                    stats['skipped'] += 1
+                    continue
+                out.write(data)
+                stats['sessions'] += 1
+                stats['messages'] += data.count(b"\n")
+                stats['bytes'] += len(data)
+            return stats
+
+        for summary in self.sessions():
+            with tempfile.SpooledTemporaryFile(max_size=self.SPOOL_SIZE) as spool:
+                # Only read errors skip a session; write errors propagate
+                messages = 0
+                try:
+                    for line in _ndjson_lines(self.history_manager, summary):
+                        spool.write(line)
+                        messages += 1
+                except Exception as e:
+                    print(f"Error exporting session {summary['filepath']}: {e}")
+                    stats['skipped'] += 1
+                    continue
+                size = spool.tell()
+                spool.seek(0)
+                shutil.copyfileobj(spool, out)
+            stats['sessions'] += 1
+            stats['messages'] += messages
+            stats['bytes'] += size
+        return stats
+
+    def write_tar(self, out: BinaryIO, compression: Optional[str] = None) -> Dict[str, int]:
+        """Write a tar stream with one ``<session_id>.json`` member per session
+
+        ``compression`` is None or 'gz'.  The tar is written as a stream, so
+        ``out`` may be a pipe; each session is encoded whole before it is
+        added, since a tar header needs the member's size.
+        """
+        stats = {'sessions': 0, 'messages': 0, 'skipped': 0, 'bytes': 0}
+        mode = f"w|{compression}" if compression else "w|"
+        with tarfile.open(fileobj=out, mode=mode) as tar:
+            for summary, data in self._encoded(_encode_tar_member):
+                if data is None:
+                    stats['skipped'] += 1
+                    continue
+                info = tarfile.TarInfo(f"{summary['session_id']}.json")
+                info.size = len(data)
+                updated = parse_time(summary.get('updated_at'))
+                info.mtime = updated.timestamp() if updated else 0
+                tar.addfile(info, io.BytesIO(data))
+                stats['sessions'] += 1
+                stats['messages'] += summary.get('total_messages', 0)
+                stats['bytes'] += len(data)
+        return stats
+
+    def export(self, out: BinaryIO, export_format: str = 'ndjson') -> Dict[str, int]:
+        """Write the selected sessions in one of EXPORT_FORMATS"""
+        if export_format == 'ndjson':
+            return self.write_ndjson(out)
+        if export_format == 'tar':
+            return self.write_tar(out)
+        raise ValueError(f"Unknown export format: {export_format!r} (expected one of {', '.join(EXPORT_FORMATS)})")
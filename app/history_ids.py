@@ -0,0 +1,63 @@
+"""
+Session ids for AgenticBot history
+New sessions get ULID-style ids that sort by creation time
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+# Crockford base32, as used by ULID (no I, L, O, U)
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ULID_LENGTH = 26
+TIME_LENGTH = 10  # 48-bit millisecond timestamp
+RANDOM_BITS = 80
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def new_session_id() -> str:
+    """Generate a unique, time-sortable session ID (ULID)
+
+    The first 10 characters encode the creation time in milliseconds, the
+    other 16 are random.  Ids made in the same millisecond by this process
+    increment the random part, so they still sort in creation order.
+    """
+    global _last_ms, _last_random
+    with _lock:
+        ms = int(time.time() * 1000)
+        if ms <= _last_ms:
+            ms = _last_ms
+            _last_random = (_last_random + 1) % (1 << RANDOM_BITS)
+        else:
+            _last_random = int.from_bytes(os.urandom(RANDOM_BITS // 8), 'big')
+        _last_ms = ms
+        return _encode(ms, TIME_LENGTH) + _encode(_last_random, ULID_LENGTH - TIME_LENGTH)
+
+
+def is_ulid(session_id) -> bool:
+    """Check whether a session id is a ULID (older sessions use 8 hex chars)"""
+    return (isinstance(session_id, str) and len(session_id) == ULID_LENGTH
+            and all(c in ALPHABET for c in session_id.upper()) and session_id[0] in "01234567")
+
+
+def session_id_time(session_id) -> Optional[datetime]:
+    """Creation time encoded in a ULID session id, or None for other ids"""
+    if not is_ulid(session_id):
+        return None
+    ms = 0
+    for c in session_id[:TIME_LENGTH].upper():
+        ms = ms * 32 + ALPHABET.index(c)
+    return datetime.fromtimestamp(ms / 1000)
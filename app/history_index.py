@@ -0,0 +1,359 @@
+"""
+Session metadata index for AgenticBot history
+Keeps the sidebar summary of every session file in one compact JSON file
+"""
+
+import base64
+import json
+import os
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from history_io import FileLock, atomic_write, path_lock
+
+SUMMARY_FIELDS = ('session_id', 'title', 'created_at', 'updated_at', 'total_messages', 'tools_used', 'image_refs')
+
+
+def build_session_summary(session_data: Dict, filepath: str) -> Dict:
+    """Build the summary dict shown in the history sidebar"""
+    metadata = session_data.get('metadata', {}) or {}
+    return {
+        'filepath': filepath,
+        'filename': os.path.basename(filepath),
+        'session_id': session_data.get('session_id', 'unknown'),
+        'title': session_data.get('title', 'Untitled Chat'),
+        'created_at': session_data.get('created_at', ''),
+        'updated_at': session_data.get('updated_at', ''),
+        'total_messages': metadata.get('total_messages', 0),
+        'tools_used': metadata.get('tools_used', []),
+        'image_refs': metadata.get('image_refs', [])
+    }
+
+
+class SessionPage(list):
+    """One page of session summaries plus the cursor of the next page
+
+    ``next_cursor`` is None on the last page.
+    """
+
+    def __init__(self, items: Iterable[Dict] = (), next_cursor: Optional[str] = None):
+        super().__init__(items)
+        self.next_cursor = next_cursor
+
+
+def encode_cursor(*key) -> str:
+    """Opaque continuation token for the position just after ``key``"""
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> list:
+    """Key encoded in a continuation token"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not isinstance(key, list):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return key
+
+
+def recency_key(summary: Dict) -> tuple:
+    """Sort key of the history listing: updated_at, then session_id to break ties"""
+    return (summary.get('updated_at') or '', str(summary.get('session_id')))
+
+
+def paginate(items: List[Dict], limit: Optional[int], cursor: Optional[str], key: Callable[[Dict], tuple]) -> SessionPage:
+    """Cut a page out of items sorted by descending ``key``
+
+    The cursor names the last item of the previous page, so a page stays
+    correct when sessions are added or removed in between requests.
+    """
+    if cursor is not None:
+        after = tuple(decode_cursor(cursor))
+        items = [item for item in items if key(item) < after]
+    if limit is None or len(items) <= limit:
+        return SessionPage(items)
+    page = items[:limit]
+    return SessionPage(page, encode_cursor(*key(page[-1])))
+
+
+class SessionIndex:
+    """Persistent summary index for a JSON history directory
+
+    Entries are keyed by the file's path relative to the history directory
+    (just the filename in the flat layout) and carry its mtime and size, so a
+    listing only has to stat the directory and re-parse files that changed
+    behind the index's back (e.g. written by another process).
+
+    Like the search index, it is persisted as a snapshot plus an
+    append-only log: ``save`` appends the entries changed since the last
+    save, and the snapshot is rewritten every ``COMPACT_AFTER`` records.
+    Writers hold ``locked()`` around load/modify/save, which also
+    serializes appends and compaction.
+    """
+
+    INDEX_FILENAME = ".index.json"
+    LOG_FILENAME = ".index.log"
+    VERSION = 2
+    COMPACT_AFTER = 500  # log records before the snapshot is rewritten
+
+    def __init__(self, history_dir: str):
+        self.history_dir = history_dir
+        self.path = os.path.join(history_dir, self.INDEX_FILENAME)
+        self.log_path = os.path.join(history_dir, self.LOG_FILENAME)
+        self.entries: Dict[str, Dict] = {}
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._log_offset = 0
+        self._log_records = 0
+        # Entries changed since the last save: key -> entry (None if removed)
+        self._pending: Dict[str, Optional[Dict]] = {}
+        # Ordered view: the newest file of each session, sorted by
+        # (updated_at, session_id, filename); kept in step with entries
+        self._order: List[Tuple[str, str, str]] = []
+        self._heads: Dict[str, Tuple[str, str, str]] = {}
+        self._files: Dict[str, Set[str]] = {}
+
+    def _rebuild_order(self):
+        """Recompute the ordered view after entries were replaced wholesale"""
+        self._order, self._heads, self._files = [], {}, {}
+        for filename, entry in self.entries.items():
+            self._files.setdefault(str(entry['session_id']), set()).add(filename)
+        for session_id in self._files:
+            self._place(session_id)
+
+    def _place(self, session_id: str):
+        """Move a session to its position in the ordered view (or drop it)"""
+        old = self._heads.pop(session_id, None)
+        if old is not None:
+            del self._order[bisect_left(self._order, old)]
+        files = self._files.get(session_id)
+        if not files:
+            self._files.pop(session_id, None)
+            return
+        head = max((self.entries[f]['updated_at'] or '', session_id, f) for f in files)
+        self._heads[session_id] = head
+        insort(self._order, head)
+
+    def _set_entry(self, filename: str, entry: Dict):
+        self._drop_entry(filename)
+        self.entries[filename] = entry
+        session_id = str(entry['session_id'])
+        self._files.setdefault(session_id, set()).add(filename)
+        self._place(session_id)
+        self._pending[filename] = entry
+
+    def _drop_entry(self, filename: str) -> bool:
+        entry = self.entries.pop(filename, None)
+        if entry is None:
+            return False
+        session_id = str(entry['session_id'])
+        self._files.get(session_id, set()).discard(filename)
+        self._place(session_id)
+        self._pending[filename] = None
+        return True
+
+    def _snapshot_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load_snapshot(self, stamp: Optional[Tuple[int, int]]):
+        """Replace the entries with the snapshot's and read the log from its start"""
+        entries = {}
+        if stamp is not None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == self.VERSION:
+                    entries = data.get('entries', {})
+            except Exception as e:
+                print(f"Error loading history index {self.path}: {e}")
+        self.entries = entries
+        self._rebuild_order()
+        self._stamp = stamp
+        self._log_offset = 0
+        self._log_records = 0
+
+    def load(self):
+        """Bring the index up to date with its snapshot and log"""
+        stamp = self._snapshot_stamp()
+        if stamp != self._stamp:
+            self._load_snapshot(stamp)
+        self._replay_log()
+        # Whatever was loaded is already on disk
+        self._pending = {}
+
+    def _replay_log(self):
+        """Apply log records appended since the last read (by any process)"""
+        try:
+            size = os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            return
+        if size < self._log_offset:
+            # Log was compacted by another process; reload from scratch
+            self._load_snapshot(self._snapshot_stamp())
+        if size == self._log_offset:
+            return
+
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._log_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partially written record, pick it up next time
+                self._log_offset += len(line)
+                self._log_records += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('v') != self.VERSION:
+                    continue
+                if record.get('entry') is None:
+                    self._drop_entry(record['key'])
+                else:
+                    self._set_entry(record['key'], record['entry'])
+
+    def locked(self) -> FileLock:
+        """Lock to hold around load/modify/save so concurrent updates are not lost"""
+        return path_lock(self.path)
+
+    def save(self):
+        """Append the entries changed since the last load or save to the log
+
+        The caller holds ``locked()``.
+        """
+        if not self._pending:
+            return
+        lines = "".join(
+            json.dumps({'key': key, 'entry': entry, 'v': self.VERSION}, ensure_ascii=False, separators=(',', ':')) + "\n"
+            for key, entry in self._pending.items())
+        self._pending = {}
+        with open(self.log_path, 'ab') as f:
+            f.write(lines.encode('utf-8'))
+            self._log_offset = f.tell()
+        self._log_records += lines.count("\n")
+        if self._log_records >= self.COMPACT_AFTER:
+            self.compact()
+
+    def compact(self):
+        """Fold the log into a fresh snapshot; the caller holds ``locked()``"""
+        data = json.dumps({'version': self.VERSION, 'entries': self.entries}, ensure_ascii=False, separators=(',', ':'))
+        atomic_write(self.path, data, fsync=False)
+        open(self.log_path, 'w').close()
+        stat = os.stat(self.path)
+        self._stamp = (stat.st_mtime_ns, stat.st_size)
+        self._log_offset = 0
+        self._log_records = 0
+
+    @staticmethod
+    def file_stamp(filepath: str) -> Tuple[int, int]:
+        """Return the (mtime_ns, size) pair used to validate an entry"""
+        stat = os.stat(filepath)
+        return stat.st_mtime_ns, stat.st_size
+
+    def key(self, filepath: str) -> str:
+        """Index key of a session file: its path relative to the history directory"""
+        return os.path.relpath(filepath, self.history_dir)
+
+    def update(self, filepath: str, session_data: Dict, stamp: Optional[Tuple[int, int]] = None):
+        """Record the summary of a session that was just written"""
+        summary = build_session_summary(session_data, filepath)
+        entry = {field: summary[field] for field in SUMMARY_FIELDS}
+        entry['mtime'], entry['size'] = stamp or self.file_stamp(filepath)
+        self._set_entry(self.key(filepath), entry)
+
+    def remove(self, filepath: str) -> bool:
+        """Drop the entry for a deleted file"""
+        return self._drop_entry(self.key(filepath))
+
+    def rename(self, filepath: str, target: str, stamp: Tuple[int, int]) -> bool:
+        """Carry an entry over to a file that was moved"""
+        entry = self.entries.get(self.key(filepath))
+        if entry is None:
+            return False
+        self._drop_entry(self.key(filepath))
+        self._set_entry(self.key(target), dict(entry, mtime=stamp[0], size=stamp[1]))
+        return True
+
+    def is_stale(self, stamps: Dict[str, Tuple[int, int]]) -> bool:
+        """True if a directory scan disagrees with the index"""
+        if len(stamps) != len(self.entries):
+            return True
+        for filename, (mtime, size) in stamps.items():
+            entry = self.entries.get(filename)
+            if not entry or entry['mtime'] != mtime or entry['size'] != size:
+                return True
+        return False
+
+    def refresh(self, stamps: Dict[str, Tuple[int, int]], reader: Callable[[str], Optional[Dict]]) -> bool:
+        """Reconcile entries with a directory scan; return True if anything changed
+
+        ``stamps`` maps index keys to (mtime_ns, size).  Only files that are new
+        or whose stamp differs from the index are read.
+        """
+        changed = False
+        for filename in list(self.entries):
+            if filename not in stamps:
+                self._drop_entry(filename)
+                changed = True
+
+        for filename, (mtime, size) in stamps.items():
+            entry = self.entries.get(filename)
+            if entry and entry['mtime'] == mtime and entry['size'] == size:
+                continue
+            filepath = os.path.join(self.history_dir, filename)
+            session_data = reader(filepath)
+            if session_data:
+                self.update(filepath, session_data, (mtime, size))
+            else:
+                self._drop_entry(filename)
+            changed = True
+        return changed
+
+    def files_for(self, session_id) -> List[str]:
+        """Paths of every file holding a session, newest first"""
+        files = self._files.get(str(session_id), ())
+        ordered = sorted(((self.entries[f]['updated_at'] or '', f) for f in files), reverse=True)
+        return [os.path.join(self.history_dir, f) for _, f in ordered]
+
+    def file_counts(self) -> Dict[str, int]:
+        """Number of files holding each session_id"""
+        return {session_id: len(files) for session_id, files in self._files.items()}
+
+    def duplicates(self) -> List[str]:
+        """Paths of every file that is not the newest copy of its session"""
+        return [path for session_id, files in self._files.items() if len(files) > 1
+                for path in self.files_for(session_id)[1:]]
+
+    def summaries(self) -> List[Dict]:
+        """Return one summary per session_id, most recently updated first"""
+        return self.page()
+
+    def page(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> SessionPage:
+        """One page of summaries, newest first, starting after ``cursor``
+
+        Served from the ordered view, so the cost is a binary search plus
+        the size of the page, not the number of sessions.
+        """
+        end = len(self._order)
+        if cursor is not None:
+            end = bisect_left(self._order, tuple(decode_cursor(cursor)))
+        start = 0 if limit is None else max(0, end - limit)
+        heads = self._order[start:end][::-1]
+
+        page = SessionPage(self._summary(filename) for _, _, filename in heads)
+        if start > 0 and heads:
+            page.next_cursor = encode_cursor(*heads[-1][:2])
+        return page
+
+    def _summary(self, filename: str) -> Dict:
+        entry = self.entries[filename]
+        summary = {
+            'filepath': os.path.join(self.history_dir, filename),
+            'filename': os.path.basename(filename),
+        }
+        summary.update({field: entry[field] for field in SUMMARY_FIELDS})
+        return summary
@@ -0,0 +1,125 @@
+"""
+File I/O helpers for AgenticBot history
+Atomic replace-on-write, advisory file locks and an ordered worker pool shared by the history modules
+"""
+
+import hashlib
+import multiprocessing
+import os
+import tempfile
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:  # POSIX
+    msvcrt = None
+
+LOCK_DIRNAME = ".locks"
+LOCK_STRIPES = 64
+
+
+def atomic_write(path: str, data: Union[str, bytes], fsync: bool = True):
+    """Write a file so readers see either the old or the new content, never a mix
+
+    The data goes to a uniquely named temporary file in the same directory,
+    which is then renamed over the target.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data.encode('utf-8') if isinstance(data, str) else data)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class FileLock:
+    """Advisory lock on a lock file, usable across threads and processes
+
+    Uses ``fcntl.flock`` on POSIX and ``msvcrt.locking`` on Windows (where
+    shared locks are taken as exclusive).  Every acquisition opens its own
+    file handle, so two threads of one process exclude each other as well.
+    """
+
+    def __init__(self, path: str, shared: bool = False):
+        self.path = path
+        self.shared = shared
+        self._file = None
+
+    def __enter__(self) -> 'FileLock':
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, 'a+b')
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+def session_lock(history_dir: str, session_id, shared: bool = False) -> FileLock:
+    """Lock guarding one session's files
+
+    Sessions are hashed onto a fixed set of lock files, so writers of
+    different sessions rarely contend and the lock directory stays small.
+    """
+    stripe = int(hashlib.md5(str(session_id).encode('utf-8')).hexdigest(), 16) % LOCK_STRIPES
+    return FileLock(os.path.join(history_dir, LOCK_DIRNAME, f"session-{stripe:02d}.lock"), shared)
+
+
+def path_lock(path: str, shared: bool = False) -> FileLock:
+    """Lock guarding a single shared file such as an index"""
+    return FileLock(os.path.join(os.path.dirname(path), LOCK_DIRNAME, os.path.basename(path) + ".lock"), shared)
+
+
+def _make_executor(workers: int) -> Executor:
+    """Process pool where workers can be forked, thread pool elsewhere"""
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+    return ThreadPoolExecutor(workers)
+
+
+def ordered_map(func: Callable, items: Iterable, workers: int) -> Iterator:
+    """Apply func to items on a worker pool, yielding results in input order
+
+    At most ``2 * workers`` items are in flight at once, so memory stays
+    bounded however many items there are.
+    """
+    with _make_executor(workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append((item, executor.submit(func, item)))
+            if len(pending) >= 2 * workers:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
@@ -0,0 +1,217 @@
+"""
+Append-only session journal for AgenticBot history
+Each save appends new messages, log entries and tool events instead of rewriting the session file
+"""
+
+import json
+import os
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Header records carry the same top-level keys as the snapshot header
+from history_codec import HEADER_KEYS
+
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_TAIL_BYTES = 65536
+
+
+def journal_path(filepath: str) -> str:
+    """Path of the journal that belongs to a session snapshot"""
+    return filepath + JOURNAL_SUFFIX
+
+
+def new_snapshot_id() -> str:
+    """Random id tying a journal to the snapshot it extends"""
+    return uuid.uuid4().hex
+
+
+class JournalState:
+    """What has been persisted for one session, used to decide what to append
+
+    The persisted messages, logs and tool events are kept as shallow copies of the saved
+    lists; comparing against them is cheap because list equality short-cuts
+    on identical objects.  Replace a saved message dict rather than editing
+    it in place if the change has to reach disk.
+
+    ``stamp`` is the (mtime_ns, size) of the session files after the last
+    write this process made; if they no longer match, someone else wrote to
+    them and the state has to be re-read before appending.
+    """
+
+    def __init__(self, snapshot_id: Optional[str] = None):
+        self.snapshot_id = snapshot_id
+        self.messages: List[Dict] = []
+        self.logs: List[Dict] = []
+        self.tool_events: List[Dict] = []
+        self.records = 0
+        self.stamp = None
+
+    @classmethod
+    def from_session(cls, session_data: Dict, snapshot_id: Optional[str], records: int = 0) -> 'JournalState':
+        """State after a session was fully materialized"""
+        state = cls(snapshot_id)
+        state.messages = list(session_data.get('chat_history', []))
+        state.logs = list(session_data.get('agentic_logs', []))
+        state.tool_events = list(session_data.get('tool_events') or [])
+        state.records = records
+        return state
+
+    @staticmethod
+    def _extends(items: List[Dict], persisted: List[Dict]) -> bool:
+        """True if items is the persisted list plus new entries at the end"""
+        return len(items) >= len(persisted) and items[:len(persisted)] == persisted
+
+    def diff(self, session_data: Dict) -> Optional[List[Dict]]:
+        """Journal records that bring the persisted session up to session_data
+
+        Returns None when messages were edited or removed rather than appended,
+        in which case a new snapshot has to be written.  Agentic logs are
+        cleared at the start of every query, so a non-extending log list is
+        journaled as a reset followed by the new entries; tool events are
+        journaled the same way.
+        """
+        messages = session_data.get('chat_history', [])
+        if not self._extends(messages, self.messages):
+            return None
+
+        records = [{'op': 'message', 'data': message} for message in messages[len(self.messages):]]
+        logs = session_data.get('agentic_logs', [])
+        if self._extends(logs, self.logs):
+            records.extend({'op': 'log', 'data': log} for log in logs[len(self.logs):])
+        else:
+            records.append({'op': 'logs_reset'})
+            records.extend({'op': 'log', 'data': log} for log in logs)
+        events = session_data.get('tool_events') or []
+        if self._extends(events, self.tool_events):
+            records.extend({'op': 'tool_event', 'data': event} for event in events[len(self.tool_events):])
+        else:
+            records.append({'op': 'tool_events_reset'})
+            records.extend({'op': 'tool_event', 'data': event} for event in events)
+        records.append({'op': 'header', 'data': {key: session_data.get(key) for key in HEADER_KEYS}})
+        return records
+
+    def apply(self, records: List[Dict]):
+        """Advance the state past records that were just appended"""
+        for record in records:
+            op = record['op']
+            if op == 'message':
+                self.messages.append(record['data'])
+            elif op == 'log':
+                self.logs.append(record['data'])
+            elif op == 'logs_reset':
+                self.logs = []
+            elif op == 'tool_event':
+                self.tool_events.append(record['data'])
+            elif op == 'tool_events_reset':
+                self.tool_events = []
+        self.records += len(records)
+
+
+def append_records(filepath: str, snapshot_id: str, records: List[Dict], start: bool = False):
+    """Append records to a session's journal, one JSON document per line
+
+    A new journal starts with a ``base`` record naming the snapshot it extends,
+    so a journal left behind by an interrupted compaction is never replayed
+    onto the wrong snapshot.
+    """
+    lines = []
+    if start:
+        lines.append(json.dumps({'op': 'base', 'snapshot_id': snapshot_id}) + "\n")
+    lines.extend(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n" for record in records)
+    with open(journal_path(filepath), 'a', encoding='utf-8') as f:
+        f.write("".join(lines))
+
+
+def iter_journal_records(filepath: str, snapshot_id: Optional[str]) -> Iterator[Dict]:
+    """Records of a session's journal in order, read one line at a time
+
+    Nothing is yielded if the journal extends a different snapshot.  A
+    trailing partial line (a write still in progress) is ignored.
+    """
+    try:
+        f = open(journal_path(filepath), 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return
+    with f:
+        for position, line in enumerate(f):
+            if not line.endswith("\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if position == 0:
+                if record.get('op') != 'base' or record.get('snapshot_id') != snapshot_id:
+                    return
+                continue
+            yield record
+
+
+def replay_journal(filepath: str, session_data: Dict) -> int:
+    """Apply a session's journal to its loaded snapshot in place
+
+    Returns the number of records applied.
+    """
+    snapshot_id = (session_data.get('metadata') or {}).get('snapshot_id')
+    applied = 0
+    for record in iter_journal_records(filepath, snapshot_id):
+        op = record.get('op')
+        if op == 'message':
+            session_data.setdefault('chat_history', []).append(record['data'])
+        elif op == 'log':
+            session_data.setdefault('agentic_logs', []).append(record['data'])
+        elif op == 'logs_reset':
+            session_data['agentic_logs'] = []
+        elif op == 'tool_event':
+            session_data.setdefault('tool_events', []).append(record['data'])
+        elif op == 'tool_events_reset':
+            session_data['tool_events'] = []
+        elif op == 'header':
+            header = dict(record['data'])
+            header['metadata'] = dict(header.get('metadata') or {}, snapshot_id=snapshot_id)
+            session_data.update(header)
+        applied += 1
+    return applied
+
+
+def read_journal_header(filepath: str, snapshot_id: Optional[str]) -> Tuple[bool, Optional[Dict]]:
+    """Latest header record of a session's journal, read from its tail
+
+    Returns (found, header): (True, None) when there is no journal to apply,
+    (True, header) when the last header record is within the final
+    ``JOURNAL_TAIL_BYTES``, and (False, None) when the journal has to be
+    replayed in full to know.
+    """
+    try:
+        f = open(journal_path(filepath), 'rb')
+    except FileNotFoundError:
+        return True, None
+    with f:
+        try:
+            base = json.loads(f.readline(4096))
+        except ValueError:
+            return True, None
+        if base.get('op') != 'base' or base.get('snapshot_id') != snapshot_id:
+            return True, None
+
+        body_start = f.tell()
+        start = max(body_start, os.fstat(f.fileno()).st_size - JOURNAL_TAIL_BYTES)
+        f.seek(start)
+        lines = f.read().split(b"\n")
+    # The last piece is empty or a write in progress; the first may be cut off
+    complete = lines[:-1] if start == body_start else lines[1:-1]
+    for line in reversed(complete):
+        if b'"op":"header"' in line:
+            try:
+                return True, json.loads(line)['data']
+            except ValueError:
+                continue
+    return start == body_start, None
+
+
+def remove_journal(filepath: str):
+    """Delete a session's journal if it exists"""
+    try:
+        os.remove(journal_path(filepath))
+    except FileNotFoundError:
+        pass
@@ -3,19 +3,61 @@ History Manager for AgenticBot
 Handles saving, loading, and managing chat session history
 """
 
+import base64
+import heapq
 import json
 import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-import uuid
-import glob
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Any, Tuple, Union
+
+from blob_store import BlobStore
+from history_analytics import UsageAnalytics, session_seconds, tool_counts
+from history_archive import ARCHIVE_DIRNAME, ArchiveStore
+from history_changes import ChangeFeed
+from history_backends import UNNAMED_SESSION_IDS, HistoryBackend, create_backend, session_filename
+from history_codec import strip_compression_suffix
+from history_ids import new_session_id
+from history_index import SessionPage, build_session_summary, decode_cursor, encode_cursor, paginate, recency_key
+from history_records import as_dict, as_dicts
+from history_search import SearchIndex, index_key, make_snippet, tokenize
+from history_semantic import SemanticIndex
 
 class HistoryManager:
     """Manages chat history persistence and retrieval"""
     
-    def __init__(self, history_dir: str = "history"):
+    # Sessions whose record-to-dict conversions are kept between saves
+    MAX_CONVERTED_SESSIONS = 8
+    
+    def __init__(self, history_dir: str = "history", backend: Union[str, HistoryBackend] = "json", **backend_options):
         self.history_dir = history_dir
         self.ensure_history_dir()
+        if isinstance(backend, str):
+            backend = create_backend(backend, history_dir, **backend_options)
+        self.backend = backend
+        self.search_index = SearchIndex(history_dir)
+        self.semantic_index = SemanticIndex(history_dir)
+        self.analytics = UsageAnalytics(history_dir)
+        self.changes = ChangeFeed(history_dir)
+        self.blob_store = BlobStore(os.path.join(history_dir, "blobs"))
+        self.archive = ArchiveStore(os.path.join(history_dir, ARCHIVE_DIRNAME))
+        self.backend.on_change = self.note_change
+        # Guards the in-memory state of the indexes, archive manifest and change
+        # feed, which threads sharing this manager (Streamlit tabs, the session
+        # writer, the retention engine) would otherwise update at once.  Session
+        # files are read outside it.
+        self.lock = threading.RLock()
+        # Ids handed out by generate_session_id and not saved yet
+        self._minted = set()
+        self._minted_lock = threading.Lock()
+        # History state each search index was last synced against
+        self._synced: Dict[str, tuple] = {}
+        # Last (records, dicts) saved per session and field; reusing those dicts
+        # keeps a save from rebuilding every message and lets the journal diff
+        # match the persisted prefix by identity
+        self._converted: "OrderedDict[str, Dict[str, tuple]]" = OrderedDict()
     
     def ensure_history_dir(self):
         """Create history directory if it doesn't exist"""
@@ -23,22 +65,20 @@ class HistoryManager:
             os.makedirs(self.history_dir)
     
     def generate_session_id(self) -> str:
-        """Generate a unique session ID"""
-        return str(uuid.uuid4())[:8]
+        """Generate a unique, time-sortable session ID (ULID)"""
+        session_id = new_session_id()
+        with self._minted_lock:
+            self._minted.add(session_id)
+        return session_id
     
     def generate_filename(self, session_id: str) -> str:
         """Generate filename for a session"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        return f"chat_{timestamp}_{session_id}.json"
+        return session_filename(session_id)
     
     def find_existing_session_file(self, session_id: str) -> Optional[str]:
-        """Find existing session file by session_id"""
-        if not session_id:
-            return None
-        
-        pattern = os.path.join(self.history_dir, f"chat_*_{session_id}.json")
-        files = glob.glob(pattern)
-        return files[0] if files else None
+        """Find existing session file by session_id (or its archive locator)"""
+        with self.lock:
+            return self.backend.find_session(session_id) or self.archive.find(session_id)
     
     def generate_title(self, chat_history: List[Dict]) -> str:
         """Generate a title from the first user message"""
@@ -54,199 +94,468 @@ class HistoryManager:
     
     def save_session(self, session_data: Dict) -> str:
         """Save a chat session to file"""
-        try:
-            session_id = session_data.get('session_id')
-            
-            # For existing sessions, find and update the existing file
-            if session_id:
-                existing_file = self.find_existing_session_file(session_id)
-                if existing_file:
-                    filepath = existing_file
-                else:
-                    # Session ID exists but no file found, create new file
-                    filename = self.generate_filename(session_id)
-                    filepath = os.path.join(self.history_dir, filename)
-            else:
-                # New session, generate new ID and file
-                session_id = self.generate_session_id()
-                filename = self.generate_filename(session_id)
-                filepath = os.path.join(self.history_dir, filename)
-            
-            # Update metadata
-            session_data.update({
-                'session_id': session_id,
-                'updated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'metadata': {
-                    'total_messages': len(session_data.get('chat_history', [])),
-                    'tools_used': self.extract_tools_used(session_data.get('agentic_logs', [])),
-                    'session_duration': self.calculate_duration(session_data)
-                }
-            })
-            
-            # Generate title if not provided
-            if not session_data.get('title'):
-                session_data['title'] = self.generate_title(session_data.get('chat_history', []))
-            
-            # Ensure created_at exists
-            if not session_data.get('created_at'):
-                session_data['created_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(session_data, f, indent=2, ensure_ascii=False)
-            
-            return filepath
-            
-        except Exception as e:
-            print(f"Error saving session: {e}")
-            return None
+        with self.lock:
+            try:
+                session_id = session_data.get('session_id')
+                
+                # New session, generate new ID (never write a chat_..._None.json)
+                if not session_id or str(session_id) in UNNAMED_SESSION_IDS:
+                    session_id = self.generate_session_id()
+                
+                # Message and log records become plain dicts at the storage boundary
+                session_data['agentic_logs'] = self.convert_records(session_id, session_data, 'agentic_logs')
+                if session_data.get('tool_events'):
+                    session_data['tool_events'] = self.convert_records(session_id, session_data, 'tool_events')
+                # Move inline images to the blob store
+                chat_history = self.externalize_images(self.convert_records(session_id, session_data, 'chat_history'))
+                
+                # Update metadata
+                session_data.update({
+                    'session_id': session_id,
+                    'updated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'chat_history': chat_history,
+                    'metadata': {
+                        'total_messages': len(chat_history),
+                        'tools_used': self.extract_tools_used(session_data.get('agentic_logs', []), session_data.get('tool_events')),
+                        'session_duration': self.calculate_duration(session_data),
+                        'image_refs': sorted({m['image_ref'] for m in chat_history if m.get('image_ref')})
+                    }
+                })
+                
+                # Generate title if not provided
+                if not session_data.get('title'):
+                    session_data['title'] = self.generate_title(session_data.get('chat_history', []))
+                
+                # Ensure created_at exists
+                if not session_data.get('created_at'):
+                    session_data['created_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                
+                with self._minted_lock:
+                    new = session_id in self._minted
+                filepath = self.backend.write_session(session_data, new=new)
+                if filepath:
+                    with self._minted_lock:
+                        self._minted.discard(session_id)
+                    self.index_session(session_data)
+                return filepath
+                
+            except Exception as e:
+                print(f"Error saving session: {e}")
+                return None
     
-    def load_session(self, filepath: str) -> Optional[Dict]:
-        """Load a chat session from file"""
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading session {filepath}: {e}")
-            return None
-    
-    def list_sessions(self) -> List[Dict]:
-        """List all chat sessions with metadata"""
-        sessions = []
-        pattern = os.path.join(self.history_dir, "chat_*.json")
+    def index_session(self, session_data: Dict):
+        """Bring the indexes, analytics, archive and change feed up to date with a session just written
         
-        # Use a dict to deduplicate by session_id
-        session_dict = {}
+        save_session calls this; tools writing prepared sessions straight to
+        the backend (see history_migration) call it for each session.
+        """
+        with self.lock:
+            session_id = session_data['session_id']
+            self.search_index.add_session(session_data)
+            # The semantic index embeds lazily, when a semantic search syncs it
+            try:
+                self.analytics.add_session(session_data)
+            except Exception as e:
+                print(f"Error updating usage analytics: {e}")
+            # A session continued after being archived is active again
+            if self.archive.find(session_id):
+                self.archive.remove(session_id)
+            self.note_change('save', session_id)
+    
+    def resolve_archived(self, filepath: str) -> Optional[str]:
+        """Archive locator for an archive locator or the id of an archived session"""
+        with self.lock:
+            if self.archive.is_locator(filepath):
+                return filepath
+            return self.archive.find(filepath)
+    
+    def load_session(self, filepath: str) -> Optional[Dict]:
+        """Load a chat session from file (or from the archive, by locator or session id)"""
+        locator = self.resolve_archived(filepath)
+        if locator:
+            return self.archive.read(locator)
+        return self.backend.read_session(filepath)
+    
+    def load_messages(self, filepath: str, start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+        """Load messages ``start:stop`` of a session
         
-        for filepath in glob.glob(pattern):
-            session_data = self.load_session(filepath)
-            if session_data:
-                session_id = session_data.get('session_id', 'unknown')
-                session_info = {
-                    'filepath': filepath,
-                    'filename': os.path.basename(filepath),
-                    'session_id': session_id,
-                    'title': session_data.get('title', 'Untitled Chat'),
-                    'created_at': session_data.get('created_at', ''),
-                    'updated_at': session_data.get('updated_at', ''),
-                    'total_messages': session_data.get('metadata', {}).get('total_messages', 0),
-                    'tools_used': session_data.get('metadata', {}).get('tools_used', [])
-                }
-                
-                # Keep only the most recent version of each session_id
-                if session_id not in session_dict or session_info['updated_at'] > session_dict[session_id]['updated_at']:
-                    session_dict[session_id] = session_info
+        Archived sessions decode only that range of their bundle; active
+        ones stream past the earlier messages.
+        """
+        locator = self.resolve_archived(filepath)
+        if locator:
+            return self.archive.read_messages(locator, start, stop) or []
+        if start < 0 or (stop is not None and stop < 0):
+            session_data = self.backend.read_session(filepath)
+            return session_data['chat_history'][start:stop] if session_data else []
+        return list(islice(self.backend.iter_messages(filepath), start, stop))
+    
+    def load_session_header(self, filepath: str) -> Optional[Dict]:
+        """Load a session's title, timestamps and metadata without its messages"""
+        with self.lock:
+            locator = self.resolve_archived(filepath)
+            if locator:
+                return self.archive.header(locator)
+        return self.backend.read_header(filepath)
+    
+    def iter_messages(self, filepath: str) -> Iterator[Dict]:
+        """Stream a session's messages one at a time (see history_export for bulk exports)"""
+        locator = self.resolve_archived(filepath)
+        if locator:
+            return self.archive.iter_messages(locator)
+        return self.backend.iter_messages(filepath)
+    
+    def list_sessions(self, limit: Optional[int] = None, cursor: Optional[str] = None,
+                      include_archived: bool = False) -> SessionPage:
+        """List chat sessions with metadata, newest first
         
-        # Convert back to list and sort by updated_at (most recent first)
-        sessions = list(session_dict.values())
-        sessions.sort(key=lambda x: x['updated_at'], reverse=True)
-        return sessions
+        With ``limit`` one page is returned; its ``next_cursor`` (None on the
+        last page) fetches the next one.  Archived sessions (marked with
+        ``archived: True``) are only listed with ``include_archived``.
+        """
+        with self.lock:
+            if not include_archived:
+                return self.backend.list_sessions(limit, cursor)
+            # Both listings are sorted already; merging them from the cursor on
+            # keeps each page proportional to its size, not to the history's
+            archived = (summary for summary in self._paged(self.archive.page, limit, cursor)
+                        if self.backend.find_session(summary['session_id'], sync=False) is None)
+            merged = heapq.merge(self._paged(self.backend.list_sessions, limit, cursor), archived,
+                                 key=recency_key, reverse=True)
+            if limit is None:
+                return SessionPage(merged)
+            sessions = list(islice(merged, limit + 1))
+            if len(sessions) <= limit:
+                return SessionPage(sessions)
+            return SessionPage(sessions[:limit], encode_cursor(*recency_key(sessions[limit - 1])))
+    
+    @staticmethod
+    def _paged(list_page: Callable[..., SessionPage], limit: Optional[int], cursor: Optional[str]) -> Iterator[Dict]:
+        """Summaries of a paginated listing from ``cursor`` on, fetched ``limit + 1`` at a time"""
+        while True:
+            page = list_page(None if limit is None else limit + 1, cursor)
+            yield from page
+            cursor = page.next_cursor
+            if cursor is None:
+                return
+    
+    def session_summary(self, session_id: str, include_archived: bool = False) -> Optional[Dict]:
+        """Listing summary of one session, None if it is gone (or archived, unless ``include_archived``)"""
+        with self.lock:
+            filepath = self.backend.find_session(session_id)
+            if filepath:
+                header = self.backend.read_header(filepath)
+                return build_session_summary(header, filepath) if header else None
+            return self.archive.summary(session_id) if include_archived else None
     
     def delete_session(self, filepath: str) -> bool:
         """Delete a chat session file"""
-        try:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-                return True
-            return False
-        except Exception as e:
-            print(f"Error deleting session {filepath}: {e}")
-            return False
+        with self.lock:
+            parsed = self.archive.parse_locator(filepath)
+            if parsed is not None:
+                deleted = self.archive.remove(parsed[1])
+                session_id = parsed[1]
+            else:
+                header = self.backend.read_header(filepath)
+                deleted = self.backend.delete_session(filepath)
+                session_id = header.get('session_id') if header else None
+            if deleted:
+                self.note_change('delete', session_id)
+            # Usage stats keep counting a session until its last copy is gone
+            if deleted and session_id and not self.find_existing_session_file(session_id):
+                self.forget_usage(session_id)
+            return deleted
     
     def delete_all_session_files(self, session_id: str) -> int:
         """Delete all files for a given session_id (to clean up duplicates)"""
-        deleted_count = 0
-        pattern = os.path.join(self.history_dir, f"chat_*_{session_id}.json")
-        
-        for filepath in glob.glob(pattern):
-            try:
-                os.remove(filepath)
+        with self.lock:
+            deleted_count = self.backend.delete_all_session_files(session_id)
+            if self.archive.remove(session_id):
                 deleted_count += 1
+            if deleted_count:
+                self.note_change('delete', session_id)
+                self.forget_usage(session_id)
+            return deleted_count
+    
+    def note_change(self, op: str, session_id: Optional[str] = None):
+        """Record a change in the cross-process change feed (see history_changes)"""
+        with self.lock:
+            try:
+                self.changes.record(op, session_id)
+            except Exception as e:
+                print(f"Error recording history change: {e}")
+    
+    def changes_since(self, generation: int) -> Optional[List[Dict]]:
+        """Changes made by any process after ``generation``; None if too old to tell"""
+        with self.lock:
+            return self.changes.changes_since(generation)
+    
+    def forget_usage(self, session_id: str):
+        """Drop a deleted session from the usage analytics"""
+        with self.lock:
+            try:
+                self.analytics.remove_session(session_id)
             except Exception as e:
-                print(f"Error deleting {filepath}: {e}")
+                print(f"Error updating usage analytics: {e}")
+    
+    def usage_summary(self, days: Optional[int] = 30) -> Dict:
+        """Usage rollups across all sessions, without reading any session file"""
+        with self.lock:
+            return self.analytics.summary(days)
+    
+    def backfill_analytics(self) -> int:
+        """Count sessions saved before usage analytics existed; returns sessions counted
         
-        return deleted_count
+        Reads every session not yet counted, so run it once (the Streamlit
+        stats panel offers a button), not per query.
+        """
+        with self.lock:
+            return self.analytics.sync(self.list_sessions(include_archived=True), self.load_session)
     
-    def search_sessions(self, query: str) -> List[Dict]:
-        """Search sessions by title or content"""
-        query = query.lower()
-        sessions = self.list_sessions()
-        filtered_sessions = []
+    def search_sessions(self, query: str, mode: str = 'index', limit: Optional[int] = None,
+                        cursor: Optional[str] = None, fuzzy: bool = False) -> SessionPage:
+        """Search sessions by title or content
         
-        for session_meta in sessions:
-            # Check title
-            if query in session_meta['title'].lower():
-                filtered_sessions.append(session_meta)
-                continue
+        ``mode='index'`` answers from the inverted index (whole words, with the
+        last word matched as a prefix); ``mode='ranked'`` orders sessions
+        matching any query word by BM25 relevance and attaches a snippet of
+        the best-matching message; ``mode='semantic'`` does the same by
+        cosine similarity of local embeddings, so paraphrases match too;
+        ``mode='substring'`` scans every session for the raw query string.
+        With ``fuzzy`` the index and ranked modes also match words a typo or
+        two away from the query's.  Results are paged like ``list_sessions``.
+        """
+        with self.lock:
+            if mode == 'semantic' and tokenize(query):
+                generation = self.changes.generation()
+                sessions = self.list_sessions(include_archived=True)
+                self._sync_search_index('semantic', lambda: self._sync_semantic_index(sessions, generation), sessions, generation)
+                return self.semantic_sessions(query, sessions, limit, cursor)
+            
+            if mode in ('index', 'ranked') and tokenize(query):
+                generation = self.changes.generation()
+                sessions = self.list_sessions(include_archived=True)
+                self._sync_search_index('search', lambda: self.search_index.sync(sessions, self.load_session), sessions, generation)
+                if mode == 'ranked':
+                    return self.rank_sessions(query, sessions, limit, cursor, fuzzy)
+                matches = self.search_index.match(query, fuzzy)
+                results = [s for s in sessions if index_key(s['session_id']) in matches]
+                return paginate(results, limit, cursor, recency_key)
+            
+            query = query.lower()
+            sessions = self.list_sessions(include_archived=True)
+            if cursor is not None:
+                sessions = paginate(sessions, None, cursor, recency_key)
+            filtered_sessions = []
+            
+            for session_meta in sessions:
+                # Check title
+                if query in session_meta['title'].lower():
+                    filtered_sessions.append(session_meta)
+                    continue
+                
+                # Check content
+                session_data = self.load_session(session_meta['filepath'])
+                if session_data:
+                    for message in session_data.get('chat_history', []):
+                        if query in message.get('content', '').lower():
+                            filtered_sessions.append(session_meta)
+                            break
+                
+                # Stop opening sessions once the page is full and we know more follow
+                if limit is not None and len(filtered_sessions) > limit:
+                    break
             
-            # Check content
-            session_data = self.load_session(session_meta['filepath'])
-            if session_data:
-                for message in session_data.get('chat_history', []):
-                    if query in message.get('content', '').lower():
-                        filtered_sessions.append(session_meta)
-                        break
+            return paginate(filtered_sessions, limit, None, recency_key)
+    
+    def _sync_search_index(self, name: str, sync: Callable[[], None], sessions: List[Dict], generation: int):
+        """Run a search index's sync, unless nothing changed since its last one
+        
+        ``generation`` is the change feed's, read before ``sessions`` were
+        listed.  Saves through any manager move the change feed; edits by
+        other tools show up as a different session count or newest session.
+        """
+        state = (generation, len(sessions), recency_key(sessions[0]) if sessions else None)
+        if self._synced.get(name) == state:
+            return
+        sync()
+        self._synced[name] = state
+    
+    def _sync_semantic_index(self, sessions: List[Dict], generation: int, workers: int = 1):
+        """Embed what changed since the semantic index was last synced
+        
+        Saves do not embed, and updated_at has one-second resolution, so
+        sessions the change feed names since the index's recorded
+        generation are re-checked even when their updated_at matches.
+        """
+        self.semantic_index.load()
+        changed = self.changes.changed_sessions(self.semantic_index.generation)
+        self.semantic_index.sync(sessions, self.load_session, workers, changed=changed or set(), generation=generation)
+    
+    def rank_sessions(self, query: str, sessions: List[Dict], limit: Optional[int] = None,
+                      cursor: Optional[str] = None, fuzzy: bool = False) -> SessionPage:
+        """Order sessions by BM25 score and add a highlighted snippet to each hit
+        
+        Only the returned hits are opened to cut their snippets, so the cost
+        of previews is bounded by ``limit`` rather than the size of history.
+        """
+        with self.lock:
+            by_key = {index_key(s['session_id']): s for s in sessions}
+            expansions = self.search_index.expand(query, fuzzy)
+            ranked = [(score, key) for key, score in self.search_index.rank(query, expansions=expansions) if key in by_key]
+            # Highlight the words that actually matched, typos included
+            highlight = sorted({term for alternatives in expansions for term in alternatives}) if fuzzy else None
+            return self._ranked_page(query, ranked, by_key, limit, cursor,
+                                     lambda session_key: self.search_index.best_message(session_key, query, expansions=expansions),
+                                     highlight)
+    
+    def semantic_sessions(self, query: str, sessions: List[Dict], limit: Optional[int] = None,
+                          cursor: Optional[str] = None) -> SessionPage:
+        """Order sessions by embedding similarity to the query, with snippets like rank_sessions"""
+        with self.lock:
+            by_key = {index_key(s['session_id']): s for s in sessions}
+            # Without a cursor only the top of the ranking is needed
+            k = limit + 1 if limit is not None and cursor is None else None
+            matches = {key: (score, message_index) for key, score, message_index in self.semantic_index.search(query, k)
+                       if key in by_key}
+            ranked = [(score, key) for key, (score, _) in matches.items()]
+            return self._ranked_page(query, ranked, by_key, limit, cursor, lambda session_key: matches[session_key][1])
+    
+    def _ranked_page(self, query: str, ranked: List[Tuple[float, str]], by_key: Dict[str, Dict], limit: Optional[int],
+                     cursor: Optional[str], best_message: Callable[[str], Optional[int]],
+                     highlight: Optional[List[str]] = None) -> SessionPage:
+        """Page (score, session_key) hits best first and attach snippets to the page
+        
+        Snippets highlight the query words (the last as a prefix) plus any
+        ``highlight`` terms.
+        """
+        ranked.sort(reverse=True)
+        if cursor is not None:
+            after = tuple(decode_cursor(cursor))
+            ranked = [item for item in ranked if item < after]
+        next_cursor = None
+        if limit is not None and len(ranked) > limit:
+            ranked = ranked[:limit]
+            next_cursor = encode_cursor(*ranked[-1])
+        
+        terms = tokenize(query)
+        highlight_terms = terms[:-1] + (highlight or [])
+        results = SessionPage(next_cursor=next_cursor)
+        for score, session_key in ranked:
+            hit = dict(by_key[session_key], score=score, message_index=None)
+            message_index = best_message(session_key)
+            # Only the matching message is read, not the whole session
+            messages = self.load_messages(hit['filepath'], message_index, message_index + 1) if message_index is not None else []
+            if messages:
+                content = messages[0].get('content', '')
+                hit['message_index'] = message_index
+            else:
+                content = hit['title']
+            hit['snippet'], hit['snippet_offsets'] = make_snippet(content, highlight_terms, terms[-1])
+            results.append(hit)
+        return results
+    
+    def backfill_semantic_index(self, workers: int = 1) -> int:
+        """Embed every session not yet in the semantic index, on ``workers`` processes
+        
+        Returns the number of sessions in the index afterwards.
+        """
+        with self.lock:
+            generation = self.changes.generation()
+            self._sync_semantic_index(self.list_sessions(include_archived=True), generation, workers)
+            return len(self.semantic_index.sessions)
+    
+    def convert_records(self, session_id: str, session_data: Dict, key: str) -> List[Dict]:
+        """Storage dicts for session_data[key], converting only records the last save did not"""
+        items = list(session_data.get(key) or [])
+        converted = self._converted.setdefault(session_id, {})
+        self._converted.move_to_end(session_id)
+        while len(self._converted) > self.MAX_CONVERTED_SESSIONS:
+            self._converted.popitem(last=False)
+        dicts = as_dicts(items, converted.get(key))
+        converted[key] = (items, dicts)
+        return dicts
+    
+    def externalize_images(self, chat_history: List[Dict]) -> List[Dict]:
+        """Replace base64 image_data in messages with blob store references
         
-        return filtered_sessions
-    
-    def extract_tools_used(self, agentic_logs: List[Dict]) -> List[str]:
-        """Extract unique tools used from agentic logs"""
-        tools = set()
-        for log in agentic_logs:
-            message = log.get('message', '').lower()
-            if 'search agent' in message:
-                tools.add('web_search')
-            elif 'web extraction agent' in message:
-                tools.add('web_scraping')
-            elif 'research agent' in message:
-                tools.add('deep_research')
-            elif 'image generation agent' in message:
-                tools.add('image_generation')
-        return list(tools)
+        Returns the original list when nothing needed converting; converted
+        messages are new dicts so the caller's objects are left untouched.
+        """
+        if not any(message.get('image_data') for message in chat_history):
+            return chat_history
+        converted = []
+        for message in chat_history:
+            image_data = message.get('image_data')
+            if image_data:
+                message = {key: value for key, value in message.items() if key != 'image_data'}
+                message['image_ref'] = self.blob_store.put_base64(image_data)
+            converted.append(message)
+        return converted
+    
+    def load_image(self, message: Dict) -> Optional[bytes]:
+        """Image bytes for a message (dict or ChatMessage), read lazily from the blob store"""
+        message = as_dict(message)
+        if message.get('image_ref'):
+            return self.blob_store.get(message['image_ref'])
+        if message.get('image_data'):
+            return base64.b64decode(message['image_data'])
+        return None
+    
+    def gc_blobs(self, grace_seconds: float = 3600) -> int:
+        """Delete stored images that no session references any more"""
+        with self.lock:
+            referenced = set()
+            for session in self.list_sessions(include_archived=True):
+                referenced.update(session.get('image_refs', []))
+            return self.blob_store.gc(referenced, grace_seconds)
+    
+    def extract_tools_used(self, agentic_logs: List[Dict], tool_events: Optional[List[Dict]] = None) -> List[str]:
+        """Unique tools a session used, from its tool events (older sessions: inferred from its logs)"""
+        return sorted(tool_counts({'agentic_logs': agentic_logs, 'tool_events': tool_events}))
     
     def calculate_duration(self, session_data: Dict) -> str:
         """Calculate session duration"""
-        try:
-            created = session_data.get('created_at')
-            updated = session_data.get('updated_at')
-            if created and updated:
-                start = datetime.strptime(created, "%Y-%m-%d %H:%M:%S")
-                end = datetime.strptime(updated, "%Y-%m-%d %H:%M:%S")
-                duration = end - start
-                hours, remainder = divmod(duration.total_seconds(), 3600)
-                minutes, seconds = divmod(remainder, 60)
-                return f"{int(hours):02d}:{int(minutes):02d}:{int(seconds):02d}"
-        except:
-            pass
-        return "00:00:00"
+        total = session_seconds(session_data)
+        if total is None:
+            return "00:00:00"
+        hours, remainder = divmod(total, 3600)
+        minutes, seconds = divmod(remainder, 60)
+        return f"{int(hours):02d}:{int(minutes):02d}:{int(seconds):02d}"
     
     def export_session(self, filepath: str, export_format: str = 'json') -> Optional[str]:
-        """Export session in different formats"""
-        session_data = self.load_session(filepath)
-        if not session_data:
-            return None
+        """Export session in different formats
         
-        base_name = os.path.splitext(os.path.basename(filepath))[0]
+        The txt export streams messages instead of loading the session.
+        """
+        base_name = os.path.splitext(strip_compression_suffix(os.path.basename(filepath)))[0]
         
         if export_format == 'json':
+            session_data = self.load_session(filepath)
+            if not session_data:
+                return None
             export_path = os.path.join(self.history_dir, f"{base_name}_export.json")
             with open(export_path, 'w', encoding='utf-8') as f:
                 json.dump(session_data, f, indent=2, ensure_ascii=False)
             return export_path
         
         elif export_format == 'txt':
+            header = self.load_session_header(filepath)
+            if not header:
+                return None
             export_path = os.path.join(self.history_dir, f"{base_name}_export.txt")
             with open(export_path, 'w', encoding='utf-8') as f:
-                f.write(f"AgenticBot Chat Session: {session_data.get('title', 'Untitled')}\n")
-                f.write(f"Created: {session_data.get('created_at', 'Unknown')}\n")
-                f.write(f"Updated: {session_data.get('updated_at', 'Unknown')}\n")
+                f.write(f"AgenticBot Chat Session: {header.get('title', 'Untitled')}\n")
+                f.write(f"Created: {header.get('created_at', 'Unknown')}\n")
+                f.write(f"Updated: {header.get('updated_at', 'Unknown')}\n")
                 f.write("=" * 50 + "\n\n")
                 
-                for message in session_data.get('chat_history', []):
+                for message in self.iter_messages(filepath):
                     role = "You" if message['role'] == 'user' else "AgenticBot"
                     timestamp = message.get('timestamp', '')
                     f.write(f"[{timestamp}] {role}: {message['content']}\n\n")
                     
-                    if message.get('image_data'):
+                    if message.get('image_data') or message.get('image_ref'):
                         f.write("[Image was generated in this response]\n\n")
             
             return export_path
@@ -254,56 +563,51 @@ class HistoryManager:
         return None
     
     def cleanup_old_sessions(self, max_sessions: int = 50) -> int:
-        """Remove old sessions if count exceeds maximum"""
-        sessions = self.list_sessions()
-        if len(sessions) <= max_sessions:
-            return 0
+        """Remove old sessions if count exceeds maximum
         
-        # Keep most recent sessions, delete oldest
-        sessions_to_delete = sessions[max_sessions:]
-        deleted_count = 0
-        
-        for session in sessions_to_delete:
-            if self.delete_session(session['filepath']):
-                deleted_count += 1
-        
-        return deleted_count
+        This deletes; to keep old sessions searchable, archive them with
+        history_retention.RetentionEngine instead.
+        """
+        with self.lock:
+            sessions = self.list_sessions()
+            if len(sessions) <= max_sessions:
+                return 0
+            
+            # Keep most recent sessions, delete oldest
+            sessions_to_delete = sessions[max_sessions:]
+            deleted_count = 0
+            
+            for session in sessions_to_delete:
+                if self.delete_session(session['filepath']):
+                    deleted_count += 1
+            
+            return deleted_count
     
     def cleanup_duplicate_sessions(self) -> int:
         """Clean up duplicate session files (keep only the most recent for each session_id)"""
-        pattern = os.path.join(self.history_dir, "chat_*.json")
-        session_files = {}
-        deleted_count = 0
-        
-        # Group files by session_id
-        for filepath in glob.glob(pattern):
-            session_data = self.load_session(filepath)
-            if session_data:
-                session_id = session_data.get('session_id', 'unknown')
-                updated_at = session_data.get('updated_at', '')
-                
-                if session_id not in session_files:
-                    session_files[session_id] = []
-                
-                session_files[session_id].append({
-                    'filepath': filepath,
-                    'updated_at': updated_at,
-                    'session_data': session_data
-                })
-        
-        # For each session_id, keep only the most recent file
-        for session_id, files in session_files.items():
-            if len(files) > 1:
-                # Sort by updated_at, keep the most recent
-                files.sort(key=lambda x: x['updated_at'], reverse=True)
-                files_to_delete = files[1:]  # All except the most recent
-                
-                for file_info in files_to_delete:
-                    try:
-                        os.remove(file_info['filepath'])
-                        deleted_count += 1
-                        print(f"Removed duplicate: {file_info['filepath']}")
-                    except Exception as e:
-                        print(f"Error deleting duplicate {file_info['filepath']}: {e}")
-        
-        return deleted_count 
\ No newline at end of file
+        with self.lock:
+            deleted_count = self.backend.cleanup_duplicate_sessions()
+            if deleted_count:
+                self.note_change('reset')
+            return deleted_count
+    
+    def session_file_counts(self) -> Dict[str, int]:
+        """Number of stored files per session_id, read from session headers only"""
+        with self.lock:
+            return self.backend.session_file_counts()
+    
+    def convert_sessions(self) -> Dict[str, int]:
+        """Rewrite stored sessions in the configured compression (see compress_history.py)"""
+        with self.lock:
+            counts = self.backend.convert_sessions()
+            if counts.get('converted'):
+                self.note_change('reset')
+            return counts
+    
+    def relocate_sessions(self) -> Dict[str, int]:
+        """Move stored sessions into the configured directory layout (see shard_history.py)"""
+        with self.lock:
+            counts = self.backend.relocate_sessions()
+            if counts.get('moved'):
+                self.note_change('reset')
+            return counts
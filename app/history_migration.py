@@ -0,0 +1,183 @@
+"""
+Migration between AgenticBot history backends
+Streams sessions from one backend to another in batches, resumably
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from history_index import decode_cursor, recency_key
+from history_io import atomic_write
+
+
+class HistoryMigration:
+    """Copies every active session from one HistoryManager's backend to another's
+
+    Sessions are read a page at a time in recency order and written in
+    batches, keeping their timestamps, so they bypass ``save_session``;
+    ``index_session`` then updates the destination's search index,
+    analytics and change feed for each one.  After each batch the source
+    cursor is saved to ``checkpoint_path``, so an interrupted run picks up
+    after the last completed batch.  Sessions updated since the
+    interrupted run started have moved ahead of that cursor, so a resumed
+    run first re-checks the head of the listing down to that time.  A
+    session the destination already holds with the same or a newer
+    ``updated_at`` is skipped, which makes re-runs cheap and keeps the
+    newest copy of each session.  Images referenced by migrated sessions
+    are copied when the two managers use different blob stores.
+
+    Archived sessions are not migrated: the archive lives in its own
+    directory and works with either backend.
+    """
+
+    def __init__(self, source, destination, batch_size: int = 100, checkpoint_path: Optional[str] = None):
+        self.source = source
+        self.destination = destination
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path
+
+    # --- Checkpoint ---
+
+    def _checkpoint_key(self) -> Dict:
+        return {
+            'source': f"{type(self.source.backend).__name__}:{os.path.abspath(self.source.history_dir)}",
+            'destination': f"{type(self.destination.backend).__name__}:{os.path.abspath(self.destination.history_dir)}",
+        }
+
+    def load_checkpoint(self) -> Optional[Dict]:
+        """Progress of an interrupted run between the same backends, if any"""
+        if not self.checkpoint_path:
+            return None
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error reading migration checkpoint {self.checkpoint_path}: {e}")
+            return None
+        if {key: checkpoint.get(key) for key in ('source', 'destination')} != self._checkpoint_key():
+            return None
+        return checkpoint
+
+    def save_checkpoint(self, cursor: str, started: str, report: Dict):
+        """Record that every session before ``cursor`` and not updated since ``started`` has been handled"""
+        if not self.checkpoint_path:
+            return
+        checkpoint = dict(self._checkpoint_key(), cursor=cursor, started=started,
+                          migrated=report['migrated'], skipped=report['skipped'], failed=report['failed'])
+        atomic_write(self.checkpoint_path, json.dumps(checkpoint))
+
+    def clear_checkpoint(self):
+        """Forget progress once a run has finished"""
+        if self.checkpoint_path:
+            try:
+                os.remove(self.checkpoint_path)
+            except FileNotFoundError:
+                pass
+
+    # --- Copying ---
+
+    def is_current(self, summary: Dict) -> bool:
+        """Check whether the destination already has this session at least as new"""
+        backend = self.destination.backend
+        locator = backend.find_session(summary['session_id'])
+        if locator is None:
+            return False
+        header = backend.read_header(locator)
+        return header is not None and (header.get('updated_at') or '') >= (summary.get('updated_at') or '')
+
+    def copy_images(self, session_data: Dict):
+        """Copy blobs a session references into the destination's blob store"""
+        source_blobs, destination_blobs = self.source.blob_store, self.destination.blob_store
+        if os.path.abspath(source_blobs.root) == os.path.abspath(destination_blobs.root):
+            return
+        for message in session_data.get('chat_history', []):
+            ref = message.get('image_ref')
+            if ref and not destination_blobs.exists(ref):
+                data = source_blobs.get(ref)
+                if data is not None:
+                    destination_blobs.put(data)
+
+    def migrate_batch(self, summaries: List[Dict], report: Dict):
+        """Copy one page of source sessions"""
+        batch = []
+        for summary in summaries:
+            if self.is_current(summary):
+                report['skipped'] += 1
+                continue
+            session_data = self.source.backend.read_session(summary['filepath'])
+            if not session_data:
+                report['failed'] += 1
+                continue
+            self.copy_images(session_data)
+            batch.append(session_data)
+        if not batch:
+            return
+        try:
+            self.destination.backend.write_sessions(batch)
+            report['migrated'] += len(batch)
+        except Exception as e:
+            print(f"Error writing migration batch: {e}")
+            report['failed'] += len(batch)
+            return
+        for session_data in batch:
+            self.destination.index_session(session_data)
+
+    def catch_up(self, checkpoint: Dict, report: Dict) -> int:
+        """Migrate sessions updated after an interrupted run started
+
+        Such sessions moved ahead of its cursor in the recency order, so
+        resuming from the cursor alone would skip them.  Only the head of
+        the listing down to the run's start (or to the cursor) is read;
+        returns the number of sessions looked at.
+        """
+        cursor_key = tuple(decode_cursor(checkpoint['cursor']))
+        since = checkpoint.get('started') or ''
+        cursor, handled = None, 0
+        while True:
+            page = self.source.backend.list_sessions(limit=self.batch_size, cursor=cursor)
+            recent = [summary for summary in page
+                      if (summary.get('updated_at') or '') >= since and recency_key(summary) > cursor_key]
+            # Sessions still current were counted by the earlier run
+            self.migrate_batch([summary for summary in recent if not self.is_current(summary)], report)
+            handled += len(recent)
+            cursor = page.next_cursor
+            if len(recent) < len(page) or cursor is None:
+                return handled
+
+    def run(self, progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Migrate all sessions, resuming from the checkpoint if there is one
+
+        Returns counts of migrated, skipped (already current) and failed
+        sessions plus the elapsed time and throughput of this run.
+        """
+        report = {'migrated': 0, 'skipped': 0, 'failed': 0, 'resumed': False}
+        started = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        start = time.perf_counter()
+        handled = 0
+        checkpoint = self.load_checkpoint()
+        cursor = None
+        if checkpoint is not None:
+            cursor = checkpoint['cursor']
+            report.update({key: checkpoint[key] for key in ('migrated', 'skipped', 'failed')}, resumed=True)
+            handled += self.catch_up(checkpoint, report)
+
+        while True:
+            page = self.source.backend.list_sessions(limit=self.batch_size, cursor=cursor)
+            self.migrate_batch(page, report)
+            handled += len(page)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+            self.save_checkpoint(cursor, started, report)
+            if progress is not None:
+                progress(report)
+        self.clear_checkpoint()
+
+        report['seconds'] = time.perf_counter() - start
+        report['sessions_per_second'] = handled / report['seconds'] if report['seconds'] > 0 else 0.0
+        return report
@@ -0,0 +1,135 @@
+"""
+Packed archive files for cold AgenticBot sessions
+One read-only file per bundle of zlib-compressed spans with an offset table, read through mmap
+"""
+
+import json
+import mmap
+import struct
+import zlib
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+MAGIC = b"AGBPACK1"
+VERSION = 1
+# magic, offset of the session table, its length
+HEADER = struct.Struct("<8sQQ")
+OFFSET = struct.Struct("<Q")
+# Messages compressed together; a range read decompresses only the blocks it overlaps
+BLOCK_MESSAGES = 32
+
+
+def _encode(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def write_pack(f: BinaryIO, sessions: Iterable[Dict], block_messages: int = BLOCK_MESSAGES) -> int:
+    """Write sessions to a seekable binary file as a pack; return its size
+
+    Layout: a fixed header, then per session its zlib-compressed header
+    JSON (everything but ``chat_history``), its messages in zlib-compressed
+    blocks of ``block_messages`` comma-terminated JSON values, and the
+    little-endian uint64 offsets of those blocks (one more than the block
+    count, so block ``i`` spans ``offsets[i]:offsets[i + 1]``).  A JSON
+    table at the end maps session ids to these spans.
+    """
+    f.write(HEADER.pack(MAGIC, 0, 0))
+    position = HEADER.size
+    table = {}
+    for session_data in sessions:
+        header = zlib.compress(_encode({key: value for key, value in session_data.items() if key != 'chat_history'}))
+        f.write(header)
+        header_span = [position, len(header)]
+        position += len(header)
+
+        messages = session_data.get('chat_history', [])
+        offsets = [position]
+        for start in range(0, len(messages), block_messages):
+            blob = zlib.compress(b"".join(_encode(message) + b',' for message in messages[start:start + block_messages]))
+            f.write(blob)
+            position += len(blob)
+            offsets.append(position)
+        f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        table[str(session_data['session_id'])] = {'header': header_span, 'messages': [position, len(messages)],
+                                                  'block': block_messages}
+        position += OFFSET.size * len(offsets)
+
+    table_blob = _encode({'version': VERSION, 'sessions': table})
+    f.write(table_blob)
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, position, len(table_blob)))
+    return position + len(table_blob)
+
+
+class PackReader:
+    """Memory-mapped view of a pack file
+
+    Opening reads only the header and the session table; sessions and
+    message ranges are decompressed from their own byte spans (a range
+    only from the blocks it overlaps), so the rest of the file is never
+    paged in.  Packs are immutable, so a reader can be
+    kept open and shared between threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, table_offset, table_length = HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a session pack")
+            table = json.loads(self._mmap[table_offset:table_offset + table_length])
+            if table.get('version') != VERSION:
+                raise ValueError(f"Unsupported pack version in {path}: {table.get('version')}")
+        except BaseException:
+            self._mmap.close()
+            raise
+        self.sessions: Dict[str, Dict] = table['sessions']
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self) -> 'PackReader':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __contains__(self, session_id) -> bool:
+        return str(session_id) in self.sessions
+
+    def message_count(self, session_id) -> int:
+        """Number of messages stored for a session"""
+        return self.sessions[str(session_id)]['messages'][1]
+
+    def read_header(self, session_id) -> Dict:
+        """A session without its chat_history"""
+        offset, length = self.sessions[str(session_id)]['header']
+        return json.loads(zlib.decompress(self._mmap[offset:offset + length]))
+
+    def read_messages(self, session_id, start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+        """Decode messages ``start:stop`` of a session (slice semantics)"""
+        entry = self.sessions[str(session_id)]
+        index_offset, count = entry['messages']
+        block = entry['block']
+        start, stop, _ = slice(start, stop).indices(count)
+        if start >= stop:
+            return []
+        first, last = start // block, (stop - 1) // block + 1
+        offsets = struct.unpack_from(f"<{last - first + 1}Q", self._mmap, index_offset + OFFSET.size * first)
+        raw = b"".join(zlib.decompress(self._mmap[begin:end]) for begin, end in zip(offsets, offsets[1:]))
+        # The blocks hold "m1,m2,...,mN," - drop the last comma to decode them as one array
+        messages = json.loads(b"[" + raw[:-1] + b"]")
+        return messages[start - first * block:stop - first * block]
+
+    def iter_messages(self, session_id, chunk_size: int = 256) -> Iterator[Dict]:
+        """Stream a session's messages, decoding ``chunk_size`` at a time"""
+        count = self.message_count(session_id)
+        for start in range(0, count, chunk_size):
+            yield from self.read_messages(session_id, start, start + chunk_size)
+
+    def read_session(self, session_id) -> Dict:
+        """A whole session"""
+        session_data = self.read_header(session_id)
+        session_data['chat_history'] = self.read_messages(session_id)
+        return session_data
@@ -0,0 +1,142 @@
+"""
+Compact record types for AgenticBot chat state
+Slotted, immutable messages and log entries, converted to plain dicts only at the storage boundary
+"""
+
+import sys
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+MESSAGE_FIELDS = ('role', 'content', 'timestamp', 'image_ref', 'image_data')
+LOG_FIELDS = ('timestamp', 'type', 'message')
+
+
+def _intern(value):
+    # Roles and log types repeat in every record; share one string object each
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _extra(data: Dict, known: Iterable[str]) -> Optional[Dict]:
+    """Keys a record type has no field for, kept so they survive a round trip"""
+    extra = {key: value for key, value in data.items() if key not in known}
+    return extra or None
+
+
+@dataclass(frozen=True, slots=True)
+class ChatMessage:
+    """One chat message
+
+    ``image_data`` only appears on legacy sessions that embedded base64
+    images; new messages reference the blob store with ``image_ref``.
+    """
+
+    role: str
+    content: str
+    timestamp: Optional[str] = None
+    image_ref: Optional[str] = None
+    image_data: Optional[str] = None
+    extra: Optional[Dict] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ChatMessage':
+        return cls(_intern(data.get('role')), data.get('content', ''), data.get('timestamp'),
+                   data.get('image_ref'), data.get('image_data'), _extra(data, MESSAGE_FIELDS))
+
+    def to_dict(self) -> Dict:
+        data = {'role': self.role, 'content': self.content}
+        if self.timestamp is not None:
+            data['timestamp'] = self.timestamp
+        if self.image_ref is not None:
+            data['image_ref'] = self.image_ref
+        if self.image_data is not None:
+            data['image_data'] = self.image_data
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+@dataclass(frozen=True, slots=True)
+class LogEntry:
+    """One agentic activity log line
+
+    ``full_message`` (timestamp prefix plus message) is derived rather than
+    stored, and written out only when converting to a dict.
+    """
+
+    type: str
+    message: str
+    timestamp: str = ""
+    extra: Optional[Dict] = None
+
+    @property
+    def full_message(self) -> str:
+        return f"{self.timestamp}{self.message}"
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LogEntry':
+        entry = cls(_intern(data.get('type', '')), data.get('message', ''), data.get('timestamp') or "",
+                    _extra(data, LOG_FIELDS + ('full_message',)))
+        full_message = data.get('full_message')
+        if full_message is not None and full_message != entry.full_message:
+            # Hand-edited or foreign logs: keep what was stored
+            entry = cls(entry.type, entry.message, entry.timestamp, dict(entry.extra or {}, full_message=full_message))
+        return entry
+
+    def to_dict(self) -> Dict:
+        data = {'timestamp': self.timestamp, 'type': self.type, 'message': self.message,
+                'full_message': self.full_message}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+@dataclass(frozen=True, slots=True)
+class ToolEvent:
+    """One tool invocation shown in the tool/action trace"""
+
+    tool: str
+    summary: str
+    timestamp: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ToolEvent':
+        return cls(_intern(data.get('tool', '')), data.get('summary', ''), data.get('timestamp'))
+
+    def to_dict(self) -> Dict:
+        return {'tool': self.tool, 'summary': self.summary, 'timestamp': self.timestamp}
+
+
+Record = Union[ChatMessage, LogEntry, ToolEvent]
+
+
+def as_dict(item: Union[Record, Dict]) -> Dict:
+    """A storage dict for a record; dicts pass through unchanged"""
+    return item if isinstance(item, dict) else item.to_dict()
+
+
+def as_dicts(items: Iterable[Union[Record, Dict]],
+             previous: Optional[Tuple[List, List[Dict]]] = None) -> List[Dict]:
+    """Storage dicts for a list of records and/or dicts
+
+    ``previous`` is the ``(items, dicts)`` pair of an earlier conversion of
+    the same list.  The leading items it already converted (the same objects)
+    reuse their dicts, so only new records are built.
+    """
+    items = list(items)
+    reused = []
+    if previous:
+        old_items, old_dicts = previous
+        count = min(len(items), len(old_items), len(old_dicts))
+        done = 0
+        while done < count and items[done] is old_items[done]:
+            done += 1
+        reused = old_dicts[:done]
+    return reused + [item if isinstance(item, dict) else item.to_dict() for item in items[len(reused):]]
+
+
+def messages_from_dicts(messages: Iterable[Dict]) -> List[ChatMessage]:
+    return [ChatMessage.from_dict(message) for message in messages]
+
+
+def logs_from_dicts(logs: Iterable[Dict]) -> List[LogEntry]:
+    return [LogEntry.from_dict(log) for log in logs]
@@ -0,0 +1,156 @@
+"""
+Retention engine for AgenticBot history
+Moves cold sessions from the active history into archive bundles, a batch at a time
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+
+class RetentionPolicy:
+    """Which sessions count as cold
+
+    A session is cold if it was last modified more than ``max_age_days``
+    ago, if it falls outside the ``max_sessions`` most recent ones, or if
+    the more recent sessions already take up ``max_bytes``.  Limits left at
+    None are not applied.  Sessions are ranked by ``session_id``: only the
+    newest copy of a duplicated session counts, and older copies are left
+    to ``cleanup_duplicate_sessions``.
+    """
+
+    def __init__(self, max_age_days: Optional[float] = None, max_sessions: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        self.max_age_days = max_age_days
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any limit is set"""
+        return any(limit is not None for limit in (self.max_age_days, self.max_sessions, self.max_bytes))
+
+    @classmethod
+    def from_env(cls, max_age_days: Optional[float] = None, max_sessions: Optional[int] = None,
+                 max_bytes: Optional[int] = None) -> 'RetentionPolicy':
+        """Policy from AGENTICBOT_RETENTION_DAYS, _MAX_SESSIONS and _MAX_MB (no limits unless set)"""
+        def read(name, default, convert):
+            value = os.getenv(name)
+            if value is None:
+                return default
+            return convert(value) if value.strip() else None
+
+        max_mb = read("AGENTICBOT_RETENTION_MAX_MB", None, float)
+        return cls(
+            max_age_days=read("AGENTICBOT_RETENTION_DAYS", max_age_days, float),
+            max_sessions=read("AGENTICBOT_RETENTION_MAX_SESSIONS", max_sessions, int),
+            max_bytes=int(max_mb * 1024 * 1024) if max_mb is not None else max_bytes,
+        )
+
+    def select(self, listing: List[Dict], now: Optional[datetime] = None) -> List[Dict]:
+        """Cold entries of a most-recent-first listing, oldest first"""
+        now = now or datetime.now()
+        cutoff = now - timedelta(days=self.max_age_days) if self.max_age_days is not None else None
+        cold = []
+        total_bytes = 0
+        seen = set()
+        rank = 0
+        for entry in listing:
+            session_id = entry.get('session_id')
+            if session_id is not None:
+                if session_id in seen:
+                    continue  # older duplicate copy
+                seen.add(session_id)
+            total_bytes += entry.get('size', 0)
+            if ((self.max_sessions is not None and rank >= self.max_sessions)
+                    or (cutoff is not None and entry['modified'] < cutoff)
+                    or (self.max_bytes is not None and total_bytes > self.max_bytes)):
+                cold.append(entry)
+            rank += 1
+        cold.reverse()
+        return cold
+
+
+class RetentionEngine:
+    """Archives cold sessions incrementally, optionally on a background thread
+
+    Each ``run_once`` archives at most ``batch_size`` of the oldest cold
+    sessions into one bundle, so a large backlog is worked off in small
+    steps instead of one long pause.
+    """
+
+    def __init__(self, history_manager, policy: RetentionPolicy, batch_size: int = 50, interval: float = 300):
+        self.history_manager = history_manager
+        self.policy = policy
+        self.batch_size = batch_size
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        """Archive one batch of cold sessions; return how many were archived"""
+        backend = self.history_manager.backend
+        archive = self.history_manager.archive
+        # Index and manifest state is shared with the manager's other threads;
+        # sessions are read and packed outside its lock
+        with self.history_manager.lock:
+            cold = self.policy.select(backend.listing())[:self.batch_size]
+
+        batch = []
+        for entry in cold:
+            session_data = backend.read_session(entry['filepath'])
+            if session_data:
+                batch.append((entry, session_data))
+        if not batch:
+            return 0
+
+        with self.history_manager.lock:
+            # Sessions another process archived meanwhile keep that process's entry
+            bundle = archive.add([session_data for _, session_data in batch], replace=False)
+            archived = 0
+            for entry, session_data in batch:
+                session_id = session_data['session_id']
+                # Only drop the active copy if nobody saved the session meanwhile
+                if backend.delete_session(entry['filepath'], expected_stamp=entry['stamp']):
+                    archived += 1
+                    self.history_manager.note_change('archive', session_id)
+                elif backend.find_session(session_id) is not None:
+                    # Saved meanwhile: the active copy wins, and this pass's entry (only) is discarded
+                    archive.remove(session_id, bundle=bundle)
+                # Otherwise the file was already gone (archived by another engine);
+                # whichever entry the manifest holds for it stays
+            archive.prune(bundle)
+        return archived
+
+    def run_until_done(self) -> int:
+        """Archive batches until nothing is cold any more"""
+        total = 0
+        while not self._stop.is_set():
+            archived = self.run_once()
+            total += archived
+            if archived < self.batch_size:
+                break
+        return total
+
+    def start(self) -> 'RetentionEngine':
+        """Run the engine every ``interval`` seconds on a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="history-retention", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the background thread after its current batch"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_until_done()
+            except Exception as e:
+                print(f"Error applying history retention: {e}")
+            self._stop.wait(self.interval)
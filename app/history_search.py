@@ -0,0 +1,539 @@
+"""
+Full-text search index for AgenticBot history
+Tokenized inverted index over session titles and message content, with BM25 ranking
+"""
+
+import bisect
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from history_io import atomic_write, path_lock
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+TAG_RE = re.compile(r"<[^>]+>")
+
+# BM25 parameters; matches in the title add TITLE_BOOST times the term's idf
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_BOOST = 2.0
+
+# Fuzzy matches (terms within a few edits of a query term) score this fraction of an exact match
+FUZZY_WEIGHT = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens"""
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def max_edits(term: str, prefix: bool = False) -> int:
+    """Typos tolerated in a query term: none for short words, more for long ones
+
+    A word still being typed (matched as a prefix) gets at most one.
+    """
+    if len(term) < 4:
+        return 0
+    return 1 if len(term) < 8 or prefix else 2
+
+
+def trigrams(term: str, prefix: bool = False) -> Set[str]:
+    """Distinct trigrams of a term padded with two leading and one trailing space
+
+    With ``prefix`` the trailing pad is left off, giving only trigrams that
+    every word starting with the term also has.
+    """
+    padded = f"  {term}" if prefix else f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int, prefix: bool = False) -> Optional[int]:
+    """Levenshtein distance between a and b, or None if it exceeds limit
+
+    With ``prefix`` this is the distance from a to the closest prefix of b.
+    """
+    if not prefix and abs(len(a) - len(b)) > limit:
+        return None
+    if prefix:
+        b = b[:len(a) + limit]
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return None
+        previous = current
+    distance = min(previous) if prefix else previous[-1]
+    return distance if distance <= limit else None
+
+
+def texts_digest(texts: List[str]) -> str:
+    """Fingerprint of a list of message texts"""
+    digest = hashlib.sha1()
+    for text in texts:
+        digest.update(text.encode('utf-8') + b"\0")
+    return digest.hexdigest()
+
+
+def index_key(session_id) -> str:
+    """Normalize a session_id for use as a JSON object key"""
+    return str(session_id)
+
+
+def make_snippet(content: str, terms: List[str], prefix: Optional[str] = None, width: int = 160) -> Tuple[str, List[Tuple[int, int]]]:
+    """Cut a plain-text window around the first match of any term
+
+    Returns the snippet and the (start, end) offsets of every match inside it.
+    HTML tags are stripped first since assistant replies are HTML-formatted.
+    """
+    text = " ".join(TAG_RE.sub(" ", content or "").split())
+    alternatives = [re.escape(term) + r"\b" for term in terms]
+    if prefix:
+        alternatives.append(re.escape(prefix) + r"\w*")
+    if not alternatives:
+        return text[:width], []
+    pattern = re.compile(r"\b(?:" + "|".join(alternatives) + ")", re.IGNORECASE)
+
+    first = pattern.search(text)
+    start = 0
+    if first and first.start() > width // 3:
+        start = first.start() - width // 3
+    end = min(len(text), start + width)
+    snippet = text[start:end]
+    offsets = [(m.start(), m.end()) for m in pattern.finditer(snippet)]
+    if start > 0:
+        snippet = "…" + snippet
+        offsets = [(s + 1, e + 1) for s, e in offsets]
+    if end < len(text):
+        snippet += "…"
+    return snippet, offsets
+
+
+class SearchIndex:
+    """Inverted index persisted as a snapshot plus an append-only update log
+
+    The snapshot stores the forward index (per-session term frequencies) and
+    the postings lists are rebuilt in memory when it is loaded.  Each
+    ``add_session``/``remove_session`` appends one line to the log, so keeping
+    the index current costs the size of one session rather than the corpus.
+
+    Documents also record their token count and, per term, which messages
+    contain it, so BM25 statistics (N, avgdl, df) are always at hand and the
+    best-matching message is known without opening the session.  They also
+    keep the number of messages indexed and a digest of their text: a save
+    that only added messages logs just the postings of the new ones.
+    """
+
+    INDEX_FILENAME = ".search_index.json"
+    LOG_FILENAME = ".search_index.log"
+    VERSION = 2
+    COMPACT_AFTER = 500  # log records before the snapshot is rewritten
+
+    def __init__(self, history_dir: str):
+        self.history_dir = history_dir
+        self.path = os.path.join(history_dir, self.INDEX_FILENAME)
+        self.log_path = os.path.join(history_dir, self.LOG_FILENAME)
+        self.docs: Dict[str, Dict] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.title_postings: Dict[str, Set[str]] = {}
+        self.term_trigrams: Dict[str, Set[str]] = {}
+        self.total_length = 0
+        self._vocabulary: Optional[List[str]] = None
+        self._stamp = None
+        self._log_offset = 0
+        self._log_records = 0
+
+    # --- Persistence ---
+
+    def load(self):
+        """Bring the in-memory index up to date with the files on disk"""
+        try:
+            stat = os.stat(self.path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stamp = None
+
+        if stamp != self._stamp:
+            self._reset()
+            if stamp is not None:
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    if data.get('version') == self.VERSION:
+                        for session_key, doc in data.get('docs', {}).items():
+                            self._add_doc(session_key, doc)
+                except Exception as e:
+                    print(f"Error loading search index {self.path}: {e}")
+            self._stamp = stamp
+        self._replay_log()
+
+    def _reset(self):
+        self.docs, self.postings, self.title_postings, self.term_trigrams = {}, {}, {}, {}
+        self.total_length = 0
+        self._vocabulary = None
+        self._log_offset = 0
+        self._log_records = 0
+
+    def _replay_log(self):
+        """Apply log records appended since the last read (by any process)"""
+        try:
+            size = os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            return
+        if size < self._log_offset:
+            # Log was compacted by another process; reload from scratch
+            self._stamp = None
+            self._reset()
+            self.load()
+            return
+        if size == self._log_offset:
+            return
+
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._log_offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partially written record, pick it up next time
+                self._log_offset += len(line)
+                self._log_records += 1
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('v') != self.VERSION:
+                    continue
+                if record.get('delta') is not None:
+                    self._extend_doc(record['sid'], record['delta'])
+                    continue
+                self._remove_doc(record['sid'])
+                if record.get('doc') is not None:
+                    self._add_doc(record['sid'], record['doc'])
+
+    def _append_log(self, record: Dict):
+        record['v'] = self.VERSION
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n"
+        # Appends share the log lock; compaction takes it exclusively
+        with path_lock(self.log_path, shared=True):
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        # Replaying (rather than jumping to the end) also applies records
+        # other processes appended since our last read
+        self._replay_log()
+        if self._log_records >= self.COMPACT_AFTER:
+            self.compact()
+
+    def compact(self):
+        """Fold the update log into a fresh snapshot"""
+        with path_lock(self.log_path):
+            # Pick up records other processes appended before the log is truncated
+            self.load()
+            data = json.dumps({'version': self.VERSION, 'docs': self.docs}, ensure_ascii=False, separators=(',', ':'))
+            atomic_write(self.path, data, fsync=False)
+            open(self.log_path, 'w').close()
+            stat = os.stat(self.path)
+            self._stamp = (stat.st_mtime_ns, stat.st_size)
+            self._log_offset = 0
+            self._log_records = 0
+
+    # --- In-memory postings ---
+
+    def _add_doc(self, session_key: str, doc: Dict):
+        self.docs[session_key] = doc
+        self.total_length += doc['length']
+        for term, tf in doc['tf'].items():
+            if term not in self.postings and term not in self.title_postings:
+                self._add_term(term)
+            self.postings.setdefault(term, {})[session_key] = tf
+        for term in doc['title_terms']:
+            if term not in self.postings and term not in self.title_postings:
+                self._add_term(term)
+            self.title_postings.setdefault(term, set()).add(session_key)
+        self._vocabulary = None
+
+    def _extend_doc(self, session_key: str, delta: Dict):
+        """Add the postings of messages appended to an indexed session"""
+        doc = self.docs.get(session_key)
+        if doc is None or doc.get('count') != delta['base']:
+            # Another writer re-indexed the session in between; sync re-indexes it
+            self._remove_doc(session_key)
+            return
+        self.total_length += delta['length']
+        doc['length'] += delta['length']
+        for term, tf in delta['tf'].items():
+            if term not in self.postings and term not in self.title_postings:
+                self._add_term(term)
+            doc['tf'][term] = doc['tf'].get(term, 0) + tf
+            self.postings.setdefault(term, {})[session_key] = doc['tf'][term]
+        for term, positions in delta['messages'].items():
+            doc['messages'].setdefault(term, []).extend(positions)
+        if delta['title_terms'] != doc['title_terms']:
+            for term in doc['title_terms']:
+                postings = self.title_postings.get(term)
+                if postings is not None:
+                    postings.discard(session_key)
+                    if not postings:
+                        del self.title_postings[term]
+                        if term not in self.postings:
+                            self._remove_term(term)
+            for term in delta['title_terms']:
+                if term not in self.postings and term not in self.title_postings:
+                    self._add_term(term)
+                self.title_postings.setdefault(term, set()).add(session_key)
+            doc['title_terms'] = delta['title_terms']
+        doc.update(updated_at=delta['updated_at'], count=delta['count'], digest=delta['digest'])
+        self._vocabulary = None
+
+    def _remove_doc(self, session_key: str):
+        doc = self.docs.pop(session_key, None)
+        if not doc:
+            return
+        self.total_length -= doc['length']
+        for term in doc['tf']:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(session_key, None)
+                if not postings:
+                    del self.postings[term]
+                    if term not in self.title_postings:
+                        self._remove_term(term)
+        for term in doc['title_terms']:
+            postings = self.title_postings.get(term)
+            if postings is not None:
+                postings.discard(session_key)
+                if not postings:
+                    del self.title_postings[term]
+                    if term not in self.postings:
+                        self._remove_term(term)
+        self._vocabulary = None
+
+    def _add_term(self, term: str):
+        """Add a term that just entered the vocabulary to the trigram postings"""
+        for gram in trigrams(term):
+            self.term_trigrams.setdefault(gram, set()).add(term)
+
+    def _remove_term(self, term: str):
+        for gram in trigrams(term):
+            terms = self.term_trigrams.get(gram)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self.term_trigrams[gram]
+
+    @staticmethod
+    def build_doc(session_data: Dict, start: int = 0) -> Dict:
+        """Build the forward-index document for a session
+
+        With ``start`` only messages from that position on are tokenized,
+        giving the postings to add to the session's indexed document.
+        """
+        chat_history = session_data.get('chat_history', [])
+        tf = Counter()
+        messages = {}
+        for position in range(start, len(chat_history)):
+            tokens = tokenize(chat_history[position].get('content', ''))
+            tf.update(tokens)
+            for term in set(tokens):
+                messages.setdefault(term, []).append(position)
+        return {
+            'updated_at': session_data.get('updated_at', ''),
+            'title_terms': sorted(set(tokenize(session_data.get('title') or ''))),
+            'length': sum(tf.values()),
+            'tf': dict(tf),
+            'messages': messages,
+            'count': len(chat_history),
+            'digest': texts_digest([message.get('content') or '' for message in chat_history]),
+        }
+
+    # --- Maintenance ---
+
+    def add_session(self, session_data: Dict):
+        """Index (or re-index) a saved session
+
+        If the session only gained messages since it was indexed, just
+        their postings are built and logged.
+        """
+        self.load()
+        session_key = index_key(session_data.get('session_id'))
+        old = self.docs.get(session_key)
+        chat_history = session_data.get('chat_history', [])
+        if (old is not None and old.get('count') is not None and old['count'] <= len(chat_history)
+                and old['digest'] == texts_digest([m.get('content') or '' for m in chat_history[:old['count']]])):
+            delta = self.build_doc(session_data, start=old['count'])
+            delta['base'] = old['count']
+            # Applied when the log is replayed right after the append
+            self._append_log({'sid': session_key, 'delta': delta})
+            return
+        doc = self.build_doc(session_data)
+        self._remove_doc(session_key)
+        self._add_doc(session_key, doc)
+        self._append_log({'sid': session_key, 'doc': doc})
+
+    def remove_session(self, session_id):
+        """Drop a session from the index"""
+        self.load()
+        session_key = index_key(session_id)
+        if session_key in self.docs:
+            self._remove_doc(session_key)
+            self._append_log({'sid': session_key, 'doc': None})
+
+    def sync(self, sessions: List[Dict], loader: Callable[[str], Optional[Dict]]):
+        """Re-index sessions whose updated_at differs from the index and drop missing ones"""
+        self.load()
+        live = set()
+        for session_meta in sessions:
+            session_key = index_key(session_meta['session_id'])
+            live.add(session_key)
+            doc = self.docs.get(session_key)
+            if doc is not None and doc['updated_at'] == session_meta['updated_at']:
+                continue
+            session_data = loader(session_meta['filepath'])
+            if session_data:
+                self.add_session(session_data)
+        for session_key in [key for key in self.docs if key not in live]:
+            self._remove_doc(session_key)
+            self._append_log({'sid': session_key, 'doc': None})
+
+    # --- Queries ---
+
+    def vocabulary(self) -> List[str]:
+        """Sorted list of every indexed term (titles and content)"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(set(self.postings) | set(self.title_postings))
+        return self._vocabulary
+
+    def expand_prefix(self, prefix: str) -> Iterable[str]:
+        """Yield indexed terms starting with prefix"""
+        vocabulary = self.vocabulary()
+        i = bisect.bisect_left(vocabulary, prefix)
+        while i < len(vocabulary) and vocabulary[i].startswith(prefix):
+            yield vocabulary[i]
+            i += 1
+
+    def sessions_with_term(self, term: str) -> Set[str]:
+        """Session keys whose title or content contains the exact term"""
+        return set(self.postings.get(term, ())) | self.title_postings.get(term, set())
+
+    def fuzzy_terms(self, term: str, prefix: bool = False) -> Dict[str, int]:
+        """Indexed terms within ``max_edits`` typos of term, with their distance
+
+        With ``prefix`` a term matches if one of its prefixes is close enough.
+        Candidates come from the postings of the query's rarest trigrams and
+        are pruned by how many trigrams they share (each edit destroys at
+        most three) before any edit distance is computed.
+        """
+        limit = max_edits(term, prefix)
+        if limit == 0:
+            candidates = self.expand_prefix(term) if prefix else [term] if self.sessions_with_term(term) else []
+            return {candidate: 0 for candidate in candidates}
+
+        grams = sorted(trigrams(term, prefix), key=lambda gram: len(self.term_trigrams.get(gram, ())))
+        needed = len(grams) - 3 * limit
+        if needed > 0:
+            # A term sharing `needed` grams must have one of the rarest len - needed + 1
+            candidates = set().union(*(self.term_trigrams.get(gram, ()) for gram in grams[:len(grams) - needed + 1]))
+        else:
+            candidates = self.vocabulary()
+        matches = {}
+        for candidate in candidates:
+            if needed > 0 and sum(1 for gram in grams if candidate in self.term_trigrams.get(gram, ())) < needed:
+                continue
+            distance = edit_distance(term, candidate, limit, prefix)
+            if distance is not None:
+                matches[candidate] = distance
+        return matches
+
+    def expand(self, query: str, fuzzy: bool = False) -> List[Dict[str, float]]:
+        """The indexed terms each query term stands for, with their weight
+
+        The last query term also matches as a prefix.  With ``fuzzy``, terms
+        a few typos away match too, weighted by FUZZY_WEIGHT.
+        """
+        terms = tokenize(query)
+        expansions = []
+        for position, term in enumerate(terms):
+            last = position == len(terms) - 1
+            if fuzzy:
+                expansions.append({candidate: 1.0 if distance == 0 else FUZZY_WEIGHT
+                                   for candidate, distance in self.fuzzy_terms(term, prefix=last).items()})
+            elif last:
+                expansions.append({candidate: 1.0 for candidate in self.expand_prefix(term)})
+            else:
+                expansions.append({term: 1.0})
+        return expansions
+
+    def match(self, query: str, fuzzy: bool = False) -> Set[str]:
+        """Session keys containing every query term; the last term also matches as a prefix"""
+        result = None
+        for alternatives in self.expand(query, fuzzy):
+            matches = set()
+            for candidate in alternatives:
+                matches |= self.sessions_with_term(candidate)
+            result = matches if result is None else result & matches
+            if not result:
+                return set()
+        return result or set()
+
+    def idf(self, term: str) -> float:
+        """BM25 inverse document frequency over content and titles"""
+        df = max(len(self.postings.get(term, ())), len(self.title_postings.get(term, ())))
+        n = len(self.docs)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _term_scores(self, term: str, avgdl: float) -> Dict[str, float]:
+        """BM25 contribution of one term for every session containing it"""
+        idf = self.idf(term)
+        scores = {}
+        for session_key, tf in self.postings.get(term, {}).items():
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.docs[session_key]['length'] / avgdl)
+            scores[session_key] = idf * tf * (BM25_K1 + 1) / (tf + norm)
+        for session_key in self.title_postings.get(term, ()):
+            scores[session_key] = scores.get(session_key, 0.0) + TITLE_BOOST * idf
+        return scores
+
+    def rank(self, query: str, fuzzy: bool = False,
+             expansions: Optional[List[Dict[str, float]]] = None) -> List[Tuple[str, float]]:
+        """Score sessions matching any query term with BM25, best first
+
+        Each query term scores a session by its best-scoring expansion (the
+        last term's prefix completions and, with ``fuzzy``, near misses), so
+        partial words and typos are not inflated.
+        """
+        if expansions is None:
+            expansions = self.expand(query, fuzzy)
+        if not expansions or not self.docs:
+            return []
+        avgdl = max(self.total_length / len(self.docs), 1.0)
+
+        scores: Dict[str, float] = {}
+        for alternatives in expansions:
+            term_scores: Dict[str, float] = {}
+            for candidate, weight in alternatives.items():
+                for session_key, score in self._term_scores(candidate, avgdl).items():
+                    term_scores[session_key] = max(term_scores.get(session_key, 0.0), weight * score)
+            for session_key, score in term_scores.items():
+                scores[session_key] = scores.get(session_key, 0.0) + score
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    def best_message(self, session_key: str, query: str, fuzzy: bool = False,
+                     expansions: Optional[List[Dict[str, float]]] = None) -> Optional[int]:
+        """Index of the message matching the most distinct query terms"""
+        doc = self.docs.get(session_key)
+        if not doc:
+            return None
+        if expansions is None:
+            expansions = self.expand(query, fuzzy)
+        hits = Counter()
+        for alternatives in expansions:
+            positions = set()
+            for candidate in alternatives:
+                positions.update(doc['messages'].get(candidate, ()))
+            hits.update(positions)
+        if not hits:
+            return None
+        return min(hits, key=lambda position: (-hits[position], position))
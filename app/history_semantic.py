@@ -0,0 +1,342 @@
+"""
+Semantic search index for AgenticBot history
+Messages are embedded locally with hashed character n-grams; vectors live in a float16 matrix on disk
+"""
+
+import json
+import os
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from history_io import atomic_write, ordered_map, path_lock
+from history_search import TAG_RE, index_key, texts_digest, tokenize
+
+MAX_TEXT_CHARS = 4000  # long replies are embedded by their opening
+MIN_SCORE = 0.1        # cosine below which a session is not a semantic match
+
+
+def message_text(message: Dict) -> str:
+    """Plain text of a message as it is embedded"""
+    return " ".join(TAG_RE.sub(" ", message.get('content') or "").split())[:MAX_TEXT_CHARS]
+
+
+class HashedNgramEmbedder:
+    """Dependency-free text embedder based on the hashing trick
+
+    Every word and every character n-gram of the space-padded words is
+    hashed into one of ``dim`` buckets with a hash-derived sign, so related
+    spellings ("searching", "searched") share most of their features.
+    Vectors are L2-normalized, making dot products cosine similarities.
+    """
+
+    def __init__(self, dim: int = 256, ngram_sizes: Tuple[int, ...] = (3, 4)):
+        self.dim = dim
+        self.ngram_sizes = ngram_sizes
+
+    def features(self, text: str) -> List[str]:
+        """Words and character n-grams of a text"""
+        features = []
+        for word in tokenize(text):
+            features.append(word)
+            padded = f" {word} "
+            for size in self.ngram_sizes:
+                features.extend(padded[i:i + size] for i in range(len(padded) - size + 1))
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as rows of a float32 matrix"""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(f.encode('utf-8')) for f in self.features(text)), dtype=np.uint32)
+            if not len(hashes):
+                continue
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+            vectors[row] = np.bincount(hashes % self.dim, weights=signs, minlength=self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+
+def _embed_item(item) -> np.ndarray:
+    # Pool task: item is (session_key, updated_at, texts, embedder)
+    return item[3].embed(item[2])
+
+
+class SemanticIndex:
+    """Message embeddings in an append-only float16 matrix plus a session log
+
+    Vectors are appended to a raw ``float16`` file of ``dim`` columns; the
+    log records, per session, which row ranges hold its messages (in order),
+    how many messages were embedded and a digest of their text, plus the
+    change-feed generation of the last sync.  Re-embedding a session that
+    only gained messages embeds just the new ones.  Rows superseded by
+    re-embedding are dropped when the files are compacted.
+
+    Writers hold the log's lock exclusively; readers share it.
+    """
+
+    VECTORS_FILENAME = ".semantic_vectors.{dim}.f16"
+    LOG_FILENAME = ".semantic_index.{dim}.log"
+    VERSION = 1
+    COMPACT_MIN_DEAD_ROWS = 1000
+    QUERY_BLOCK_ROWS = 65536  # rows scored per matrix product, bounding temporaries
+
+    def __init__(self, history_dir: str, embedder: Optional[HashedNgramEmbedder] = None):
+        self.embedder = embedder or HashedNgramEmbedder()
+        dim = self.embedder.dim
+        self.vectors_path = os.path.join(history_dir, self.VECTORS_FILENAME.format(dim=dim))
+        self.log_path = os.path.join(history_dir, self.LOG_FILENAME.format(dim=dim))
+        self.row_bytes = dim * np.dtype(np.float16).itemsize
+        self._reset()
+
+    def _reset(self):
+        self.sessions: Dict[str, Dict] = {}
+        # Change-feed generation the index was last synced at
+        self.generation = 0
+        self._row_count = 0
+        self._log_offset = 0
+        self._log_ino = None
+        self._live = None
+
+    # --- Persistence ---
+
+    def load(self):
+        """Bring the in-memory view up to date with the files on disk"""
+        with path_lock(self.log_path, shared=True):
+            self._load_unlocked()
+
+    def _load_unlocked(self):
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            if self._log_ino is not None:
+                self._reset()
+            return
+        if stat.st_ino != self._log_ino or stat.st_size < self._log_offset:
+            # New or compacted log: start over
+            self._reset()
+            self._log_ino = stat.st_ino
+        if stat.st_size > self._log_offset:
+            with open(self.log_path, 'rb') as f:
+                f.seek(self._log_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    self._log_offset += len(line)
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError):
+                        continue
+        try:
+            self._row_count = os.path.getsize(self.vectors_path) // self.row_bytes
+        except FileNotFoundError:
+            self._row_count = 0
+
+    def _apply(self, record: Dict):
+        if record.get('v') != self.VERSION:
+            return
+        if 'generation' in record:
+            self.generation = record['generation']
+            return
+        if record.get('rows') is None:
+            self.sessions.pop(record['sid'], None)
+        else:
+            self.sessions[record['sid']] = {key: record[key] for key in ('updated_at', 'count', 'digest', 'rows')}
+        self._live = None
+
+    def _append_record(self, record: Dict):
+        """Append a log record; the caller holds the lock and has just loaded"""
+        record['v'] = self.VERSION
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n")
+        self._log_offset = os.path.getsize(self.log_path)
+        self._log_ino = os.stat(self.log_path).st_ino
+        self._apply(record)
+
+    def _append_vectors(self, vectors: np.ndarray) -> List[int]:
+        """Append rows to the matrix file and return their [start, count] range"""
+        start = self._row_count
+        with open(self.vectors_path, 'ab') as f:
+            # Drop a partial row left by an interrupted append
+            f.truncate(start * self.row_bytes)
+            f.write(vectors.astype(np.float16).tobytes())
+        self._row_count += len(vectors)
+        return [start, len(vectors)]
+
+    def _matrix(self) -> np.ndarray:
+        if not self._row_count:
+            return np.zeros((0, self.embedder.dim), dtype=np.float16)
+        return np.memmap(self.vectors_path, dtype=np.float16, mode='r', shape=(self._row_count, self.embedder.dim))
+
+    def dead_rows(self) -> int:
+        """Rows in the matrix file that no session uses any more"""
+        return self._row_count - sum(count for entry in self.sessions.values() for _, count in entry['rows'])
+
+    def compact(self):
+        """Rewrite both files with only the rows sessions still use"""
+        with path_lock(self.log_path):
+            self._load_unlocked()
+            matrix = self._matrix()
+            chunks, start = [], 0
+            lines = [json.dumps({'generation': self.generation, 'v': self.VERSION}, separators=(',', ':')) + "\n"]
+            for session_key, entry in self.sessions.items():
+                rows = [range(first, first + count) for first, count in entry['rows']]
+                count = sum(len(r) for r in rows)
+                if count:
+                    chunks.append(np.concatenate([matrix[r.start:r.stop] for r in rows]))
+                record = dict(entry, sid=session_key, v=self.VERSION, rows=[[start, count]] if count else [])
+                lines.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n")
+                start += count
+            data = np.concatenate(chunks).astype(np.float16).tobytes() if chunks else b""
+            del matrix
+            atomic_write(self.vectors_path, data, fsync=False)
+            atomic_write(self.log_path, "".join(lines), fsync=False)
+            self._reset()
+            self._load_unlocked()
+
+    # --- Maintenance ---
+
+    def _commit(self, session_key: str, updated_at: str, texts: List[str], vectors: Optional[np.ndarray] = None):
+        """Record a session's embeddings; embeds what is new unless vectors are given"""
+        with path_lock(self.log_path):
+            self._load_unlocked()
+            old = self.sessions.get(session_key)
+            rows = []
+            if vectors is None:
+                start = 0
+                if old and old['count'] <= len(texts) and old['digest'] == texts_digest(texts[:old['count']]):
+                    if old['count'] == len(texts) and old['updated_at'] == updated_at:
+                        return
+                    start, rows = old['count'], list(old['rows'])
+                vectors = self.embedder.embed(texts[start:])
+            if len(vectors):
+                rows.append(self._append_vectors(vectors))
+            self._append_record({
+                'sid': session_key,
+                'updated_at': updated_at,
+                'count': len(texts),
+                'digest': texts_digest(texts),
+                'rows': rows,
+            })
+        if self.dead_rows() >= max(self.COMPACT_MIN_DEAD_ROWS, self._row_count // 2):
+            self.compact()
+
+    def add_session(self, session_data: Dict):
+        """Embed a saved session's messages (only new ones if it just grew)"""
+        texts = [message_text(message) for message in session_data.get('chat_history', [])]
+        self._commit(index_key(session_data.get('session_id')), session_data.get('updated_at', ''), texts)
+
+    def _drop(self, session_key: str):
+        with path_lock(self.log_path):
+            self._load_unlocked()
+            if session_key in self.sessions:
+                self._append_record({'sid': session_key, 'rows': None})
+
+    def remove_session(self, session_id):
+        """Drop a session from the index"""
+        self.load()
+        session_key = index_key(session_id)
+        if session_key in self.sessions:
+            self._drop(session_key)
+
+    def sync(self, sessions: List[Dict], loader: Callable[[str], Optional[Dict]], workers: int = 1,
+             changed: Iterable[str] = (), generation: Optional[int] = None):
+        """Embed sessions whose updated_at differs from the index and drop missing ones
+
+        Sessions in ``changed`` are re-checked even if their updated_at
+        matches; ``generation`` is recorded as the change-feed generation
+        the index is now synced at.  With ``workers`` > 1 the embedding of
+        a backfill runs on a process pool while sessions are loaded and
+        committed in this process.
+        """
+        self.load()
+        live = {index_key(meta['session_id']) for meta in sessions}
+        changed = {index_key(session_id) for session_id in changed}
+        stale = [meta for meta in sessions if index_key(meta['session_id']) in changed
+                 or self.sessions.get(index_key(meta['session_id']), {}).get('updated_at') != meta['updated_at']]
+        for session_key in [key for key in self.sessions if key not in live]:
+            self._drop(session_key)
+        self._embed(stale, loader, workers)
+        if generation is not None and generation != self.generation:
+            with path_lock(self.log_path):
+                self._load_unlocked()
+                self._append_record({'generation': generation})
+
+    def _embed(self, stale: List[Dict], loader: Callable[[str], Optional[Dict]], workers: int):
+        """Embed the listed sessions, on a process pool if ``workers`` > 1"""
+        if workers <= 1 or len(stale) < 2:
+            for meta in stale:
+                session_data = loader(meta['filepath'])
+                if session_data:
+                    self.add_session(session_data)
+            return
+
+        def prepared():
+            for meta in stale:
+                session_data = loader(meta['filepath'])
+                if session_data:
+                    texts = [message_text(message) for message in session_data.get('chat_history', [])]
+                    yield index_key(session_data.get('session_id')), session_data.get('updated_at', ''), texts, self.embedder
+
+        for (session_key, updated_at, texts, _), vectors in ordered_map(_embed_item, prepared(), workers):
+            self._commit(session_key, updated_at, texts, vectors)
+
+    # --- Queries ---
+
+    def _live_view(self) -> Optional[Tuple[np.ndarray, List[str]]]:
+        """(number of the session owning each matrix row, -1 for dead rows; session keys)"""
+        if self._live is None or len(self._live[0]) != self._row_count:
+            owners = np.full(self._row_count, -1, dtype=np.int32)
+            keys = []
+            for session_key, entry in self.sessions.items():
+                if not any(count for _, count in entry['rows']):
+                    continue
+                for first, count in entry['rows']:
+                    owners[first:first + count] = len(keys)
+                keys.append(session_key)
+            self._live = (owners, keys)
+        return self._live if self._live[1] else None
+
+    def search(self, query: str, k: Optional[int] = None, min_score: float = MIN_SCORE) -> List[Tuple[str, float, int]]:
+        """Sessions most similar to the query: (session_key, score, message_index), best first
+
+        A session scores as its best-matching message.  The memory-mapped
+        matrix is scored block by block, with rows no session uses masked
+        out, so it is never copied whole; with ``k`` only the top k sessions
+        (plus any tied with the k-th) are sorted.
+        """
+        self.load()
+        view = self._live_view()
+        query_vector = self.embedder.embed([query])[0]
+        if view is None or not query_vector.any():
+            return []
+        owners, keys = view
+
+        matrix = self._matrix()
+        scores = np.full(len(owners), -np.inf, dtype=np.float32)
+        for first in range(0, len(owners), self.QUERY_BLOCK_ROWS):
+            live = owners[first:first + self.QUERY_BLOCK_ROWS] >= 0
+            if live.any():
+                block = matrix[first:first + len(live)].astype(np.float32) @ query_vector
+                scores[first:first + len(live)] = np.where(live, block, -np.inf)
+        del matrix
+        best = np.full(len(keys), -np.inf, dtype=np.float32)
+        live = owners >= 0
+        np.maximum.at(best, owners[live], scores[live])
+
+        if k is not None and k < len(best):
+            # Keep every session tied with the k-th score so callers can break ties consistently
+            kth = np.partition(best, len(best) - k)[len(best) - k]
+            top = np.flatnonzero(best >= kth)
+            order = top[np.argsort(-best[top], kind='stable')]
+        else:
+            order = np.argsort(-best, kind='stable')
+        results = []
+        for i in order:
+            if best[i] < min_score:
+                break
+            rows = self.sessions[keys[i]]['rows']
+            message_index = int(np.argmax(np.concatenate([scores[first:first + count] for first, count in rows])))
+            results.append((keys[i], float(best[i]), message_index))
+        return results
@@ -0,0 +1,151 @@
+"""
+Write-behind session saver for AgenticBot
+Moves history disk I/O off the Streamlit script thread
+"""
+
+import atexit
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from history_backends import UNNAMED_SESSION_IDS
+
+
+class _PendingSave:
+    """Latest payload for one session plus everyone waiting on it"""
+
+    __slots__ = ('session_data', 'futures', 'deadline')
+
+    def __init__(self, session_data: Dict, deadline: float):
+        self.session_data = session_data
+        self.futures: List[Future] = []
+        self.deadline = deadline
+
+
+class SessionWriter:
+    """Background writer that coalesces saves of the same session
+
+    ``submit`` returns immediately with a Future that resolves to the saved
+    file path (or None if saving failed).  Saves of a session submitted while
+    an earlier one is still waiting replace its payload, so a burst of saves
+    costs one write.  Each session is written ``debounce`` seconds after its
+    first pending submission; at most ``max_pending`` sessions can wait at a
+    time, after which ``submit`` blocks until the writer catches up.
+    """
+
+    def __init__(self, history_manager, debounce: float = 0.5, max_pending: int = 64):
+        self.history_manager = history_manager
+        self.debounce = debounce
+        self.max_pending = max_pending
+        self._pending: Dict[str, _PendingSave] = {}
+        self._in_flight = 0
+        self._flushing = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, session_data: Dict) -> Future:
+        """Queue a session save; the session_id is assigned here if missing
+
+        The payload is written later, so pass lists that will not be mutated
+        afterwards (e.g. shallow copies of the chat history).
+        """
+        if not session_data.get('session_id') or str(session_data['session_id']) in UNNAMED_SESSION_IDS:
+            session_data['session_id'] = self.history_manager.generate_session_id()
+        session_id = session_data['session_id']
+        future = Future()
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("SessionWriter is closed")
+            while session_id not in self._pending and len(self._pending) >= self.max_pending:
+                self._cond.wait()
+            pending = self._pending.get(session_id)
+            if pending is None:
+                pending = _PendingSave(session_data, time.monotonic() + self.debounce)
+                self._pending[session_id] = pending
+            else:
+                pending.session_data = session_data
+            pending.futures.append(future)
+            self._cond.notify_all()
+        return future
+
+    def discard(self, session_id: str) -> bool:
+        """Drop a queued save, e.g. because the session is being deleted"""
+        with self._cond:
+            pending = self._pending.pop(session_id, None)
+            self._cond.notify_all()
+        if pending is None:
+            return False
+        for future in pending.futures:
+            future.cancel()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything queued now; return False if the timeout expired"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while self._pending or self._in_flight:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._flushing -= 1
+
+    def close(self):
+        """Flush pending saves and stop the writer thread"""
+        with self._cond:
+            if self._closed:
+                return
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _next_due(self) -> Optional[str]:
+        """Session whose save is due, or None; caller holds the lock"""
+        if not self._pending:
+            return None
+        session_id = min(self._pending, key=lambda key: self._pending[key].deadline)
+        if self._flushing or self._pending[session_id].deadline <= time.monotonic():
+            return session_id
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                session_id = self._next_due()
+                while session_id is None:
+                    if self._closed:
+                        return
+                    timeout = None
+                    if self._pending:
+                        timeout = max(0.0, min(p.deadline for p in self._pending.values()) - time.monotonic())
+                    self._cond.wait(timeout)
+                    session_id = self._next_due()
+                pending = self._pending.pop(session_id)
+                self._in_flight += 1
+                self._cond.notify_all()
+
+            try:
+                result = self.history_manager.save_session(pending.session_data)
+                for future in pending.futures:
+                    if not future.cancelled():
+                        future.set_result(result)
+            except Exception as e:
+                for future in pending.futures:
+                    if not future.cancelled():
+                        future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
@@ -5,11 +5,14 @@ A powerful AI assistant with web search, content extraction, deep research, and
 
 import os
 import asyncio
-import base64
+from datetime import datetime
 from typing import Dict, Any
 from dotenv import load_dotenv
 import google.generativeai as genai
 from chatgpt_agentic_clone.agent import web_search, scrape_webpage, deep_research, generate_image, setup_gemini
+from blob_store import BlobStore
+from history_async import AsyncHistoryManager
+from history_manager import HistoryManager
 
 # Load environment variables
 load_dotenv()
@@ -42,21 +45,10 @@ def check_api_keys():
     print("✅ All API keys are configured!")
     return True
 
-def save_image_data(image_data: str, filename: str) -> str:
-    """Save base64 image data to a file."""
+def save_image_data(image_data: str, blob_store: BlobStore) -> str:
+    """Save base64 image data to the history's blob store and return its reference."""
     try:
-        # Decode base64 data
-        decoded_data = base64.b64decode(image_data)
-        
-        # Create images directory if it doesn't exist
-        os.makedirs("images", exist_ok=True)
-        
-        # Save the image
-        filepath = os.path.join("images", filename)
-        with open(filepath, "wb") as f:
-            f.write(decoded_data)
-        
-        return filepath
+        return blob_store.put_base64(image_data)
     except Exception as e:
         print(f"Error saving image: {e}")
         return None
@@ -80,7 +72,7 @@ async def process_user_query(user_input: str, chat) -> Dict[str, Any]:
         else:
             response_text = f"Search failed: {result['error_message']}"
         
-        return {"text": response_text, "image_data": None, "image_filename": None}
+        return {"text": response_text, "image_data": None}
         
     elif user_input.lower().startswith("scrape "):
         # Web scraping
@@ -94,7 +86,7 @@ async def process_user_query(user_input: str, chat) -> Dict[str, Any]:
         else:
             response_text = f"Scraping failed: {result['error_message']}"
         
-        return {"text": response_text, "image_data": None, "image_filename": None}
+        return {"text": response_text, "image_data": None}
         
     elif user_input.lower().startswith("research "):
         # Deep research
@@ -107,7 +99,7 @@ async def process_user_query(user_input: str, chat) -> Dict[str, Any]:
         else:
             response_text = f"Research failed: {result['error_message']}"
         
-        return {"text": response_text, "image_data": None, "image_filename": None}
+        return {"text": response_text, "image_data": None}
         
     elif user_input.lower().startswith("generate image"):
         # Image generation
@@ -117,13 +109,10 @@ async def process_user_query(user_input: str, chat) -> Dict[str, Any]:
         
         if result["status"] == "success":
             response_text = f"Image generated successfully! Prompt: {prompt}"
-            # Save the image
-            filename = f"generated_image_{len(os.listdir('images')) if os.path.exists('images') else 0}.png"
-            image_path = save_image_data(result["image_data"], filename)
-            return {"text": response_text, "image_data": result["image_data"], "image_filename": image_path}
+            return {"text": response_text, "image_data": result["image_data"]}
         else:
             response_text = f"Image generation failed: {result['error_message']}"
-            return {"text": response_text, "image_data": None, "image_filename": None}
+            return {"text": response_text, "image_data": None}
             
     elif any(word in user_input.lower() for word in ["weather", "current", "latest", "news", "today's", "now", "stock", "price"]):
         # Auto-detect current information requests
@@ -139,13 +128,13 @@ async def process_user_query(user_input: str, chat) -> Dict[str, Any]:
         else:
             response_text = f"Search failed: {result['error_message']}"
         
-        return {"text": response_text, "image_data": None, "image_filename": None}
+        return {"text": response_text, "image_data": None}
         
     else:
         # Regular chat
         print("\n🤖 Processing with AI...")
         response = chat.send_message(user_input)
-        return {"text": response.text, "image_data": None, "image_filename": None}
+        return {"text": response.text, "image_data": None}
 
 async def interactive_session():
     """Run an interactive session with the AI assistant."""
@@ -154,6 +143,10 @@ async def interactive_session():
     model = genai.GenerativeModel('gemini-2.0-flash-exp')
     chat = model.start_chat(history=[])
     
+    # Conversations are saved to the same history as the web app, off the event loop
+    history = AsyncHistoryManager(HistoryManager())
+    session = {'session_id': None, 'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'chat_history': []}
+    
     print("\n" + "="*60)
     print("🚀 Welcome to AgenticBot - ChatGPT Clone with AI")
     print("="*60)
@@ -169,9 +162,16 @@ async def interactive_session():
     print("• 'research [topic]' - Deep research")
     print("• 'generate image [description]' - Create images")
     print("\nType 'exit' or 'quit' to end the session.")
-    print("Type 'help' for example queries.")
+    print("Type 'help' for example queries, 'history' for recent sessions.")
     print("-" * 60)
     
+    try:
+        await run_session_loop(chat, history, session)
+    finally:
+        await history.close()
+
+async def run_session_loop(chat, history: AsyncHistoryManager, session: Dict[str, Any]):
+    """Read queries until the user quits, saving each exchange to history."""
     while True:
         try:
             # Get user input
@@ -191,6 +191,15 @@ async def interactive_session():
                 print("• Image Generation: 'generate image of a robot playing piano'")
                 continue
             
+            if user_input.lower() == "history":
+                recent = await history.list(limit=5)
+                print("\n📚 Recent sessions:")
+                for item in recent:
+                    print(f"• {item['title']} ({item['updated_at']}, {item['total_messages']} messages)")
+                if not recent:
+                    print("• No saved sessions yet")
+                continue
+            
             if not user_input:
                 print("Please enter a question or command.")
                 continue
@@ -201,9 +210,27 @@ async def interactive_session():
             # Display the response
             print(f"\n🤖 Assistant: {result['text']}")
             
-            # Handle any special content like images
-            if result.get('image_filename'):
-                print(f"📁 Image saved to: {result['image_filename']}")
+            # Images go to the history's blob store once (deduplicated and garbage-collected
+            # with it); the message only references them
+            reply = {'role': 'assistant', 'content': result['text']}
+            if result.get('image_data'):
+                blob_store = history.history_manager.blob_store
+                image_ref = await asyncio.to_thread(save_image_data, result['image_data'], blob_store)
+                if image_ref:
+                    reply['image_ref'] = image_ref
+                    print(f"📁 Image saved to: {blob_store.path_for(image_ref)}")
+                else:
+                    reply['image_data'] = result['image_data']
+            
+            # Save the exchange without blocking the loop on disk
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            reply['timestamp'] = timestamp
+            session['chat_history'] = session['chat_history'] + [
+                {'role': 'user', 'content': user_input, 'timestamp': timestamp},
+                reply,
+            ]
+            if not await history.save(session):
+                print("⚠️  Could not save this exchange to history")
                 
         except KeyboardInterrupt:
             print("\n\n👋 Session interrupted. Goodbye!")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Migration tool for AgenticBot history
+Run this script to move sessions between storage backends (JSON files, SQLite) or history directories
+"""
+
+import argparse
+import sys
+import os
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from history_codec import COMPRESSION_SUFFIXES
+from history_manager import HistoryManager
+from history_migration import HistoryMigration
+
+CHECKPOINT_FILENAME = ".migration_checkpoint.json"
+
+def open_manager(history_dir: str, backend: str, compression: str) -> HistoryManager:
+    options = {}
+    if backend == "json":
+        options = {'journal': True, 'compression': None if compression == "none" else compression}
+    return HistoryManager(history_dir=history_dir, backend=backend, **options)
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate AgenticBot sessions between history backends")
+    parser.add_argument("--from", dest="source", default="json", choices=["json", "sqlite"], help="source backend")
+    parser.add_argument("--to", dest="destination", default="sqlite", choices=["json", "sqlite"],
+                        help="destination backend")
+    parser.add_argument("--source-dir", default="history", help="history directory to read")
+    parser.add_argument("--dest-dir", default=None, help="history directory to write (defaults to --source-dir)")
+    parser.add_argument("--compression", default="none", choices=["none"] + list(COMPRESSION_SUFFIXES),
+                        help="compression for a JSON destination")
+    parser.add_argument("--batch-size", type=int, default=100, help="sessions per batch")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint of an interrupted run")
+    args = parser.parse_args()
+
+    dest_dir = args.dest_dir or args.source_dir
+    if args.source == args.destination and os.path.abspath(dest_dir) == os.path.abspath(args.source_dir):
+        parser.error("source and destination are the same store")
+
+    print("🚚 AgenticBot History Migration Tool")
+    print("=" * 40)
+    print(f"📁 {args.source} ({args.source_dir}) → {args.destination} ({dest_dir})")
+
+    migration = HistoryMigration(
+        open_manager(args.source_dir, args.source, "none"),
+        open_manager(dest_dir, args.destination, args.compression),
+        batch_size=args.batch_size,
+        checkpoint_path=os.path.join(dest_dir, CHECKPOINT_FILENAME),
+    )
+    if args.restart:
+        migration.clear_checkpoint()
+
+    def progress(report):
+        print(f"   ... {report['migrated']} migrated, {report['skipped']} already current")
+
+    report = migration.run(progress)
+    if report['resumed']:
+        print("↩️  Resumed from the last completed batch")
+
+    print("\n📊 Migration Results:")
+    print(f"   Sessions migrated: {report['migrated']}")
+    print(f"   Already current: {report['skipped']}")
+    print(f"   Failed: {report['failed']}")
+    print(f"   Throughput: {report['sessions_per_second']:.1f} sessions/sec ({report['seconds']:.2f}s)")
+    print("\n🎉 Migration complete! Start the app with the destination backend to use the migrated history.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Layout migration for AgenticBot history
+Run this script to move session files into date shards (history/YYYY/MM) or back into one flat directory
+"""
+
+import argparse
+import sys
+import os
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from history_backends import LAYOUTS
+from history_manager import HistoryManager
+
+def main():
+    parser = argparse.ArgumentParser(description="Move AgenticBot session files into a directory layout")
+    parser.add_argument("--history-dir", default="history", help="history directory to reorganize")
+    parser.add_argument("--layout", default="date", choices=LAYOUTS,
+                        help="date: history/YYYY/MM by creation time; flat: all files in the history directory")
+    args = parser.parse_args()
+
+    print("🗂️  AgenticBot History Layout Tool")
+    print("=" * 40)
+
+    history_manager = HistoryManager(history_dir=args.history_dir, layout=args.layout)
+    print(f"📁 Moving {args.history_dir} to the {args.layout} layout")
+
+    report = history_manager.relocate_sessions()
+    if report['moved'] == 0:
+        print("✅ All session files are already in place. Nothing to move.")
+        return
+
+    print("\n📊 Layout Results:")
+    print(f"   Files moved: {report['moved']}")
+    print(f"   Already in place: {report['kept']}")
+    print(f"\n🎉 Done! Set AGENTICBOT_HISTORY_LAYOUT={args.layout} so new sessions follow the same layout.")
+
+if __name__ == "__main__":
+    main()
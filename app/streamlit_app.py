@@ -1,14 +1,18 @@
 import streamlit as st
 import os
-import base64
 from io import BytesIO
 from dotenv import load_dotenv
 from chatgpt_agentic_clone.agent import web_search, scrape_webpage, deep_research, generate_image, setup_gemini
 import google.generativeai as genai
 import sys
 import time
+from dataclasses import replace
 from datetime import datetime
+from history_index import decode_cursor, recency_key
 from history_manager import HistoryManager
+from history_records import ChatMessage, LogEntry, ToolEvent, logs_from_dicts, messages_from_dicts
+from history_retention import RetentionEngine, RetentionPolicy
+from history_writer import SessionWriter
 
 # --- Setup ---
 # Load environment variables from .env file (check current dir and parent dir)
@@ -19,8 +23,32 @@ model = genai.GenerativeModel('gemini-2.0-flash-exp')
 
 print("PYTHON EXECUTABLE:", sys.executable)
 
-# Initialize History Manager
-history_manager = HistoryManager()
+# Initialize History Manager (set AGENTICBOT_HISTORY_BACKEND=sqlite for large histories)
+HISTORY_BACKEND = os.getenv("AGENTICBOT_HISTORY_BACKEND", "json")
+# JSON sessions are journaled so each exchange appends instead of rewriting the file;
+# set AGENTICBOT_HISTORY_COMPRESSION=gzip|zlib|lzma to store snapshots compressed and
+# AGENTICBOT_HISTORY_LAYOUT=date to file sessions under history/YYYY/MM
+history_options = {
+    'journal': True,
+    'compression': os.getenv("AGENTICBOT_HISTORY_COMPRESSION"),
+    'layout': os.getenv("AGENTICBOT_HISTORY_LAYOUT", "flat"),
+} if HISTORY_BACKEND == 'json' else {}
+
+@st.cache_resource
+def get_history_store():
+    """One history manager, background session writer and retention engine per server process
+
+    Every tab's script thread shares the manager; its ``lock`` serializes their index updates.
+    """
+    manager = HistoryManager(backend=HISTORY_BACKEND, **history_options)
+    # Archive cold sessions (AGENTICBOT_RETENTION_DAYS / _MAX_SESSIONS / _MAX_MB) so the
+    # active history stays small; archived sessions remain searchable.  Off unless configured.
+    retention_policy = RetentionPolicy.from_env()
+    if retention_policy.enabled:
+        RetentionEngine(manager, retention_policy).start()
+    return manager, SessionWriter(manager)
+
+history_manager, session_writer = get_history_store()
 
 st.set_page_config(page_title="AgenticBot Chat", page_icon="🤖", layout="wide", initial_sidebar_state="expanded")
 
@@ -169,19 +197,24 @@ def log_agentic_step(step_type: str, message: str, timestamp: bool = True):
         st.session_state.agentic_logs = []
     
     timestamp_str = f"[{datetime.now().strftime('%H:%M:%S')}] " if timestamp else ""
-    log_entry = {
-        'timestamp': timestamp_str,
-        'type': step_type,
-        'message': message,
-        'full_message': f"{timestamp_str}{message}"
-    }
-    st.session_state.agentic_logs.append(log_entry)
+    st.session_state.agentic_logs.append(LogEntry(step_type, message, timestamp_str))
 
 def clear_agentic_logs():
     """Clear previous agentic logs"""
     if 'agentic_logs' in st.session_state:
         st.session_state.agentic_logs = []
 
+def highlight_snippet(snippet: str, offsets) -> str:
+    """Bold the matched ranges of a search snippet for markdown display"""
+    parts = []
+    last = 0
+    for start, end in offsets:
+        parts.append(snippet[last:start])
+        parts.append(f"**{snippet[start:end]}**")
+        last = end
+    parts.append(snippet[last:])
+    return "".join(parts)
+
 def initialize_new_session():
     """Initialize a new chat session"""
     st.session_state.chat_history = []
@@ -192,58 +225,61 @@ def initialize_new_session():
     st.session_state.session_created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     st.session_state.chat = model.start_chat(history=[])
     st.session_state.loaded_session_filepath = None
+    st.session_state.saved_message_count = 0
 
 def save_current_session():
-    """Save the current chat session to history"""
+    """Queue the current chat session for saving; returns a Future for the write"""
     if st.session_state.get('chat_history') and len(st.session_state.chat_history) > 0:
+        # Messages are appended with a timestamp; backfill any that lack one
+        if any(entry.timestamp is None for entry in st.session_state.chat_history):
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            st.session_state.chat_history = [entry if entry.timestamp is not None else replace(entry, timestamp=now)
+                                             for entry in st.session_state.chat_history]
+        
+        # Records are immutable, so the writer thread can share them; it converts them to dicts
         session_data = {
             'session_id': st.session_state.get('current_session_id'),
             'created_at': st.session_state.get('session_created_at', datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
             'title': st.session_state.get('current_session_title'),
-            'chat_history': [],
-            'agentic_logs': st.session_state.get('agentic_logs', [])
+            'chat_history': list(st.session_state.chat_history),
+            'agentic_logs': list(st.session_state.get('agentic_logs', [])),
+            'tool_events': list(st.session_state.get('tool_trace', []))
         }
         
-        # Add timestamps to chat history entries
-        for entry in st.session_state.chat_history:
-            entry_with_timestamp = entry.copy()
-            if 'timestamp' not in entry_with_timestamp:
-                entry_with_timestamp['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            session_data['chat_history'].append(entry_with_timestamp)
-        
-        return history_manager.save_session(session_data)
+        is_new_session = not st.session_state.get('current_session_id')
+        future = session_writer.submit(session_data)
+        # Keep the assigned id so later saves extend this session instead of starting a new one
+        st.session_state.current_session_id = session_data['session_id']
+        st.session_state.saved_message_count = len(session_data['chat_history'])
+        if is_new_session:
+            # Wait for the first write so the new chat shows up in the sidebar right away
+            future.result(timeout=10)
+        return future
     return None
 
 def load_session_from_history(filepath: str):
     """Load a saved session from history"""
+    # Make sure queued saves are on disk before reading
+    session_writer.flush()
     session_data = history_manager.load_session(filepath)
     if session_data:
-        st.session_state.chat_history = session_data.get('chat_history', [])
-        st.session_state.agentic_logs = session_data.get('agentic_logs', [])
-        st.session_state.tool_trace = []
+        st.session_state.chat_history = messages_from_dicts(session_data.get('chat_history', []))
+        st.session_state.agentic_logs = logs_from_dicts(session_data.get('agentic_logs', []))
+        st.session_state.tool_trace = [ToolEvent.from_dict(event) for event in session_data.get('tool_events', [])]
         st.session_state.current_session_id = session_data.get('session_id')
         st.session_state.current_session_title = session_data.get('title')
         st.session_state.session_created_at = session_data.get('created_at')
         st.session_state.chat = model.start_chat(history=[])
         st.session_state.loaded_session_filepath = filepath
+        st.session_state.saved_message_count = len(st.session_state.chat_history)
         return True
     return False
 
 def is_session_modified():
-    """Check if current session has been modified since loading"""
-    if not st.session_state.get('loaded_session_filepath'):
-        return True  # New session, always considered modified
-    
-    # Load original session data
-    original_data = history_manager.load_session(st.session_state.loaded_session_filepath)
-    if not original_data:
-        return True
-    
-    # Compare message counts
-    original_msg_count = len(original_data.get('chat_history', []))
+    """Check if current session has been modified since it was loaded or last saved"""
+    # Compare message counts without going back to disk
     current_msg_count = len(st.session_state.get('chat_history', []))
-    
-    return current_msg_count != original_msg_count
+    return current_msg_count != st.session_state.get('saved_message_count', 0)
 
 # --- Session State Initialization ---
 if 'chat_history' not in st.session_state:
@@ -252,9 +288,62 @@ if 'chat_history' not in st.session_state:
 if 'history_search' not in st.session_state:
     st.session_state.history_search = ""
 
+if 'history_search_mode' not in st.session_state:
+    st.session_state.history_search_mode = 'ranked'
+
 if 'show_history' not in st.session_state:
     st.session_state.show_history = True
 
+if 'history_pages' not in st.session_state:
+    st.session_state.history_pages = 1
+
+HISTORY_PAGE_SIZE = 20
+
+def fetch_history_pages(page_count):
+    """Fetch the first page_count pages of the history list or search results"""
+    sessions, cursor = [], None
+    for _ in range(page_count):
+        if st.session_state.history_search:
+            page = history_manager.search_sessions(st.session_state.history_search, mode=st.session_state.history_search_mode, limit=HISTORY_PAGE_SIZE, cursor=cursor, fuzzy=True)
+        else:
+            page = history_manager.list_sessions(limit=HISTORY_PAGE_SIZE, cursor=cursor)
+        sessions.extend(page)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    return sessions, cursor
+
+def refresh_history_sessions(pages, changed):
+    """Patch cached list pages with the current summaries of the changed sessions"""
+    sessions, cursor = pages
+    sessions = [session for session in sessions if session['session_id'] not in changed]
+    for session_id in changed:
+        summary = history_manager.session_summary(session_id)
+        # Sessions that moved past the last loaded page turn up with "Load more"
+        if summary and (cursor is None or recency_key(summary) > tuple(decode_cursor(cursor))):
+            sessions.append(summary)
+    sessions.sort(key=recency_key, reverse=True)
+    return sessions, cursor
+
+def cached_history_pages(page_count):
+    """The sidebar list, updated only for the sessions some process changed since it was fetched"""
+    key = (st.session_state.history_search, st.session_state.history_search_mode, page_count)
+    with history_manager.lock:
+        generation = history_manager.changes.generation()
+    cached = st.session_state.get('history_list_cache')
+    if cached is not None and cached[0] == key and cached[1] != generation and not st.session_state.history_search:
+        # Search results are re-ranked as a whole; the plain list only needs the changed entries
+        with history_manager.lock:
+            changed = history_manager.changes.changed_sessions(cached[1])
+        # Past a page's worth of changes refetching the pages is cheaper
+        if changed is not None and len(changed) <= HISTORY_PAGE_SIZE:
+            cached = (key, generation, refresh_history_sessions(cached[2], changed))
+            st.session_state.history_list_cache = cached
+    if cached is None or cached[0] != key or cached[1] != generation:
+        cached = (key, generation, fetch_history_pages(page_count))
+        st.session_state.history_list_cache = cached
+    return cached[2]
+
 # --- Sidebar ---
 with st.sidebar:
     st.markdown('<div class="sidebar-logo"><img src="https://cdn-icons-png.flaticon.com/512/4712/4712035.png" alt="Bot Logo"><span class="sidebar-title">AgenticBot</span></div>', unsafe_allow_html=True)
@@ -294,8 +383,12 @@ with st.sidebar:
     # History search
     search_query = st.text_input("🔍 Search history", value=st.session_state.history_search, key="history_search_input", placeholder="Search chats...")
     
-    if search_query != st.session_state.history_search:
+    search_mode = 'semantic' if st.checkbox("🧠 Match meaning", value=st.session_state.history_search_mode == 'semantic', help="Find chats about similar topics, not just the same words") else 'ranked'
+    
+    if search_query != st.session_state.history_search or search_mode != st.session_state.history_search_mode:
         st.session_state.history_search = search_query
+        st.session_state.history_search_mode = search_mode
+        st.session_state.history_pages = 1
     
     # Toggle history visibility
     col1, col2 = st.columns([3, 1])
@@ -309,23 +402,21 @@ with st.sidebar:
     
     # Display history
     if st.session_state.show_history:
-        if st.session_state.history_search:
-            sessions = history_manager.search_sessions(st.session_state.history_search)
-        else:
-            sessions = history_manager.list_sessions()
+        sessions, next_cursor = cached_history_pages(st.session_state.history_pages)
         
         if sessions:
-            st.markdown(f"*Found {len(sessions)} session(s)*")
+            st.markdown(f"*Showing {len(sessions)}{'+' if next_cursor else ''} session(s)*")
             
             # Display sessions
-            for i, session in enumerate(sessions[:20]):  # Limit to 20 most recent
+            for i, session in enumerate(sessions):
                 with st.container():
                     col1, col2 = st.columns([4, 1])
                     
                     with col1:
                         # Highlight current session
                         is_current = (st.session_state.get('current_session_id') == session['session_id'])
-                        button_text = f"{'📍' if is_current else '💬'} {session['title'][:30]}{'...' if len(session['title']) > 30 else ''}"
+                        icon = '📍' if is_current else ('🗄️' if session.get('archived') else '💬')
+                        button_text = f"{icon} {session['title'][:30]}{'...' if len(session['title']) > 30 else ''}"
                         
                         if st.button(
                             button_text, 
@@ -346,6 +437,9 @@ with st.sidebar:
                     
                     with col2:
                         if st.button("🗑️", key=f"delete_session_{i}", help="Delete this session"):
+                            # Drop any queued save so it cannot recreate the session
+                            session_writer.discard(session['session_id'])
+                            session_writer.flush()
                             if history_manager.delete_session(session['filepath']):
                                 # If we're deleting the current session, start a new one
                                 if st.session_state.get('current_session_id') == session['session_id']:
@@ -358,13 +452,43 @@ with st.sidebar:
                     # Session metadata
                     tools_str = ", ".join(session['tools_used']) if session['tools_used'] else "None"
                     st.caption(f"📅 {session['updated_at'][:16]} | 💬 {session['total_messages']} msgs | 🔧 {tools_str}")
+                    if session.get('snippet'):
+                        st.caption(highlight_snippet(session['snippet'], session['snippet_offsets']))
                     
                     st.markdown('<div style="margin-bottom: 8px;"></div>', unsafe_allow_html=True)
+            
+            if next_cursor and st.button("⬇️ Load more", key="load_more_sessions"):
+                st.session_state.history_pages += 1
+                st.rerun()
         else:
             st.markdown("*No chat history found*")
             if st.session_state.history_search:
                 st.markdown("*Try a different search term*")
     
+    st.markdown('<div class="sidebar-divider"></div>', unsafe_allow_html=True)
+    
+    # Usage stats come from rollups kept up to date on every save, not from the history files
+    with st.expander("📊 Usage Stats", expanded=False):
+        stats = history_manager.usage_summary(days=30)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Sessions", stats['sessions'])
+        col2.metric("Messages", stats['messages'])
+        col3.metric("Error rate", f"{stats['error_rate']:.0%}")
+        st.caption(f"⏱️ Average session: {int(stats['mean_session_seconds'] // 60)} min")
+        if stats['tools']:
+            st.markdown("**🔧 Tool usage**")
+            st.bar_chart({'invocations': stats['tools']})
+        if stats['messages_per_day']:
+            st.markdown("**💬 Messages per day**")
+            st.line_chart({'messages': stats['messages_per_day']})
+        if stats['sessions']:
+            st.markdown("**⏱️ Session durations**")
+            st.bar_chart({'sessions': stats['session_durations']})
+        if st.button("🔁 Count existing history", key="backfill_stats", help="Include sessions saved before stats were collected (reads every session once)"):
+            session_writer.flush()
+            history_manager.backfill_analytics()
+            st.rerun()
+    
     st.markdown('<div class="sidebar-divider"></div>', unsafe_allow_html=True)
     st.markdown('<div style="text-align:center; margin-top:2rem;"><a href="https://github.com/nerdy1texan/AgenticBot.git" target="_blank" style="color:#90caf9; text-decoration:none; font-weight:bold; font-size:1.1rem;">🌐 View on GitHub</a></div>', unsafe_allow_html=True)
 
@@ -387,14 +511,14 @@ if st.session_state.get('current_session_title'):
 
 # --- Chat Display ---
 for entry in st.session_state.chat_history:
-    if entry['role'] == 'user':
-        st.chat_message("user").markdown(f"<span style='color:#90caf9; font-weight:bold;'>🧑‍💻 You:</span> {entry['content']}", unsafe_allow_html=True)
-    elif entry['role'] == 'assistant':
-        st.chat_message("assistant").markdown(f"<span style='color:#388e3c; font-weight:bold;'>🤖 AgenticBot:</span> {entry['content']}", unsafe_allow_html=True)
-        # Show image if present
-        if entry.get('image_data'):
+    if entry.role == 'user':
+        st.chat_message("user").markdown(f"<span style='color:#90caf9; font-weight:bold;'>🧑‍💻 You:</span> {entry.content}", unsafe_allow_html=True)
+    elif entry.role == 'assistant':
+        st.chat_message("assistant").markdown(f"<span style='color:#388e3c; font-weight:bold;'>🤖 AgenticBot:</span> {entry.content}", unsafe_allow_html=True)
+        # Show image if present (read lazily from the blob store, legacy sessions embed base64)
+        if entry.image_ref or entry.image_data:
             try:
-                image_bytes = base64.b64decode(entry['image_data'])
+                image_bytes = history_manager.load_image(entry)
                 st.image(BytesIO(image_bytes), caption="Generated Image", use_column_width=True)
             except Exception:
                 st.warning("[Image could not be displayed]")
@@ -409,15 +533,15 @@ if st.session_state.agentic_logs:
                 'tool_execution': 'tool-execution', 
                 'api_call': 'api-call',
                 'result_processed': 'result-processed'
-            }.get(log['type'], '')
+            }.get(log.type, '')
             
-            st.markdown(f'<div class="agentic-log {css_class}">{log["full_message"]}</div>', unsafe_allow_html=True)
+            st.markdown(f'<div class="agentic-log {css_class}">{log.full_message}</div>', unsafe_allow_html=True)
 
 # --- Tool Trace Display ---
 if st.session_state.tool_trace:
     with st.expander("🔧 Tool/Action Trace", expanded=False):
         for trace in st.session_state.tool_trace[-5:]:
-            st.markdown(trace)
+            st.markdown(trace.summary)
 
 # --- User Input ---
 st.markdown("</div>", unsafe_allow_html=True)  # Close main-chat-card
@@ -428,11 +552,7 @@ if user_input:
     clear_agentic_logs()
     
     # Add timestamp to user message
-    user_message = {
-        'role': 'user', 
-        'content': user_input,
-        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
+    user_message = ChatMessage('user', user_input, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
     st.session_state.chat_history.append(user_message)
     
     response_text = ""
@@ -449,7 +569,7 @@ if user_input:
             query = user_input[11:]
             log_agentic_step('agent_step', f"🎯 Delegating to Search Agent for query: '{query}'")
             log_agentic_step('tool_execution', "🔧 Search Agent preparing web search tool...")
-            tool_trace = f"🔍 Web search for: {query}"
+            tool_trace = ToolEvent('web_search', f"🔍 Web search for: {query}")
             
             log_agentic_step('api_call', "🌐 Executing Firecrawl web search API call...")
             result = web_search(query)
@@ -469,7 +589,7 @@ if user_input:
             url = user_input[7:]
             log_agentic_step('agent_step', f"🎯 Delegating to Web Extraction Agent for URL: '{url}'")
             log_agentic_step('tool_execution', "🔧 Web Extraction Agent preparing webpage scraper...")
-            tool_trace = f"🕸️ Scraping: {url}"
+            tool_trace = ToolEvent('web_scraping', f"🕸️ Scraping: {url}")
             
             log_agentic_step('api_call', "🌐 Executing Firecrawl webpage scraping API call...")
             result = scrape_webpage(url)
@@ -488,7 +608,7 @@ if user_input:
             topic = user_input[9:]
             log_agentic_step('agent_step', f"🎯 Delegating to Research Agent for topic: '{topic}'")
             log_agentic_step('tool_execution', "🔧 Research Agent preparing deep research tool...")
-            tool_trace = f"🔬 Researching: {topic}"
+            tool_trace = ToolEvent('deep_research', f"🔬 Researching: {topic}")
             
             log_agentic_step('api_call', "🌐 Executing Firecrawl deep research API call...")
             result = deep_research(topic)
@@ -506,7 +626,7 @@ if user_input:
             prompt = user_input[15:]
             log_agentic_step('agent_step', f"🎯 Delegating to Image Generation Agent for prompt: '{prompt}'")
             log_agentic_step('tool_execution', "🔧 Image Generation Agent preparing Gemini Imagen model...")
-            tool_trace = f"🎨 Generating image: {prompt}"
+            tool_trace = ToolEvent('image_generation', f"🎨 Generating image: {prompt}")
             
             log_agentic_step('api_call', "🌐 Executing Google Gemini Imagen API call...")
             result = generate_image(prompt)
@@ -543,7 +663,7 @@ if user_input:
         elif any(word in user_input.lower() for word in ["weather", "current", "latest", "news", "today's", "now"]):
             log_agentic_step('agent_step', f"🎯 Detected current info request, delegating to Search Agent")
             log_agentic_step('tool_execution', "🔧 Search Agent preparing real-time information search...")
-            tool_trace = f"🔍 Detected current info request, searching for: {user_input}"
+            tool_trace = ToolEvent('web_search', f"🔍 Detected current info request, searching for: {user_input}")
             
             log_agentic_step('api_call', "🌐 Executing Firecrawl web search for current information...")
             result = web_search(user_input)
@@ -573,18 +693,18 @@ if user_input:
 
     # Save tool trace
     if tool_trace:
-        st.session_state.tool_trace.append(tool_trace)
+        st.session_state.tool_trace.append(replace(tool_trace, timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
 
     # Final log entry
     log_agentic_step('agent_step', "🏁 Task completed - response ready for user")
 
-    # Save assistant response with timestamp
-    assistant_message = {
-        'role': 'assistant',
-        'content': response_text,
-        'image_data': image_data,
-        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
+    # Save assistant response with timestamp; image bytes go to the blob store once
+    assistant_message = ChatMessage(
+        'assistant',
+        response_text,
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        image_ref=history_manager.blob_store.put_base64(image_data) if image_data else None,
+    )
     st.session_state.chat_history.append(assistant_message)
     
     # Auto-save session after each interaction (this will update existing sessions properly)
@@ -0,0 +1,69 @@
+"""
+Tests for the content-addressed image blob store
+"""
+
+import base64
+import json
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blob_store import BlobStore
+from history_manager import HistoryManager
+from test_history_manager import make_session
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def with_image(text, image_bytes=PNG_BYTES):
+    session = make_session(text)
+    session['chat_history'][1]['image_data'] = base64.b64encode(image_bytes).decode()
+    return session
+
+
+def test_identical_images_are_stored_once(tmp_path):
+    store = BlobStore(str(tmp_path))
+    first = store.put(PNG_BYTES)
+    second = store.put_base64(base64.b64encode(PNG_BYTES).decode())
+
+    assert first == second
+    assert list(store.iter_refs()) == [first]
+    assert store.get(first) == PNG_BYTES
+
+
+def test_sessions_keep_only_a_reference(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    caller_session = with_image("draw a robot")
+    filepath = manager.save_session(caller_session)
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    message = raw['chat_history'][1]
+    assert 'image_data' not in message
+    assert message['image_ref'].startswith("sha256:")
+    assert raw['metadata']['image_refs'] == [message['image_ref']]
+    assert manager.load_image(message) == PNG_BYTES
+
+
+def test_gc_removes_unreferenced_blobs(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    kept = manager.save_session(with_image("kept", PNG_BYTES))
+    dropped = manager.save_session(with_image("dropped", PNG_BYTES + b"other"))
+    manager.delete_session(dropped)
+
+    assert manager.gc_blobs(grace_seconds=3600) == 0
+    assert manager.gc_blobs(grace_seconds=-1) == 1
+    kept_ref = manager.load_session(kept)['chat_history'][1]['image_ref']
+    assert list(manager.blob_store.iter_refs()) == [kept_ref]
+
+
+def test_storing_again_restarts_the_grace_period(tmp_path):
+    store = BlobStore(str(tmp_path))
+    ref = store.put(PNG_BYTES)
+    os.utime(store.path_for(ref), (0, 0))
+
+    assert store.put(PNG_BYTES) == ref
+    assert store.gc(set(), grace_seconds=3600) == 0
+    assert store.get(ref) == PNG_BYTES
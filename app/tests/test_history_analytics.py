@@ -0,0 +1,98 @@
+"""
+Tests for incremental usage analytics
+"""
+
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_analytics import UsageAnalytics, build_fact
+from history_manager import HistoryManager
+from test_history_manager import make_session
+
+
+def exchange(session, question, answer, day="2025-07-11"):
+    session['chat_history'] += [
+        {'role': 'user', 'content': question, 'timestamp': f"{day} 12:10:00"},
+        {'role': 'assistant', 'content': answer, 'timestamp': f"{day} 12:10:05"},
+    ]
+
+
+def test_fact_counts_tools_errors_and_days():
+    session = make_session("hello")
+    exchange(session, "search for x", "Search failed: quota", day="2025-07-12")
+    session['tool_events'] = [{'tool': 'web_search', 'summary': "🔍", 'timestamp': None}] * 2
+    session['updated_at'] = "2025-07-11 12:30:00"
+
+    fact = build_fact(session)
+
+    assert fact['days'] == {"2025-07-11": 2, "2025-07-12": 2}
+    assert (fact['messages'], fact['replies'], fact['errors']) == (4, 2, 1)
+    assert fact['tools'] == {'web_search': 2}
+    assert fact['seconds'] == 1800
+
+
+def test_legacy_sessions_infer_tools_from_logs():
+    assert build_fact(make_session())['tools'] == {'web_search': 1}
+
+
+def test_rollups_follow_saves_and_deletes(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    session = make_session("first")
+    filepath = manager.save_session(session)
+    assert manager.usage_summary()['messages'] == 2
+
+    # Re-saving replaces the session's contribution instead of adding to it
+    exchange(session, "again", "❌ Error: boom")
+    manager.save_session(session)
+    other = manager.save_session(make_session("second"))
+    stats = manager.usage_summary()
+    assert (stats['sessions'], stats['messages'], stats['errors']) == (2, 6, 1)
+    assert stats['error_rate'] == 1 / 3
+    assert stats['tools'] == {'web_search': 2}
+    assert sum(stats['session_durations'].values()) == 2
+
+    manager.delete_session(other)
+    stats = manager.usage_summary()
+    assert (stats['sessions'], stats['messages']) == (1, 4)
+    manager.delete_all_session_files(session['session_id'])
+    assert manager.usage_summary()['sessions'] == 0
+    assert manager.usage_summary()['messages_per_day'] == {}
+    assert os.path.exists(filepath) is False
+
+
+def test_rollups_are_shared_across_processes_and_compaction(tmp_path):
+    writer = HistoryManager(history_dir=str(tmp_path))
+    reader = UsageAnalytics(str(tmp_path))
+    writer.analytics.COMPACT_AFTER = 3
+    for i in range(5):
+        writer.save_session(make_session(f"session {i}"))
+
+    assert reader.summary()['sessions'] == 5
+    assert reader.summary() == writer.usage_summary()
+
+
+def test_summary_does_not_read_sessions(tmp_path, monkeypatch):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    for i in range(3):
+        manager.save_session(make_session(f"session {i}"))
+    monkeypatch.setattr(manager.backend, 'read_session', lambda *args: None)
+    monkeypatch.setattr(manager.backend, 'list_sessions', lambda *args: [])
+
+    assert manager.usage_summary()['sessions'] == 3
+
+
+def test_backfill_counts_existing_history(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    for i in range(3):
+        manager.save_session(make_session(f"session {i}"))
+    for name in (UsageAnalytics.SNAPSHOT_FILENAME, UsageAnalytics.LOG_FILENAME):
+        if os.path.exists(os.path.join(str(tmp_path), name)):
+            os.remove(os.path.join(str(tmp_path), name))
+
+    fresh = HistoryManager(history_dir=str(tmp_path))
+    assert fresh.usage_summary()['sessions'] == 0
+    assert fresh.backfill_analytics() == 3
+    assert fresh.usage_summary()['messages'] == 6
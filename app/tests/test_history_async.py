@@ -0,0 +1,105 @@
+"""
+Tests for the asyncio front-end of HistoryManager
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_async import AsyncHistoryManager
+from history_manager import HistoryManager
+from test_history_manager import make_session
+
+
+class ConcurrencyProbe:
+    """Wraps a blocking call and records how many ran at once"""
+
+    def __init__(self, func, delay=0.05):
+        self.func = func
+        self.delay = delay
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            time.sleep(self.delay)
+            return self.func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def test_round_trip(tmp_path):
+    async def scenario():
+        async with AsyncHistoryManager(HistoryManager(history_dir=str(tmp_path))) as history:
+            filepath = await history.save(make_session("asynchronous persistence"))
+            assert (await history.load(filepath))['chat_history'][0]['content'] == "asynchronous persistence"
+            assert [s['filepath'] for s in await history.list()] == [filepath]
+            assert [s['filepath'] for s in await history.search("persistence")] == [filepath]
+            assert [m['role'] for m in await history.load_messages(filepath, 1)] == ['assistant']
+            assert await history.delete(filepath)
+            assert await history.list() == []
+
+    asyncio.run(scenario())
+
+
+def test_batches_keep_order_and_report_failures(tmp_path):
+    async def scenario():
+        async with AsyncHistoryManager(HistoryManager(history_dir=str(tmp_path))) as history:
+            paths = await history.save_many([make_session(f"batch {i}") for i in range(5)])
+            loaded = await history.load_many(paths + [str(tmp_path / "missing.json")])
+            assert [s['chat_history'][0]['content'] for s in loaded[:5]] == [f"batch {i}" for i in range(5)]
+            assert loaded[5] is None
+            assert await history.delete_many(paths[:3]) == 3
+            assert len(await history.list()) == 2
+
+    asyncio.run(scenario())
+
+
+def test_loads_run_in_parallel_within_the_pool_limit(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    paths = [manager.save_session(make_session(f"parallel {i}")) for i in range(8)]
+    manager.load_session = probe = ConcurrencyProbe(manager.load_session)
+
+    async def scenario():
+        async with AsyncHistoryManager(manager, max_workers=3) as history:
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            loaded = await history.load_many(paths)
+            task.cancel()
+            assert all(loaded)
+            # The loop kept running while the pool was busy with disk reads
+            assert ticks >= 5
+
+    asyncio.run(scenario())
+    assert probe.peak == 3
+
+
+def test_index_updates_take_turns(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    # The manager's own lock serializes index updates; probe the write made under it
+    manager.backend.write_session = probe = ConcurrencyProbe(manager.backend.write_session, delay=0.01)
+
+    async def scenario():
+        async with AsyncHistoryManager(manager, max_workers=4, max_pending=2) as history:
+            await history.save_many([make_session(f"serial {i}") for i in range(6)])
+            assert len(await history.list()) == 6
+
+    asyncio.run(scenario())
+    assert probe.peak == 1
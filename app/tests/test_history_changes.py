@@ -0,0 +1,98 @@
+"""
+Tests for the cross-process history change feed
+"""
+
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_changes import ChangeFeed
+from history_manager import HistoryManager
+from history_retention import RetentionEngine, RetentionPolicy
+from test_history_manager import make_session
+
+
+def test_generations_are_shared_between_feeds(tmp_path):
+    writer = ChangeFeed(str(tmp_path))
+    reader = ChangeFeed(str(tmp_path))
+    assert reader.generation() == 0
+    assert reader.changes_since(0) == []
+
+    assert writer.record('save', "a") == 1
+    assert writer.record('save', "b") == 2
+    assert reader.changed_since(0)
+    assert not reader.changed_since(2)
+    assert [(c['generation'], c['op'], c['session_id']) for c in reader.changes_since(1)] == [(2, 'save', "b")]
+    assert reader.changed_sessions(0) == {"a", "b"}
+
+    writer.record('reset')
+    assert reader.changed_sessions(2) is None
+
+
+def test_manager_records_saves_deletes_and_archiving(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    other = HistoryManager(history_dir=str(tmp_path))
+    first = make_session("first")
+    filepath = manager.save_session(first)
+    second = make_session("second")
+    manager.save_session(second)
+    start = other.changes.generation()
+
+    manager.save_session(first)
+    manager.delete_session(filepath)
+    RetentionEngine(manager, RetentionPolicy(max_sessions=0)).run_until_done()
+
+    changes = other.changes_since(start)
+    assert [(c['op'], c['session_id']) for c in changes] == [
+        ('save', first['session_id']), ('delete', first['session_id']), ('archive', second['session_id'])]
+    assert manager.cleanup_duplicate_sessions() == 0
+    assert other.changes.generation() == start + 3
+
+
+def test_session_summary_follows_changes(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    session = make_session("first")
+    manager.save_session(session)
+    assert manager.session_summary(session['session_id']) == manager.list_sessions()[0]
+    assert manager.session_summary("missing") is None
+
+    RetentionEngine(manager, RetentionPolicy(max_sessions=0)).run_until_done()
+    assert manager.session_summary(session['session_id']) is None
+    archived = manager.session_summary(session['session_id'], include_archived=True)
+    assert archived == manager.list_sessions(include_archived=True)[0]
+    assert archived['archived'] is True
+
+
+def test_readers_behind_compaction_must_reset(tmp_path):
+    writer = ChangeFeed(str(tmp_path))
+    reader = ChangeFeed(str(tmp_path))
+    writer.COMPACT_AFTER, writer.KEEP = 10, 4
+    for i in range(5):
+        writer.record('save', str(i))
+    assert reader.generation() == 5
+
+    for i in range(5, 12):
+        writer.record('save', str(i))
+
+    assert len(writer.records) < 10
+    assert reader.generation() == 12
+    assert reader.changes_since(5) is None
+    assert reader.changed_sessions(10) == {"10", "11"}
+    # A reader ahead of the feed (history recreated) resets too
+    assert ChangeFeed(str(tmp_path / "fresh")).changes_since(3) is None
+
+
+def test_partial_records_wait_for_their_newline(tmp_path):
+    feed = ChangeFeed(str(tmp_path))
+    feed.record('save', "a")
+    with open(feed.log_path, 'a', encoding='utf-8') as f:
+        f.write('{"generation":2,"op":"sa')
+
+    reader = ChangeFeed(str(tmp_path))
+    assert reader.generation() == 1
+    with open(feed.log_path, 'a', encoding='utf-8') as f:
+        f.write('ve","session_id":"b","at":0}\n')
+    assert reader.generation() == 2
+    assert feed.record('delete', "b") == 3
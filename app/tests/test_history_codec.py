@@ -0,0 +1,144 @@
+"""
+Tests for compressed session storage and header-only reads
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import history_backends
+from history_codec import (
+    COMPRESSION_SUFFIXES, decode_session, detect_compression, encode_session, read_prefix, read_session_header
+)
+from history_manager import HistoryManager
+from test_history_manager import make_session
+
+
+@pytest.mark.parametrize("method", [None] + list(COMPRESSION_SUFFIXES))
+def test_encode_decode_round_trip(method):
+    session = make_session("ünïcode <b>html</b>", session_id="abc")
+    raw = encode_session(session, method)
+
+    assert detect_compression(raw) == method
+    assert decode_session(raw) == session
+
+
+@pytest.mark.parametrize("method", list(COMPRESSION_SUFFIXES))
+def test_compressed_sessions_save_list_and_load(tmp_path, method):
+    manager = HistoryManager(history_dir=str(tmp_path), compression=method)
+    session = make_session("weather in Atlanta")
+    filepath = manager.save_session(session)
+
+    assert filepath.endswith(".json" + COMPRESSION_SUFFIXES[method])
+    assert manager.load_session(filepath)['title'] == "weather in Atlanta"
+    assert [s['filepath'] for s in manager.list_sessions()] == [filepath]
+
+    session['chat_history'].append({'role': 'user', 'content': "again", 'timestamp': "2025-07-11 12:05:00"})
+    assert manager.save_session(session) == filepath
+    assert manager.find_existing_session_file(session['session_id']) == filepath
+
+
+def test_loading_does_not_depend_on_configured_compression(tmp_path):
+    HistoryManager(history_dir=str(tmp_path), compression='lzma').save_session(make_session("old format"))
+
+    plain = HistoryManager(history_dir=str(tmp_path))
+    sessions = plain.list_sessions()
+    assert plain.load_session(sessions[0]['filepath'])['title'] == "old format"
+
+
+def test_changing_compression_rewrites_the_file(tmp_path):
+    session = make_session("switching", session_id="switch")
+    first = HistoryManager(history_dir=str(tmp_path)).save_session(session)
+    second = HistoryManager(history_dir=str(tmp_path), compression='gzip').save_session(session)
+
+    assert second == first + ".gz"
+    assert not os.path.exists(first)
+    assert len(HistoryManager(history_dir=str(tmp_path)).list_sessions()) == 1
+
+
+def test_convert_sessions_migrates_directory(tmp_path):
+    plain = HistoryManager(history_dir=str(tmp_path), journal=True)
+    session = make_session("journaled")
+    plain.save_session(session)
+    session['chat_history'].append({'role': 'user', 'content': "appended", 'timestamp': "2025-07-11 12:05:00"})
+    plain.save_session(session)
+    plain.save_session(make_session("second"))
+
+    compressed = HistoryManager(history_dir=str(tmp_path), compression='zlib')
+    report = compressed.convert_sessions()
+    assert report['converted'] == 2
+    assert report['bytes_after'] < report['bytes_before']
+    assert all(name.endswith(".zz") for name in os.listdir(tmp_path) if name.startswith("chat_"))
+
+    sessions = compressed.list_sessions()
+    assert len(sessions) == 2
+    loaded = compressed.load_session(compressed.find_existing_session_file(session['session_id']))
+    assert loaded['chat_history'][-1]['content'] == "appended"
+    assert compressed.convert_sessions()['converted'] == 0
+
+
+def big_session(text, session_id=None):
+    session = make_session(text, session_id=session_id)
+    session['chat_history'].extend(
+        {'role': 'assistant', 'content': "x" * 1000, 'image_data': None, 'timestamp': "2025-07-11 12:00:03"}
+        for _ in range(200)
+    )
+    return session
+
+
+@pytest.mark.parametrize("method", [None] + list(COMPRESSION_SUFFIXES))
+def test_header_is_read_from_a_bounded_prefix(tmp_path, method):
+    manager = HistoryManager(history_dir=str(tmp_path), compression=method)
+    filepath = manager.save_session(big_session("large session"))
+
+    assert len(read_prefix(filepath, 4096)) == 4096
+    header = read_session_header(filepath)
+    assert header['title'] == "large session"
+    assert header['metadata']['total_messages'] == 202
+    assert 'chat_history' not in header
+
+
+def test_legacy_files_fall_back_to_full_parse(tmp_path):
+    legacy = dict(make_session("legacy", session_id="legacy"))
+    legacy.update(updated_at="2025-07-11 12:00:00", metadata={'total_messages': 2})
+    filepath = os.path.join(str(tmp_path), "chat_20250711_120000_legacy.json")
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(legacy, f)
+
+    assert read_session_header(filepath) is None
+    manager = HistoryManager(history_dir=str(tmp_path))
+    assert manager.backend.read_header(filepath)['metadata'] == {'total_messages': 2}
+
+
+def test_header_includes_journaled_updates(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path), journal=True)
+    session = make_session("journaled")
+    filepath = manager.save_session(session)
+    session['chat_history'].append({'role': 'user', 'content': "more", 'timestamp': "2025-07-11 12:05:00"})
+    manager.save_session(session)
+
+    header = manager.backend.read_header(filepath)
+    assert header['metadata']['total_messages'] == 3
+    assert header['updated_at'] == session['updated_at']
+
+
+def test_duplicate_cleanup_reads_only_headers(tmp_path, monkeypatch):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    session = big_session("dup", session_id="dup")
+    newest = manager.save_session(session)
+    older = os.path.join(str(tmp_path), "chat_20200101_000000_dup.json")
+    with open(older, 'wb') as f:
+        f.write(encode_session(dict(session, updated_at="2020-01-01 00:00:00")))
+
+    def fail(raw):
+        raise AssertionError("unexpected full parse")
+
+    monkeypatch.setattr(history_backends, 'decode_session', fail)
+    assert manager.session_file_counts() == {"dup": 2}
+    assert manager.cleanup_duplicate_sessions() == 1
+    assert os.path.exists(newest) and not os.path.exists(older)
@@ -0,0 +1,146 @@
+"""
+Tests for streaming session export
+"""
+
+import io
+import json
+import os
+import sys
+import tarfile
+from datetime import datetime
+
+import pytest
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_codec import encode_session, iter_session_stream, open_session_stream
+from history_export import SessionExporter
+from history_manager import HistoryManager
+from history_retention import RetentionEngine, RetentionPolicy
+from test_history_manager import make_session
+
+
+def conversation(topic, turns, session_id=None):
+    session = make_session(f"{topic} 0", session_id=session_id)
+    del session['chat_history'][1:]
+    for i in range(1, turns):
+        session['chat_history'].append({'role': 'assistant', 'content': f"{topic} {i}", 'timestamp': "2025-07-11 10:00:00"})
+    return session
+
+
+def ndjson(exporter):
+    out = io.BytesIO()
+    stats = exporter.write_ndjson(out)
+    return stats, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+@pytest.mark.parametrize("compression", [None, "gzip", "zlib", "lzma"])
+def test_stream_parser_yields_body_items_one_by_one(compression):
+    session = conversation("chunked", 50, session_id="s1")
+    session['title'] = 'tricky "chat_history": [ title'
+    raw = encode_session(session, compression)
+
+    parts = list(iter_session_stream(open_session_stream(io.BufferedReader(io.BytesIO(raw))), chunk_size=7))
+
+    assert [value for key, value in parts if key == 'chat_history'] == session['chat_history']
+    assert ('title', session['title']) in parts
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_iter_messages_matches_load_session(tmp_path, backend):
+    manager = HistoryManager(history_dir=str(tmp_path), backend=backend, **({'journal': True} if backend == 'json' else {}))
+    session = conversation("journaled", 3)
+    manager.save_session(session)
+    session['chat_history'].append({'role': 'user', 'content': "appended", 'timestamp': "2025-07-11 11:00:00"})
+    filepath = manager.save_session(session)
+
+    assert list(manager.iter_messages(filepath)) == manager.load_session(filepath)['chat_history']
+
+
+def test_ndjson_export_streams_every_message(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    for i in range(3):
+        manager.save_session(conversation(f"topic{i}", 4))
+
+    stats, records = ndjson(SessionExporter(manager))
+
+    assert stats == {'sessions': 3, 'messages': 12, 'skipped': 0, 'bytes': stats['bytes']}
+    assert [r['message_index'] for r in records if r['content'].startswith("topic1")] == [0, 1, 2, 3]
+    assert {r['session_title'] for r in records} == {"topic0 0", "topic1 0", "topic2 0"}
+
+
+def test_read_errors_leave_no_partial_session(tmp_path, monkeypatch):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    broken = manager.save_session(conversation("broken", 4))
+    manager.save_session(conversation("fine", 4))
+    iter_messages = manager.iter_messages
+
+    def failing(filepath):
+        messages = iter_messages(filepath)
+        if filepath == broken:
+            yield next(messages)
+            raise OSError("disk error")
+        yield from messages
+    monkeypatch.setattr(manager, 'iter_messages', failing)
+
+    stats, records = ndjson(SessionExporter(manager))
+    assert (stats['sessions'], stats['skipped'], stats['messages']) == (1, 1, 4)
+    assert {r['session_title'] for r in records} == {"fine 0"}
+
+def test_export_filters_by_session_and_date(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    kept = manager.save_session(conversation("kept", 2))
+    manager.save_session(conversation("other", 2))
+    session_id = manager.list_sessions()[-1]['session_id']
+    assert manager.list_sessions()[-1]['filepath'] == kept
+
+    _, records = ndjson(SessionExporter(manager, session_ids=[session_id]))
+    assert {r['session_id'] for r in records} == {session_id}
+
+    _, records = ndjson(SessionExporter(manager, since=datetime(2999, 1, 1)))
+    assert records == []
+    _, records = ndjson(SessionExporter(manager, until=datetime(2000, 1, 1)))
+    assert records == []
+
+
+def test_tar_export_includes_archived_sessions(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    for i in range(3):
+        manager.save_session(conversation(f"topic{i}", 2))
+    RetentionEngine(manager, RetentionPolicy(max_sessions=1)).run_until_done()
+
+    out = io.BytesIO()
+    stats = SessionExporter(manager).write_tar(out)
+    out.seek(0)
+    with tarfile.open(fileobj=out) as tar:
+        members = {member.name: json.load(tar.extractfile(member)) for member in tar.getmembers()}
+
+    assert stats['sessions'] == 3
+    assert sorted(session['title'] for session in members.values()) == ["topic0 0", "topic1 0", "topic2 0"]
+    assert len(list(manager.iter_messages(manager.list_sessions(include_archived=True)[-1]['filepath']))) == 2
+
+
+def test_parallel_export_keeps_order(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    for i in range(6):
+        manager.save_session(conversation(f"topic{i}", 3))
+
+    _, serial = ndjson(SessionExporter(manager))
+    stats, parallel = ndjson(SessionExporter(manager, workers=2))
+
+    assert parallel == serial
+    assert stats['sessions'] == 6
+
+
+def test_txt_export_streams_messages(tmp_path, monkeypatch):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    filepath = manager.save_session(conversation("plain", 3))
+    monkeypatch.setattr(manager, 'load_session', lambda *args: pytest.fail("txt export loaded the whole session"))
+
+    export_path = manager.export_session(filepath, 'txt')
+
+    with open(export_path, encoding='utf-8') as f:
+        text = f.read()
+    assert "AgenticBot Chat Session: plain 0" in text
+    assert "AgenticBot: plain 2" in text
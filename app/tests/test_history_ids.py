@@ -0,0 +1,72 @@
+"""
+Tests for time-sortable session ids and filename metadata
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_backends import session_created_at, session_filename
+from history_ids import is_ulid, new_session_id, session_id_time
+from history_manager import HistoryManager
+from test_history_manager import make_session
+
+
+def test_ids_are_ulids_in_creation_order():
+    ids = [new_session_id() for _ in range(1000)]
+
+    assert all(is_ulid(session_id) for session_id in ids)
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+
+
+def test_id_encodes_creation_time():
+    before = datetime.now() - timedelta(seconds=1)
+    created = session_id_time(new_session_id())
+
+    assert before <= created <= datetime.now() + timedelta(seconds=1)
+    assert session_id_time("a1b2c3d4") is None
+
+
+def test_filename_carries_creation_time():
+    session_id = new_session_id()
+    filename = session_filename(session_id)
+
+    assert filename.endswith(f"_{session_id}.json")
+    assert abs(session_created_at(filename) - session_id_time(session_id)) < timedelta(seconds=1)
+    assert session_created_at("chat_20250711_120000_a1b2c3d4.json") == datetime(2025, 7, 11, 12, 0, 0)
+
+
+def test_new_sessions_get_ulids_and_old_files_still_load(tmp_path):
+    legacy = os.path.join(str(tmp_path), "chat_20250711_120000_a1b2c3d4.json")
+    with open(legacy, 'w', encoding='utf-8') as f:
+        json.dump(dict(make_session("legacy", session_id="a1b2c3d4"), title="legacy", updated_at="2025-07-11 12:00:00"), f)
+
+    manager = HistoryManager(history_dir=str(tmp_path))
+    filepath = manager.save_session(make_session("new"))
+    sessions = manager.list_sessions()
+
+    assert is_ulid(sessions[0]['session_id'])
+    assert sessions[0]['filepath'] == filepath
+    assert manager.load_session(legacy)['title'] == "legacy"
+
+
+def test_listing_orders_by_recency_without_opening_files(tmp_path, monkeypatch):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    first = manager.save_session(make_session("first"))
+    second = manager.save_session(make_session("second"))
+    past = time.time() - 3600
+    os.utime(second, (past, past))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("unexpected file open")
+
+    monkeypatch.setattr("builtins.open", fail)
+    listing = manager.backend.listing()
+    assert [entry['filepath'] for entry in listing] == [first, second]
+    assert all(entry['created_at'] is not None for entry in listing)
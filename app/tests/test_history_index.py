@@ -0,0 +1,107 @@
+"""
+Tests for the session metadata index used by the JSON history backend
+"""
+
+import json
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_index import SessionIndex
+from history_manager import HistoryManager
+from test_history_manager import make_session
+
+
+def test_list_sessions_uses_index_without_parsing(tmp_path, monkeypatch):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    manager.save_session(make_session("first"))
+    manager.save_session(make_session("second"))
+
+    def fail(filepath):
+        raise AssertionError(f"unexpected parse of {filepath}")
+
+    monkeypatch.setattr(manager.backend, 'read_session', fail)
+    assert {s['title'] for s in manager.list_sessions()} == {"first", "second"}
+
+
+def test_index_picks_up_external_changes(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    filepath = manager.save_session(make_session("original"))
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    data['title'] = "edited elsewhere"
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.remove(manager.save_session(make_session("removed elsewhere")))
+
+    other = HistoryManager(history_dir=str(tmp_path))
+    assert [s['title'] for s in other.list_sessions()] == ["edited elsewhere"]
+
+
+def test_delete_updates_index(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    filepath = manager.save_session(make_session())
+    manager.delete_session(filepath)
+
+    index = SessionIndex(str(tmp_path))
+    index.load()
+    assert index.entries == {}
+
+
+def test_saves_do_not_rescan_or_rewrite_the_index(tmp_path, monkeypatch):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    manager.save_session(make_session("first"))
+    manager.list_sessions()
+    scans = []
+    original_scan = manager.backend.scan
+    monkeypatch.setattr(manager.backend, 'scan', lambda *args, **kwargs: scans.append(1) or original_scan(*args, **kwargs))
+    snapshot = os.path.join(str(tmp_path), SessionIndex.INDEX_FILENAME)
+    before = os.stat(snapshot).st_mtime_ns if os.path.exists(snapshot) else None
+
+    for i in range(5):
+        session = make_session(f"new {i}", session_id=manager.generate_session_id())
+        manager.save_session(session)
+        session['chat_history'].append({'role': 'user', 'content': "more", 'timestamp': "2025-07-11 12:01:00"})
+        manager.save_session(session)
+
+    assert len(manager.list_sessions()) == 6
+    assert scans == []
+    assert (os.stat(snapshot).st_mtime_ns if os.path.exists(snapshot) else None) == before
+
+
+def test_index_log_is_compacted_and_shared(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    manager.backend.index.COMPACT_AFTER = 4
+    other = HistoryManager(history_dir=str(tmp_path))
+    for i in range(6):
+        manager.save_session(make_session(f"session {i}"))
+    assert len(other.list_sessions()) == 6
+
+    manager.delete_session(manager.list_sessions()[0]['filepath'])
+    index = SessionIndex(str(tmp_path))
+    index.load()
+    assert len(index.entries) == 5
+    with open(index.log_path, 'rb') as f:
+        assert len(f.readlines()) < 4
+
+
+def test_shrunk_log_without_snapshot_reloads(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    for i in range(3):
+        manager.save_session(make_session(f"session {i}"))
+    index = SessionIndex(str(tmp_path))
+    index.load()
+    assert len(index.entries) == 3
+
+    # The log is replaced by a shorter one and there is no snapshot
+    with open(index.log_path, 'rb') as f:
+        first = f.readline()
+    with open(index.log_path, 'wb') as f:
+        f.write(first)
+    if os.path.exists(index.path):
+        os.remove(index.path)
+    index.load()
+    assert len(index.entries) == 1
@@ -0,0 +1,83 @@
+"""
+Tests for atomic writes and locking of history files
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+import threading
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_io import FileLock, atomic_write, session_lock
+from history_manager import HistoryManager
+from test_history_manager import make_session
+
+
+def test_atomic_write_replaces_and_leaves_no_temp_files(tmp_path):
+    path = str(tmp_path / "data.json")
+    atomic_write(path, '{"a": 1}')
+    atomic_write(path, b'{"a": 2}')
+
+    with open(path, 'r', encoding='utf-8') as f:
+        assert json.load(f) == {'a': 2}
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+def test_file_lock_excludes_other_threads(tmp_path):
+    lock_path = str(tmp_path / "x.lock")
+    inside = []
+    overlaps = []
+
+    def worker():
+        for _ in range(20):
+            with FileLock(lock_path):
+                inside.append(1)
+                if len(inside) > 1:
+                    overlaps.append(1)
+                inside.pop()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert overlaps == []
+
+
+def test_session_lock_is_stable_per_session(tmp_path):
+    assert session_lock(str(tmp_path), "abc").path == session_lock(str(tmp_path), "abc").path
+
+
+def _save_many(history_dir, session_id, worker, count):
+    manager = HistoryManager(history_dir=history_dir, journal=True)
+    session = make_session(f"worker {worker}", session_id=session_id)
+    for i in range(count):
+        session['chat_history'].append({'role': 'user', 'content': f"w{worker} m{i}", 'timestamp': "2025-07-11 12:05:00"})
+        manager.save_session(session)
+
+
+def test_concurrent_processes_never_leave_torn_files(tmp_path):
+    history_dir = str(tmp_path)
+    context = multiprocessing.get_context('fork') if hasattr(os, 'fork') else multiprocessing.get_context()
+    processes = [
+        context.Process(target=_save_many, args=(history_dir, f"session-{worker % 2}", worker, 10))
+        for worker in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+
+    manager = HistoryManager(history_dir=history_dir)
+    sessions = manager.list_sessions()
+    assert sorted(s['session_id'] for s in sessions) == ["session-0", "session-1"]
+    for summary in sessions:
+        session = manager.load_session(summary['filepath'])
+        assert session is not None
+        assert session['chat_history']
+    assert len(manager.search_sessions("worker")) == 2
+    assert not [name for name in os.listdir(history_dir) if name.endswith(".tmp")]
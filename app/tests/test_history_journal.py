@@ -0,0 +1,109 @@
+"""
+Tests for the append-only session journal of the JSON history backend
+"""
+
+import json
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_journal import journal_path
+from history_manager import HistoryManager
+from history_records import ToolEvent
+from test_history_manager import make_session
+
+
+def add_exchange(session, n):
+    session['chat_history'].append({'role': 'user', 'content': f"question {n}", 'timestamp': "2025-07-11 12:10:00"})
+    session['chat_history'].append({'role': 'assistant', 'content': f"answer {n}", 'timestamp': "2025-07-11 12:10:01"})
+    session['agentic_logs'] = [{'timestamp': "[12:10:00] ", 'type': 'agent_step', 'message': f"step {n}",
+                                'full_message': f"[12:10:00] step {n}"}]
+
+
+def test_saves_append_to_journal_and_load_replays(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path), journal=True)
+    session = make_session()
+    filepath = manager.save_session(session)
+    snapshot = open(filepath, 'rb').read()
+
+    add_exchange(session, 1)
+    add_exchange(session, 2)
+    manager.save_session(session)
+
+    assert open(filepath, 'rb').read() == snapshot
+    assert os.path.exists(journal_path(filepath))
+
+    loaded = HistoryManager(history_dir=str(tmp_path), journal=True).load_session(filepath)
+    assert [m['content'] for m in loaded['chat_history']][-2:] == ["question 2", "answer 2"]
+    assert [log['message'] for log in loaded['agentic_logs']] == ["step 2"]
+    assert loaded['metadata']['total_messages'] == 6
+    assert manager.list_sessions()[0]['total_messages'] == 6
+
+
+def test_tool_events_are_journaled(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path), journal=True)
+    session = make_session()
+    session['tool_events'] = [ToolEvent('web_search', "🔍 one")]
+    filepath = manager.save_session(session)
+
+    add_exchange(session, 1)
+    session['tool_events'] = session['tool_events'] + [ToolEvent('image_generation', "🎨 two")]
+    manager.save_session(session)
+    assert os.path.exists(journal_path(filepath))
+
+    loaded = HistoryManager(history_dir=str(tmp_path), journal=True).load_session(filepath)
+    assert [event['tool'] for event in loaded['tool_events']] == ['web_search', 'image_generation']
+    assert loaded['metadata']['tools_used'] == ['image_generation', 'web_search']
+
+    # A replaced trace is journaled as a reset
+    session['tool_events'] = [ToolEvent('deep_research', "📚 three")]
+    manager.save_session(session)
+    loaded = HistoryManager(history_dir=str(tmp_path), journal=True).load_session(filepath)
+    assert [event['tool'] for event in loaded['tool_events']] == ['deep_research']
+
+
+def test_journal_is_compacted_into_snapshot(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path), journal=True, compact_after=5)
+    session = make_session()
+    filepath = manager.save_session(session)
+    for n in range(4):
+        add_exchange(session, n)
+        manager.save_session(session)
+
+    with open(filepath, 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+    assert len(snapshot['chat_history']) >= 6
+    assert manager.load_session(filepath)['chat_history'] == session['chat_history']
+
+
+def test_edited_history_rewrites_snapshot(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path), journal=True)
+    session = make_session()
+    filepath = manager.save_session(session)
+    add_exchange(session, 1)
+    manager.save_session(session)
+
+    session['chat_history'][0] = dict(session['chat_history'][0], content="edited")
+    manager.save_session(session)
+
+    assert not os.path.exists(journal_path(filepath))
+    assert manager.load_session(filepath)['chat_history'][0]['content'] == "edited"
+
+
+def test_stale_journal_is_not_replayed(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path), journal=True)
+    session = make_session()
+    filepath = manager.save_session(session)
+    add_exchange(session, 1)
+    manager.save_session(session)
+    journal = open(journal_path(filepath), 'rb').read()
+
+    # Simulate a crash between writing a new snapshot and removing the old journal
+    session['chat_history'][0] = dict(session['chat_history'][0], content="edited")
+    manager.save_session(session)
+    with open(journal_path(filepath), 'wb') as f:
+        f.write(journal)
+
+    assert len(manager.load_session(filepath)['chat_history']) == 4
@@ -0,0 +1,107 @@
+"""
+Tests for the date-sharded history layout
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_codec import encode_session
+from history_manager import HistoryManager
+from test_history_manager import make_session
+
+
+def write_flat(history_dir, stamp, session_id, text="hello there"):
+    """Drop a session file into the top-level directory as an older version of the app would"""
+    filepath = os.path.join(history_dir, f"chat_{stamp}_{session_id}.json")
+    with open(filepath, 'wb') as f:
+        f.write(encode_session(dict(make_session(text, session_id=session_id), title=text)))
+    return filepath
+
+
+def test_new_sessions_go_into_month_shards(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path), layout='date')
+    filepath = manager.save_session(make_session())
+
+    assert os.path.dirname(os.path.relpath(filepath, tmp_path)) == datetime.now().strftime(os.path.join("%Y", "%m"))
+    assert manager.list_sessions()[0]['filepath'] == filepath
+    assert manager.load_session(filepath)['chat_history'][0]['content'] == "hello there"
+
+
+def test_flat_and_sharded_sessions_are_both_found(tmp_path):
+    write_flat(str(tmp_path), "20240115_100000", "old00001", "flat one")
+    manager = HistoryManager(history_dir=str(tmp_path), layout='date')
+    sharded = manager.save_session(make_session("sharded one"))
+
+    assert {s['title'] for s in manager.list_sessions()} == {"flat one", "sharded one"}
+    assert manager.backend.find_session("old00001") == os.path.join(str(tmp_path), "chat_20240115_100000_old00001.json")
+
+    session = manager.load_session(sharded)
+    session['chat_history'].append({'role': 'user', 'content': "more", 'timestamp': "2025-07-11 12:00:03"})
+    assert manager.save_session(session) == sharded
+
+
+def test_unknown_layout_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        HistoryManager(history_dir=str(tmp_path), layout='weekly')
+
+
+def test_bounded_listing_only_scans_overlapping_shards(tmp_path, monkeypatch):
+    for stamp, session_id in [("20240115_100000", "jan00001"), ("20240220_100000", "feb00001"),
+                              ("20250301_100000", "mar00001")]:
+        write_flat(str(tmp_path), stamp, session_id)
+    manager = HistoryManager(history_dir=str(tmp_path), layout='date')
+    assert manager.relocate_sessions() == {'moved': 3, 'kept': 0}
+
+    scanned = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda path: scanned.append(os.path.relpath(path, tmp_path)) or real_scandir(path))
+    entries = manager.backend.listing(since=datetime(2024, 2, 1), until=datetime(2024, 12, 31))
+
+    assert [entry['session_id'] for entry in entries] == ["feb00001"]
+    assert os.path.join("2024", "01") not in scanned
+    assert os.path.join("2025", "03") not in scanned
+
+
+def test_relocate_moves_files_and_journals_and_back(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path), journal=True)
+    session = make_session("journaled")
+    filepath = manager.save_session(session)
+    session['chat_history'].append({'role': 'user', 'content': "appended", 'timestamp': "2025-07-11 12:00:03"})
+    assert manager.save_session(session) == filepath
+    assert os.path.exists(filepath + ".journal")
+    write_flat(str(tmp_path), "20240115_100000", "old00001")
+
+    sharded = HistoryManager(history_dir=str(tmp_path), journal=True, layout='date')
+    assert sharded.relocate_sessions() == {'moved': 2, 'kept': 0}
+    assert [name for name in os.listdir(tmp_path) if name.startswith("chat_")] == []
+
+    moved = sharded.backend.find_session(session['session_id'])
+    assert os.path.dirname(moved) != str(tmp_path)
+    assert not os.path.exists(moved + ".journal")
+    assert [m['content'] for m in sharded.load_session(moved)['chat_history']][-1] == "appended"
+    assert len(sharded.list_sessions()) == 2
+
+    flat = HistoryManager(history_dir=str(tmp_path), layout='flat')
+    assert flat.relocate_sessions() == {'moved': 2, 'kept': 0}
+    assert not any(name.isdigit() for name in os.listdir(tmp_path))
+    assert {s['session_id'] for s in flat.list_sessions()} == {session['session_id'], "old00001"}
+
+
+def test_index_notices_files_added_to_a_shard(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path), layout='date')
+    manager.save_session(make_session("first"))
+    assert len(manager.list_sessions()) == 1
+
+    # Another tool adds a file to an existing shard
+    other = HistoryManager(history_dir=str(tmp_path), layout='date')
+    other.save_session(make_session("second"))
+    shard = os.path.join(str(tmp_path), datetime.now().strftime(os.path.join("%Y", "%m")))
+    write_flat(shard, datetime.now().strftime("%Y%m%d_%H%M%S"), "ext00001", "third")
+
+    assert {s['title'] for s in manager.list_sessions()} == {"first", "second", "third"}
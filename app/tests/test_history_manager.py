@@ -0,0 +1,124 @@
+"""
+Tests for HistoryManager persistence across storage backends
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_manager import HistoryManager
+
+
+def make_session(text="hello there", session_id=None):
+    """Build a minimal session payload like streamlit_app.save_current_session"""
+    return {
+        'session_id': session_id,
+        'created_at': "2025-07-11 12:00:00",
+        'title': None,
+        'chat_history': [
+            {'role': 'user', 'content': text, 'timestamp': "2025-07-11 12:00:01"},
+            {'role': 'assistant', 'content': f"reply to {text}", 'image_data': None, 'timestamp': "2025-07-11 12:00:02"},
+        ],
+        'agentic_logs': [
+            {'timestamp': "[12:00:01] ", 'type': 'agent_step', 'message': "🎯 Delegating to Search Agent",
+             'full_message': "[12:00:01] 🎯 Delegating to Search Agent"},
+        ],
+    }
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def manager(request, tmp_path):
+    return HistoryManager(history_dir=str(tmp_path / "history"), backend=request.param)
+
+
+def test_save_and_load_round_trip(manager):
+    locator = manager.save_session(make_session())
+    loaded = manager.load_session(locator)
+
+    assert loaded['title'] == "hello there"
+    assert loaded['chat_history'][1]['content'] == "reply to hello there"
+    assert loaded['agentic_logs'][0]['type'] == 'agent_step'
+    assert loaded['metadata']['tools_used'] == ['web_search']
+
+
+def test_resave_updates_existing_session(manager):
+    session = make_session()
+    first = manager.save_session(session)
+    session['chat_history'].append({'role': 'user', 'content': "again", 'timestamp': "2025-07-11 12:01:00"})
+    second = manager.save_session(session)
+
+    assert first == second
+    sessions = manager.list_sessions()
+    assert len(sessions) == 1
+    assert sessions[0]['total_messages'] == 3
+
+
+def test_list_search_and_delete(manager):
+    manager.save_session(make_session("weather in Atlanta"))
+    manager.save_session(make_session("busiest malls"))
+
+    assert len(manager.list_sessions()) == 2
+    hits = manager.search_sessions("atlanta")
+    assert [hit['title'] for hit in hits] == ["weather in Atlanta"]
+
+    assert manager.delete_session(hits[0]['filepath'])
+    assert [s['title'] for s in manager.list_sessions()] == ["busiest malls"]
+
+
+def test_threads_can_share_a_manager(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path), journal=True)
+    manager.backend.index.COMPACT_AFTER = 5
+    manager.search_index.COMPACT_AFTER = 5
+    errors = []
+
+    def run(work):
+        try:
+            for i in range(25):
+                work(i)
+        except Exception as e:
+            errors.append(e)
+
+    def save(i):
+        session = make_session(f"thread {threading.get_ident()} topic{i}")
+        manager.save_session(session)
+        session['chat_history'].append({'role': 'user', 'content': f"more {i}", 'timestamp': "2025-07-11 12:05:00"})
+        manager.save_session(session)
+
+    def read(i):
+        for session in manager.list_sessions(limit=5):
+            manager.load_session(session['filepath'])
+        manager.search_sessions(f"topic{i}", mode='ranked')
+        manager.list_sessions(include_archived=True)
+
+    threads = [threading.Thread(target=run, args=(work,)) for work in (save, save, read, read, read)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(manager.list_sessions()) == 50
+    assert HistoryManager(history_dir=str(tmp_path)).usage_summary()['sessions'] == 50
+
+
+def test_index_updates_wait_for_the_manager_lock(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    filepath = manager.save_session(make_session("existing"))
+    done = []
+    calls = [lambda: manager.save_session(make_session("new")), lambda: manager.list_sessions(),
+             lambda: manager.search_sessions("existing"), lambda: manager.load_session_header(filepath)]
+
+    with manager.lock:
+        threads = [threading.Thread(target=lambda call=call: done.append(call())) for call in calls]
+        for thread in threads:
+            thread.start()
+        threads[0].join(0.2)
+        assert done == []
+    for thread in threads:
+        thread.join()
+    assert len(done) == 4
@@ -0,0 +1,124 @@
+"""
+Tests for migrating sessions between history backends
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_manager import HistoryManager
+from history_migration import HistoryMigration
+from test_history_manager import make_session
+
+
+def populate(manager, count):
+    for i in range(count):
+        manager.save_session(make_session(f"topic number{i}"))
+
+
+def contents(manager):
+    # SQLite fills in image_data: None for every message, so compare what was said
+    return {s['session_id']: [(m['role'], m['content']) for m in manager.load_session(s['filepath'])['chat_history']]
+            for s in manager.list_sessions()}
+
+
+@pytest.mark.parametrize("source_backend,destination_backend", [("json", "sqlite"), ("sqlite", "json")])
+def test_migrates_every_session(tmp_path, source_backend, destination_backend):
+    source = HistoryManager(history_dir=str(tmp_path / "source"), backend=source_backend)
+    destination = HistoryManager(history_dir=str(tmp_path / "destination"), backend=destination_backend)
+    populate(source, 7)
+
+    report = HistoryMigration(source, destination, batch_size=3).run()
+
+    assert (report['migrated'], report['skipped'], report['failed']) == (7, 0, 0)
+    assert report['sessions_per_second'] > 0
+    assert contents(destination) == contents(source)
+    assert destination.changes.changed_sessions(0) == set(contents(source))
+    assert destination.usage_summary()['sessions'] == 7
+    assert len(destination.search_sessions("number3")) == 1
+
+
+def test_keeps_newest_copy(tmp_path):
+    source = HistoryManager(history_dir=str(tmp_path / "source"))
+    destination = HistoryManager(history_dir=str(tmp_path / "destination"), backend="sqlite")
+    populate(source, 2)
+    HistoryMigration(source, destination).run()
+
+    newer = destination.load_session(destination.list_sessions()[0]['filepath'])
+    newer['chat_history'].append({'role': 'user', 'content': "only in destination", 'timestamp': "2025-07-12 09:00:00"})
+    newer['updated_at'] = "2999-01-01 00:00:00"
+    destination.backend.write_session(newer)
+
+    report = HistoryMigration(source, destination).run()
+
+    assert (report['migrated'], report['skipped']) == (0, 2)
+    assert destination.load_session(newer['session_id'])['chat_history'][-1]['content'] == "only in destination"
+
+
+def test_resumes_after_interruption(tmp_path, monkeypatch):
+    source = HistoryManager(history_dir=str(tmp_path / "source"))
+    destination = HistoryManager(history_dir=str(tmp_path / "destination"), backend="sqlite")
+    populate(source, 6)
+    checkpoint = str(tmp_path / "checkpoint.json")
+    migration = HistoryMigration(source, destination, batch_size=2, checkpoint_path=checkpoint)
+
+    def interrupt(report):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        migration.run(progress=interrupt)
+    assert os.path.exists(checkpoint)
+    assert len(destination.list_sessions()) == 2
+
+    read = []
+    original_read = source.backend.read_session
+    monkeypatch.setattr(source.backend, 'read_session', lambda locator: read.append(locator) or original_read(locator))
+    report = migration.run()
+
+    assert report['resumed'] and report['migrated'] == 6
+    assert len(read) == 4
+    assert not os.path.exists(checkpoint)
+    assert contents(destination) == contents(source)
+
+
+def test_resume_migrates_sessions_updated_since(tmp_path):
+    source = HistoryManager(history_dir=str(tmp_path / "source"))
+    destination = HistoryManager(history_dir=str(tmp_path / "destination"), backend="sqlite")
+    populate(source, 6)
+    checkpoint = str(tmp_path / "checkpoint.json")
+    migration = HistoryMigration(source, destination, batch_size=2, checkpoint_path=checkpoint)
+
+    def interrupt(report):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        migration.run(progress=interrupt)
+    migrated = destination.list_sessions()[0]['session_id']
+
+    # A session copied before the interruption is continued in between runs
+    session = source.load_session(source.find_existing_session_file(migrated))
+    session['chat_history'].append({'role': 'user', 'content': "continued", 'timestamp': "2099-01-01 00:00:00"})
+    session['updated_at'] = "2099-01-01 00:00:00"
+    source.backend.write_session(session)
+
+    report = migration.run()
+    assert report['migrated'] == 7
+    assert contents(destination) == contents(source)
+    assert destination.load_session(migrated)['chat_history'][-1]['content'] == "continued"
+
+
+def test_copies_images_to_new_directory(tmp_path):
+    source = HistoryManager(history_dir=str(tmp_path / "source"))
+    destination = HistoryManager(history_dir=str(tmp_path / "destination"))
+    session = make_session("draw something")
+    session['chat_history'][1]['image_data'] = "aW1hZ2U="
+    source.save_session(session)
+
+    HistoryMigration(source, destination).run()
+
+    message = destination.load_session(destination.list_sessions()[0]['filepath'])['chat_history'][1]
+    assert destination.load_image(message) == b"image"
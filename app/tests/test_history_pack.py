@@ -0,0 +1,104 @@
+"""
+Tests for memory-mapped session packs and the archive built on them
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_manager import HistoryManager
+from history_pack import PackReader, write_pack
+from history_retention import RetentionEngine, RetentionPolicy
+from test_history_export import conversation
+
+
+def pack_file(tmp_path, sessions):
+    path = str(tmp_path / "sessions.pack")
+    with open(path, 'wb') as f:
+        write_pack(f, sessions)
+    return path
+
+
+def test_pack_round_trip_and_message_ranges(tmp_path):
+    sessions = [conversation("first", 5, session_id="s1"), conversation("ünïcode, \"quoted\"", 3, session_id="s2"),
+                conversation("empty", 1, session_id="s3")]
+    sessions[2]['chat_history'] = []
+
+    with PackReader(pack_file(tmp_path, sessions)) as pack:
+        assert [pack.read_session(s['session_id']) for s in sessions] == sessions
+        assert pack.message_count("s1") == 5
+        assert pack.read_messages("s1", 1, 3) == sessions[0]['chat_history'][1:3]
+        assert pack.read_messages("s1", -2) == sessions[0]['chat_history'][-2:]
+        assert pack.read_messages("s1", 4, 2) == []
+        assert list(pack.iter_messages("s2", chunk_size=2)) == sessions[1]['chat_history']
+        assert pack.read_header("s1") == {k: v for k, v in sessions[0].items() if k != 'chat_history'}
+        with pytest.raises(KeyError):
+            pack.read_header("missing")
+
+
+def test_pack_reads_only_the_requested_span(tmp_path):
+    sessions = [conversation("one", 40, session_id="s1"), conversation("two", 3, session_id="s2")]
+    path = pack_file(tmp_path, sessions)
+    with PackReader(path) as pack:
+        begin, count = pack.sessions["s1"]['messages']
+
+    # Garble the end of the first session's last message block; the rest is unaffected
+    with open(path, 'r+b') as f:
+        f.seek(begin - 10)
+        f.write(b"\xff" * 10)
+    with PackReader(path) as pack:
+        assert pack.read_session("s2") == sessions[1]
+        assert pack.read_messages("s1", 0, 1) == sessions[0]['chat_history'][:1]
+
+
+def test_message_blocks_are_compressed(tmp_path):
+    session = conversation("repetitive " * 20, 100, session_id="s1")
+    path = pack_file(tmp_path, [session])
+    with PackReader(path) as pack:
+        assert pack.sessions["s1"]['block'] == 32
+        assert pack.read_messages("s1", 30, 70) == session['chat_history'][30:70]
+    assert os.path.getsize(path) < len(json.dumps(session)) / 4
+
+
+def test_rejects_files_that_are_not_packs(tmp_path):
+    path = tmp_path / "bogus.pack"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        PackReader(str(path))
+
+
+def archived_history(tmp_path, count=3, turns=4):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    ids = []
+    for i in range(count):
+        manager.save_session(conversation(f"topic{i}", turns))
+        ids.append(manager.list_sessions()[0]['session_id'])
+    RetentionEngine(manager, RetentionPolicy(max_sessions=0)).run_until_done()
+    assert manager.list_sessions() == []
+    return manager, ids
+
+
+def test_archived_sessions_load_by_id_and_range(tmp_path):
+    manager, ids = archived_history(tmp_path)
+    assert [name for name in os.listdir(os.path.join(str(tmp_path), "archive")) if name.endswith(".pack")]
+
+    session = manager.load_session(ids[1])
+    assert session['title'] == "topic1 0"
+    assert manager.load_session(manager.find_existing_session_file(ids[1])) == session
+    assert [m['content'] for m in manager.load_messages(ids[1], 1, 3)] == ["topic1 1", "topic1 2"]
+    assert list(manager.iter_messages(ids[1])) == session['chat_history']
+    assert manager.load_session_header(ids[1])['title'] == "topic1 0"
+
+
+def test_load_messages_of_active_sessions(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    filepath = manager.save_session(conversation("active", 5))
+
+    assert [m['content'] for m in manager.load_messages(filepath, 2, 4)] == ["active 2", "active 3"]
+    assert [m['content'] for m in manager.load_messages(filepath, -1)] == ["active 4"]
+
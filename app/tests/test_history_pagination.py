@@ -0,0 +1,96 @@
+"""
+Tests for cursor-paginated session listing and search
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_manager import HistoryManager
+from test_history_manager import make_session
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def manager(request, tmp_path):
+    return HistoryManager(history_dir=str(tmp_path / "history"), backend=request.param)
+
+
+def save_with_time(manager, text, updated_at):
+    """Save a session and pin its updated_at so the expected order is known"""
+    session = make_session(text, session_id=text.replace(" ", "-"))
+    manager.save_session(session)
+    session['updated_at'] = updated_at
+    manager.backend.write_session(session)
+    return session
+
+
+def all_pages(fetch, limit):
+    titles, cursor = [], None
+    while True:
+        page = fetch(limit=limit, cursor=cursor)
+        assert len(page) <= limit
+        titles.extend(s['title'] for s in page)
+        cursor = page.next_cursor
+        if cursor is None:
+            return titles
+
+
+def test_list_sessions_pages_in_recency_order(manager):
+    for i in range(7):
+        save_with_time(manager, f"topic {i}", f"2025-07-11 12:00:0{i}")
+    # Two sessions with the same updated_at are ordered by session_id
+    save_with_time(manager, "topic tie", "2025-07-11 12:00:03")
+
+    expected = [s['title'] for s in manager.list_sessions()]
+    assert expected[:3] == ["topic 6", "topic 5", "topic 4"]
+    assert all_pages(manager.list_sessions, 3) == expected
+
+    first = manager.list_sessions(limit=8)
+    assert len(first) == 8 and first.next_cursor is None
+
+
+def test_cursor_survives_changes_between_pages(manager):
+    for i in range(5):
+        save_with_time(manager, f"topic {i}", f"2025-07-11 12:00:0{i}")
+
+    first = manager.list_sessions(limit=2)
+    assert [s['title'] for s in first] == ["topic 4", "topic 3"]
+
+    # A new session and a deletion ahead of the cursor do not shift the next page
+    save_with_time(manager, "newest", "2025-07-11 13:00:00")
+    manager.delete_session(first[0]['filepath'])
+    second = manager.list_sessions(limit=2, cursor=first.next_cursor)
+    assert [s['title'] for s in second] == ["topic 2", "topic 1"]
+
+
+def test_search_sessions_pages(manager):
+    for i in range(5):
+        save_with_time(manager, f"weather report {i}", f"2025-07-11 12:00:0{i}")
+    save_with_time(manager, "unrelated", "2025-07-11 12:00:09")
+
+    for mode in ('index', 'ranked', 'substring'):
+        full = [s['title'] for s in manager.search_sessions("weather", mode=mode)]
+        assert len(full) == 5
+        paged = all_pages(lambda **kw: manager.search_sessions("weather", mode=mode, **kw), 2)
+        assert paged == full
+
+
+def test_invalid_cursor_is_rejected(manager):
+    with pytest.raises(ValueError):
+        manager.list_sessions(limit=2, cursor="not a cursor")
+
+
+def test_json_listing_skips_scan_when_directory_unchanged(tmp_path, monkeypatch):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    manager.save_session(make_session("first"))
+    manager.list_sessions(limit=1)
+
+    def fail():
+        raise AssertionError("unexpected directory scan")
+
+    monkeypatch.setattr(manager.backend, 'scan', fail)
+    assert [s['title'] for s in manager.list_sessions(limit=1)] == ["first"]
@@ -0,0 +1,101 @@
+"""
+Tests for the slotted chat state records
+"""
+
+import dataclasses
+import os
+import sys
+
+import pytest
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_manager import HistoryManager
+from history_records import ChatMessage, LogEntry, ToolEvent, as_dicts, logs_from_dicts, messages_from_dicts
+from test_history_manager import make_session
+
+
+def test_message_round_trip_keeps_unknown_keys():
+    data = {'role': 'assistant', 'content': "hi", 'timestamp': "2025-07-11 12:00:02", 'image_ref': "sha256:abc",
+            'model': "gemini"}
+    message = ChatMessage.from_dict(data)
+
+    assert message.to_dict() == data
+    assert message.extra == {'model': "gemini"}
+    assert ChatMessage.from_dict({'role': 'user', 'content': "x"}).to_dict() == {'role': 'user', 'content': "x"}
+
+
+def test_log_full_message_is_derived():
+    entry = LogEntry('agent_step', "🎯 Delegating", "[12:00:01] ")
+
+    assert entry.full_message == "[12:00:01] 🎯 Delegating"
+    assert entry.to_dict() == {'timestamp': "[12:00:01] ", 'type': 'agent_step', 'message': "🎯 Delegating",
+                               'full_message': "[12:00:01] 🎯 Delegating"}
+    assert LogEntry.from_dict(entry.to_dict()) == entry
+    assert entry.extra is None
+
+    edited = {'timestamp': "", 'type': 'agent_step', 'message': "a", 'full_message': "something else"}
+    assert LogEntry.from_dict(edited).to_dict() == edited
+
+
+def test_records_are_slotted_and_immutable():
+    message = ChatMessage('user', "hello")
+    for record in (message, LogEntry('agent_step', "x"), ToolEvent('web_search', "🔍 Web search for: x")):
+        assert not hasattr(record, '__dict__')
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        message.content = "changed"
+    assert messages_from_dicts([{'role': 'user', 'content': "a"}])[0].role is sys.intern('user')
+
+
+def test_save_session_accepts_records(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    session = make_session("slotted records")
+    session['chat_history'] = messages_from_dicts(session['chat_history'])
+    session['agentic_logs'] = logs_from_dicts(session['agentic_logs'])
+
+    filepath = manager.save_session(session)
+    loaded = manager.load_session(filepath)
+
+    assert loaded['chat_history'] == [
+        {'role': 'user', 'content': "slotted records", 'timestamp': "2025-07-11 12:00:01"},
+        {'role': 'assistant', 'content': "reply to slotted records", 'timestamp': "2025-07-11 12:00:02"},
+    ]
+    assert loaded['agentic_logs'][0]['full_message'] == "[12:00:01] 🎯 Delegating to Search Agent"
+    assert loaded['metadata']['tools_used'] == ['web_search']
+    assert as_dicts(messages_from_dicts(loaded['chat_history'])) == loaded['chat_history']
+
+
+def test_load_image_accepts_records(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    ref = manager.blob_store.put(b"png bytes")
+
+    assert manager.load_image(ChatMessage('assistant', "image", image_ref=ref)) == b"png bytes"
+
+
+def test_saves_convert_only_new_records(tmp_path, monkeypatch):
+    manager = HistoryManager(history_dir=str(tmp_path), journal=True)
+    converted = []
+    to_dict = ChatMessage.to_dict
+    monkeypatch.setattr(ChatMessage, 'to_dict', lambda message: converted.append(message) or to_dict(message))
+    session = make_session("incremental conversion")
+    messages = messages_from_dicts(session['chat_history'])
+    session['chat_history'] = list(messages)
+    manager.save_session(session)
+    first = session['chat_history']
+
+    messages.append(ChatMessage('user', "follow-up"))
+    converted.clear()
+    session['chat_history'] = list(messages)
+    filepath = manager.save_session(session)
+
+    assert converted == [messages[-1]]
+    assert all(new is old for new, old in zip(session['chat_history'], first))
+    assert manager.load_session(filepath)['chat_history'][-1]['content'] == "follow-up"
+
+    # An edited record is converted again
+    messages[0] = ChatMessage('user', "edited")
+    converted.clear()
+    session['chat_history'] = list(messages)
+    manager.save_session(session)
+    assert converted == messages
@@ -0,0 +1,208 @@
+"""
+Tests for the retention engine and archive bundles
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_manager import HistoryManager
+from history_retention import RetentionEngine, RetentionPolicy
+from test_history_manager import make_session
+
+
+def make_history(tmp_path, count, **options):
+    """Save sessions whose files look progressively older"""
+    manager = HistoryManager(history_dir=str(tmp_path), **options)
+    now = time.time()
+    for i in range(count):
+        filepath = manager.save_session(make_session(f"topic number{i}"))
+        age = (count - i) * 86400
+        os.utime(filepath, (now - age, now - age))
+    return manager
+
+
+def bundles(tmp_path):
+    return [name for name in os.listdir(os.path.join(str(tmp_path), "archive")) if name.endswith(".pack")]
+
+
+def entry(days_old, size=100):
+    return {'modified': datetime.now() - timedelta(days=days_old), 'size': size}
+
+
+def test_policy_selects_by_age_count_and_bytes():
+    listing = [entry(1), entry(2), entry(10), entry(40)]
+
+    assert RetentionPolicy(max_age_days=30).select(listing) == [listing[3]]
+    assert RetentionPolicy(max_sessions=2).select(listing) == [listing[3], listing[2]]
+    assert RetentionPolicy(max_bytes=250).select(listing) == [listing[3], listing[2]]
+    assert RetentionPolicy().select(listing) == []
+
+
+def test_policy_from_env(monkeypatch):
+    monkeypatch.setenv("AGENTICBOT_RETENTION_DAYS", "7")
+    monkeypatch.setenv("AGENTICBOT_RETENTION_MAX_SESSIONS", "")
+    monkeypatch.setenv("AGENTICBOT_RETENTION_MAX_MB", "1")
+    policy = RetentionPolicy.from_env()
+
+    assert (policy.max_age_days, policy.max_sessions, policy.max_bytes) == (7, None, 1024 * 1024)
+    assert policy.enabled
+
+
+def test_policy_is_off_unless_configured(monkeypatch):
+    for name in ("AGENTICBOT_RETENTION_DAYS", "AGENTICBOT_RETENTION_MAX_SESSIONS", "AGENTICBOT_RETENTION_MAX_MB"):
+        monkeypatch.delenv(name, raising=False)
+
+    assert not RetentionPolicy.from_env().enabled
+
+
+def test_policy_ranks_duplicate_copies_once():
+    listing = [dict(entry(1), session_id="a"), dict(entry(2), session_id="b"), dict(entry(3), session_id="a"),
+               dict(entry(4), session_id="c")]
+
+    assert RetentionPolicy(max_sessions=2).select(listing) == [listing[3]]
+    assert RetentionPolicy(max_bytes=250).select(listing) == [listing[3]]
+
+
+def test_engine_archives_in_batches(tmp_path):
+    manager = make_history(tmp_path, 7)
+    engine = RetentionEngine(manager, RetentionPolicy(max_sessions=2), batch_size=3)
+
+    assert engine.run_once() == 3
+    assert len(manager.list_sessions()) == 4
+    assert engine.run_until_done() == 2
+    active = manager.list_sessions()
+    assert sorted(s['title'] for s in active) == ["topic number5", "topic number6"]
+    assert len(manager.list_sessions(include_archived=True)) == 7
+    assert len(bundles(tmp_path)) == 2
+
+
+def test_archived_sessions_stay_searchable_and_loadable(tmp_path):
+    manager = make_history(tmp_path, 3, journal=True)
+    RetentionEngine(manager, RetentionPolicy(max_age_days=1.5)).run_until_done()
+
+    hits = manager.search_sessions("number0", mode='ranked')
+    assert [hit['title'] for hit in hits] == ["topic number0"]
+    assert hits[0]['archived'] is True
+    loaded = manager.load_session(hits[0]['filepath'])
+    assert loaded['chat_history'][0]['content'] == "topic number0"
+    assert manager.search_sessions("tlant", mode='substring') == []
+    assert len(manager.search_sessions("topic", mode='substring')) == 3
+
+
+def test_continuing_an_archived_session_restores_it(tmp_path):
+    manager = make_history(tmp_path, 2)
+    RetentionEngine(manager, RetentionPolicy(max_sessions=1)).run_until_done()
+    locator = manager.list_sessions(include_archived=True)[-1]['filepath']
+
+    session = manager.load_session(locator)
+    session['chat_history'].append({'role': 'user', 'content': "back again", 'timestamp': "2025-07-12 09:00:00"})
+    filepath = manager.save_session(session)
+
+    assert not manager.archive.is_locator(filepath)
+    assert manager.archive.summaries() == []
+    assert len(manager.list_sessions()) == 2
+
+
+def test_session_saved_during_archiving_is_kept_active(tmp_path, monkeypatch):
+    manager = make_history(tmp_path, 2)
+    engine = RetentionEngine(manager, RetentionPolicy(max_sessions=1))
+    original_add = manager.archive.add
+
+    def add_then_save(sessions, **options):
+        bundle = original_add(sessions, **options)
+        for session in sessions:
+            session['chat_history'].append({'role': 'user', 'content': "late", 'timestamp': "2025-07-12 09:00:00"})
+            manager.save_session(dict(session))
+        return bundle
+
+    monkeypatch.setattr(manager.archive, 'add', add_then_save)
+    assert engine.run_once() == 0
+    assert len(manager.list_sessions()) == 2
+    assert manager.archive.summaries() == []
+
+
+def test_deleting_archived_session(tmp_path):
+    manager = make_history(tmp_path, 2)
+    RetentionEngine(manager, RetentionPolicy(max_sessions=0)).run_until_done()
+    sessions = manager.list_sessions(include_archived=True)
+
+    assert manager.delete_session(sessions[0]['filepath'])
+    assert manager.delete_all_session_files(sessions[1]['session_id']) == 1
+    assert manager.list_sessions(include_archived=True) == []
+    assert bundles(tmp_path) == []
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_engine_works_with_both_backends(tmp_path, backend):
+    manager = HistoryManager(history_dir=str(tmp_path), backend=backend)
+    for i in range(3):
+        manager.save_session(make_session(f"topic number{i}"))
+
+    assert RetentionEngine(manager, RetentionPolicy(max_sessions=1)).run_until_done() == 2
+    assert len(manager.list_sessions()) == 1
+    assert len(manager.list_sessions(include_archived=True)) == 3
+
+
+def test_listing_with_archive_merges_pages(tmp_path, monkeypatch):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    for day in range(1, 11):
+        session = dict(make_session(f"day {day}", session_id=f"s{day:02d}"), updated_at=f"2025-07-{day:02d} 12:00:00")
+        if day % 3:
+            manager.backend.write_session(session)
+        else:
+            manager.archive.add([session])
+    # An archived copy older than the active one is not listed twice
+    manager.archive.add([dict(make_session("stale", session_id="s01"), updated_at="2025-06-30 12:00:00")])
+    monkeypatch.setattr(manager.archive, 'summaries', lambda: pytest.fail("listed the whole archive"))
+
+    pages, cursor = [], None
+    while True:
+        page = manager.list_sessions(limit=3, cursor=cursor, include_archived=True)
+        pages.append([session['session_id'] for session in page])
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert pages == [["s10", "s09", "s08"], ["s07", "s06", "s05"], ["s04", "s03", "s02"], ["s01"]]
+    archived = [s['session_id'] for s in manager.list_sessions(include_archived=True) if s.get('archived')]
+    assert archived == ["s09", "s06", "s03"]
+
+def test_engines_with_a_stale_listing_keep_the_other_archive(tmp_path, monkeypatch):
+    manager = make_history(tmp_path, 2)
+    other = HistoryManager(history_dir=str(tmp_path))
+    first = RetentionEngine(manager, RetentionPolicy(max_sessions=1))
+    second = RetentionEngine(other, RetentionPolicy(max_sessions=1))
+    original_add = other.archive.add
+
+    def add_after_first_engine(sessions, **options):
+        # The first engine archives (and deletes) the session after the second one read it
+        assert first.run_once() == 1
+        return original_add(sessions, **options)
+
+    monkeypatch.setattr(other.archive, 'add', add_after_first_engine)
+    assert second.run_once() == 0
+
+    archived = other.list_sessions(include_archived=True)
+    assert [s.get('archived', False) for s in archived] == [False, True]
+    assert other.load_session(archived[1]['filepath'])['chat_history'][0]['content'] == "topic number0"
+    assert len(bundles(tmp_path)) == 1
+
+
+def test_sqlite_listing_reports_sizes(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path), backend="sqlite")
+    large = make_session("long")
+    large['chat_history'][1]['content'] = "é" * 5000
+    large = manager.save_session(large)
+    small = manager.save_session(make_session("short"))
+
+    sizes = {entry['filepath']: entry['size'] for entry in manager.backend.listing()}
+    assert sizes[large] - sizes[small] > 10000 - 100
+    assert RetentionEngine(manager, RetentionPolicy(max_bytes=5000)).run_until_done() == 1
+    assert [s['filepath'] for s in manager.list_sessions()] == [small]
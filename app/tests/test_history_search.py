@@ -0,0 +1,189 @@
+"""
+Tests for indexed history search
+"""
+
+import json
+import os
+import sys
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_manager import HistoryManager
+from history_search import SearchIndex, edit_distance, trigrams
+from test_history_manager import make_session
+
+
+def titles(sessions):
+    return sorted(s['title'] for s in sessions)
+
+
+def test_index_mode_matches_words_and_prefixes(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    manager.save_session(make_session("weather in Atlanta today"))
+    manager.save_session(make_session("busiest malls in the US"))
+
+    assert titles(manager.search_sessions("atlanta")) == ["weather in Atlanta today"]
+    assert titles(manager.search_sessions("busiest mal")) == ["busiest malls in the US"]
+    assert titles(manager.search_sessions("reply to")) == ["busiest malls in the US", "weather in Atlanta today"]
+    assert manager.search_sessions("atlanta malls") == []
+
+
+def test_substring_mode_is_still_available(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    manager.save_session(make_session("weather in Atlanta today"))
+
+    assert manager.search_sessions("tlant") == []
+    assert titles(manager.search_sessions("tlant", mode='substring')) == ["weather in Atlanta today"]
+
+
+def test_index_is_shared_and_kept_in_sync(tmp_path):
+    writer = HistoryManager(history_dir=str(tmp_path))
+    reader = HistoryManager(history_dir=str(tmp_path))
+    session = make_session("first topic")
+    writer.save_session(session)
+    assert titles(reader.search_sessions("first")) == ["first topic"]
+
+    session['chat_history'].append({'role': 'user', 'content': "quantum computing", 'timestamp': "2025-07-11 12:05:00"})
+    filepath = writer.save_session(session)
+    assert titles(reader.search_sessions("quantum")) == ["first topic"]
+
+    writer.delete_session(filepath)
+    assert reader.search_sessions("quantum") == []
+
+
+def test_growing_session_logs_only_new_postings(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    session = make_session("first topic")
+    manager.save_session(session)
+    for i in range(3):
+        session['chat_history'].append({'role': 'user', 'content': f"quantum turn{i}", 'timestamp': "2025-07-11 12:05:00"})
+        manager.save_session(session)
+
+    with open(manager.search_index.log_path, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert [('doc' in r, 'delta' in r) for r in records] == [(True, False)] + [(False, True)] * 3
+    assert records[-1]['delta']['tf'] == {'quantum': 1, 'turn2': 1}
+
+    rebuilt = SearchIndex(str(tmp_path / "rebuilt"))
+    rebuilt.add_session(manager.load_session(manager.find_existing_session_file(session['session_id'])))
+    fresh = SearchIndex(str(tmp_path))
+    fresh.load()
+    assert fresh.docs == rebuilt.docs
+    assert fresh.postings == rebuilt.postings
+
+    # Editing an earlier message re-indexes the whole session
+    session['chat_history'][0]['content'] = "edited opener"
+    manager.save_session(session)
+    assert titles(manager.search_sessions("edited")) == ["first topic"]
+    assert manager.search_index.docs[session['session_id']]['tf']['first'] == 1
+
+
+def test_index_survives_compaction(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    manager.search_index.COMPACT_AFTER = 3
+    for i in range(5):
+        manager.save_session(make_session(f"topic number{i}"))
+
+    fresh = HistoryManager(history_dir=str(tmp_path))
+    assert len(fresh.search_sessions("topic")) == 5
+    assert titles(fresh.search_sessions("number3")) == ["topic number3"]
+
+
+def test_ranked_mode_orders_by_relevance_with_snippets(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    mentions_once = make_session("travel plans")
+    mentions_once['chat_history'].append({'role': 'user', 'content': "is the weather nice", 'timestamp': "2025-07-11 12:03:00"})
+    manager.save_session(mentions_once)
+    manager.save_session(make_session("weather in Houston"))
+    manager.save_session(make_session("busiest malls"))
+
+    hits = manager.search_sessions("weather", mode='ranked')
+    assert [hit['title'] for hit in hits] == ["weather in Houston", "travel plans"]
+    assert hits[0]['score'] > hits[1]['score']
+
+    best = hits[1]
+    assert best['message_index'] == 2
+    start, end = best['snippet_offsets'][0]
+    assert best['snippet'][start:end] == "weather"
+
+
+def test_queries_sync_only_after_changes_and_read_one_message(tmp_path, monkeypatch):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    other = HistoryManager(history_dir=str(tmp_path))
+    manager.save_session(make_session("weather in Houston"))
+    syncs = []
+    original_sync = manager.search_index.sync
+    monkeypatch.setattr(manager.search_index, 'sync', lambda *args: syncs.append(1) or original_sync(*args))
+
+    def fail(filepath):
+        raise AssertionError(f"unexpected full load of {filepath}")
+
+    monkeypatch.setattr(manager, 'load_session', fail)
+    assert len(manager.search_sessions("weather", mode='ranked')) == 1
+    assert len(manager.search_sessions("houston", mode='ranked')) == 1
+    assert len(syncs) == 1
+
+    other.save_session(make_session("weather in Austin"))
+    hits = manager.search_sessions("weather", mode='ranked')
+    assert len(syncs) == 2
+    assert {hit['snippet'] for hit in hits} == {"weather in Houston", "weather in Austin"}
+
+
+def test_ranked_snippet_strips_html_and_limits_results(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    for i in range(3):
+        session = make_session(f"question {i}")
+        session['chat_history'][1]['content'] = "Search results:<br><br>1. <b>Quantum</b> computing news"
+        manager.save_session(session)
+
+    hits = manager.search_sessions("quant", mode='ranked', limit=2)
+    assert len(hits) == 2
+    assert "<b>" not in hits[0]['snippet']
+    start, end = hits[0]['snippet_offsets'][0]
+    assert hits[0]['snippet'][start:end] == "Quantum"
+
+
+def test_edit_distance_and_trigrams():
+    assert edit_distance("weather", "wether", 2) == 1
+    assert edit_distance("weather", "leather", 1) == 1
+    assert edit_distance("weather", "whether", 1) is None
+    assert edit_distance("machne", "machinery", 1, prefix=True) == 1
+    assert trigrams("cat") == {"  c", " ca", "cat", "at "}
+    assert trigrams("cat", prefix=True) == {"  c", " ca", "cat"}
+
+
+def test_fuzzy_search_tolerates_typos(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    manager.save_session(make_session("tomorrow's weather forecast"))
+    manager.save_session(make_session("quantum computing news"))
+
+    assert manager.search_sessions("wether forcast", mode='index') == []
+    assert titles(manager.search_sessions("wether forcast", mode='index', fuzzy=True)) == ["tomorrow's weather forecast"]
+
+    hits = manager.search_sessions("quantm compu", mode='ranked', fuzzy=True)
+    assert [hit['title'] for hit in hits] == ["quantum computing news"]
+    start, end = hits[0]['snippet_offsets'][0]
+    assert hits[0]['snippet'][start:end] == "quantum"
+
+
+def test_exact_matches_outrank_typo_matches(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    manager.save_session(make_session("notes about leather"))
+    manager.save_session(make_session("notes about weather"))
+
+    hits = manager.search_sessions("weather", mode='ranked', fuzzy=True)
+    assert [hit['title'] for hit in hits] == ["notes about weather", "notes about leather"]
+
+
+def test_trigram_postings_follow_the_vocabulary(tmp_path):
+    index = SearchIndex(str(tmp_path))
+    index.add_session({'session_id': "a", 'title': "Gardening", 'chat_history': [{'content': "tomatoes"}]})
+    index.add_session({'session_id': "b", 'title': "Cooking", 'chat_history': [{'content': "tomatoes"}]})
+
+    assert set(index.fuzzy_terms("tomatos")) == {"tomatoes"}
+    index.remove_session("a")
+    assert "tomatoes" in index.term_trigrams[" to"]
+    assert "gardening" not in index.term_trigrams.get(" ga", set())
+    index.remove_session("b")
+    assert index.term_trigrams == {}
@@ -0,0 +1,145 @@
+"""
+Tests for offline semantic search over chat history
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_manager import HistoryManager
+from history_semantic import HashedNgramEmbedder, SemanticIndex
+from test_history_manager import make_session
+
+
+def test_embeddings_are_normalized_and_stable():
+    embedder = HashedNgramEmbedder(dim=64)
+    vectors = embedder.embed(["searching the web", "searched the web", ""])
+
+    assert vectors.dtype == np.float32 and vectors.shape == (3, 64)
+    assert np.allclose(np.linalg.norm(vectors[:2], axis=1), 1.0)
+    assert not vectors[2].any()
+    assert np.array_equal(vectors, embedder.embed(["searching the web", "searched the web", ""]))
+    assert vectors[0] @ vectors[1] > 0.5
+
+
+def test_semantic_mode_matches_related_wording(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    manager.save_session(make_session("how do I bake sourdough bread at home"))
+    manager.save_session(make_session("quarterly revenue forecast for the sales team"))
+
+    hits = manager.search_sessions("baking breads", mode='semantic')
+
+    assert [hit['title'] for hit in hits][:1] == ["how do I bake sourdough bread at home"]
+    assert hits[0]['message_index'] == 0
+    assert manager.search_sessions("bakery", mode='ranked') == []
+
+
+def test_saves_do_not_embed_until_a_semantic_search(tmp_path, monkeypatch):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    embed = manager.semantic_index.embedder.embed
+    monkeypatch.setattr(manager.semantic_index.embedder, 'embed', lambda texts: pytest.fail("embedded on save"))
+    manager.save_session(make_session("how do I bake sourdough bread at home"))
+    assert manager.search_sessions("bread", mode='ranked')
+    assert not os.path.exists(manager.semantic_index.log_path)
+
+    monkeypatch.setattr(manager.semantic_index.embedder, 'embed', embed)
+    assert manager.search_sessions("baking breads", mode='semantic')
+
+
+def embed_changes(manager):
+    manager.search_sessions("anything", mode='semantic')
+
+
+def test_growing_session_embeds_only_new_messages(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    session = make_session("first question")
+    manager.save_session(session)
+    embed_changes(manager)
+    rows_before = manager.semantic_index._row_count
+
+    session['chat_history'].append({'role': 'user', 'content': "follow up", 'timestamp': "2025-07-11 12:05:00"})
+    manager.save_session(session)
+    embed_changes(manager)
+
+    assert manager.semantic_index._row_count == rows_before + 1
+    assert manager.semantic_index.sessions[session['session_id']]['count'] == 3
+
+    session['chat_history'][0] = {'role': 'user', 'content': "edited question", 'timestamp': "2025-07-11 12:00:01"}
+    manager.save_session(session)
+    embed_changes(manager)
+    assert manager.semantic_index._row_count == rows_before + 4
+    assert manager.semantic_index.dead_rows() == 3
+
+
+def test_index_is_shared_through_disk_and_compacts(tmp_path):
+    index = SemanticIndex(str(tmp_path), HashedNgramEmbedder(dim=32))
+    index.COMPACT_MIN_DEAD_ROWS = 4
+    for i in range(3):
+        index.add_session({'session_id': "s1", 'updated_at': str(i),
+                           'chat_history': [{'content': f"revision {i} {j}"} for j in range(3)]})
+
+    other = SemanticIndex(str(tmp_path), HashedNgramEmbedder(dim=32))
+    other.load()
+    assert other.dead_rows() == 0
+    assert other.sessions["s1"]['updated_at'] == "2"
+    assert other.search("revision 2 1")[0][0] == "s1"
+
+    index.remove_session("s1")
+    assert other.search("revision") == []
+
+
+def test_parallel_backfill_matches_serial(tmp_path):
+    serial = HistoryManager(history_dir=str(tmp_path / "serial"))
+    for i in range(5):
+        serial.save_session(make_session(f"topic number{i} about gardening"))
+    for name in os.listdir(str(tmp_path / "serial")):
+        if name.startswith(".semantic"):
+            os.remove(str(tmp_path / "serial" / name))
+
+    fresh = HistoryManager(history_dir=str(tmp_path / "serial"))
+    assert fresh.backfill_semantic_index(workers=2) == 5
+    parallel_hits = [(hit['session_id'], round(hit['score'], 4)) for hit in fresh.search_sessions("gardening", mode='semantic')]
+
+    for name in os.listdir(str(tmp_path / "serial")):
+        if name.startswith(".semantic"):
+            os.remove(str(tmp_path / "serial" / name))
+    again = HistoryManager(history_dir=str(tmp_path / "serial"))
+    assert again.backfill_semantic_index() == 5
+    serial_hits = [(hit['session_id'], round(hit['score'], 4)) for hit in again.search_sessions("gardening", mode='semantic')]
+
+    assert parallel_hits == serial_hits and len(serial_hits) == 5
+
+
+def test_semantic_results_page_with_cursor(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    for i in range(5):
+        manager.save_session(make_session(f"notes on machine learning part {i}"))
+
+    first = manager.search_sessions("machine learning", mode='semantic', limit=2)
+    rest = manager.search_sessions("machine learning", mode='semantic', limit=10, cursor=first.next_cursor)
+
+    everything = manager.search_sessions("machine learning", mode='semantic')
+    assert [hit['session_id'] for hit in list(first) + list(rest)] == [hit['session_id'] for hit in everything]
+
+
+def test_search_scores_blocks_and_skips_dead_rows(tmp_path):
+    index = SemanticIndex(str(tmp_path), HashedNgramEmbedder(dim=32))
+    index.QUERY_BLOCK_ROWS = 2
+    index.add_session({'session_id': "s1", 'updated_at': "1",
+                       'chat_history': [{'content': "volcano eruption"}, {'content': "ocean tides"}]})
+    index.add_session({'session_id': "s2", 'updated_at': "1",
+                       'chat_history': [{'content': "chess openings"}, {'content': "knight moves"},
+                                        {'content': "volcano lava"}]})
+    # Superseded rows stay in the matrix until compaction but never match
+    index.add_session({'session_id': "s1", 'updated_at': "2",
+                       'chat_history': [{'content': "garden roses"}, {'content': "ocean tides"}]})
+    assert index.dead_rows() == 2
+
+    hits = index.search("volcano")
+    assert [(session_key, message_index) for session_key, _, message_index in hits] == [("s2", 2)]
+    assert index.search("ocean tides")[0][::2] == ("s1", 1)
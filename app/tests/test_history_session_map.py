@@ -0,0 +1,88 @@
+"""
+Tests for the session_id -> file lookup of the JSON history backend
+"""
+
+import glob
+import json
+import os
+import sys
+
+import pytest
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_manager import HistoryManager
+from test_history_manager import make_session
+
+
+def test_find_session_does_not_glob(tmp_path, monkeypatch):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    session = make_session("lookup")
+    filepath = manager.save_session(session)
+    manager.list_sessions()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("unexpected directory glob")
+
+    monkeypatch.setattr(glob, 'glob', fail)
+    monkeypatch.setattr(manager.backend, 'scan', lambda: fail())
+    assert manager.find_existing_session_file(session['session_id']) == filepath
+    session['chat_history'].append({'role': 'user', 'content': "again", 'timestamp': "2025-07-11 12:05:00"})
+    assert manager.save_session(session) == filepath
+
+
+def test_map_is_rebuilt_when_files_change_behind_its_back(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    session = make_session("moved", session_id="moved")
+    filepath = manager.save_session(session)
+
+    renamed = os.path.join(str(tmp_path), "chat_20200101_000000_moved.json")
+    os.rename(filepath, renamed)
+    assert manager.find_existing_session_file("moved") == renamed
+
+    other = HistoryManager(history_dir=str(tmp_path))
+    assert other.find_existing_session_file("moved") == renamed
+
+
+def test_delete_all_session_files_uses_map(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    session = make_session("dup", session_id="dup")
+    manager.save_session(session)
+    copy = os.path.join(str(tmp_path), "chat_20200101_000000_dup.json")
+    with open(copy, 'w', encoding='utf-8') as f:
+        json.dump(dict(session, updated_at="2020-01-01 00:00:00"), f)
+
+    assert manager.delete_all_session_files("dup") == 2
+    assert manager.find_existing_session_file("dup") is None
+    assert manager.list_sessions() == []
+
+
+def test_none_session_files_are_given_an_id(tmp_path):
+    legacy = os.path.join(str(tmp_path), "chat_20250711_120000_None.json")
+    with open(legacy, 'w', encoding='utf-8') as f:
+        json.dump(dict(make_session("legacy"), title="legacy", updated_at="2025-07-11 12:00:00"), f)
+
+    manager = HistoryManager(history_dir=str(tmp_path))
+    sessions = manager.list_sessions()
+    assert len(sessions) == 1
+    session_id = sessions[0]['session_id']
+    assert session_id not in (None, "None")
+    assert sessions[0]['filename'] == f"chat_20250711_120000_{session_id}.json"
+    assert not os.path.exists(legacy)
+    assert [(c['op'], c['session_id']) for c in manager.changes_since(0)] == [('save', session_id)]
+
+    # Re-saving the loaded session updates the same file instead of creating another
+    loaded = manager.load_session(sessions[0]['filepath'])
+    assert manager.save_session(loaded) == sessions[0]['filepath']
+    assert len(manager.list_sessions()) == 1
+
+
+def test_sessions_without_id_are_never_written_as_none(tmp_path):
+    manager = HistoryManager(history_dir=str(tmp_path))
+    for session_id in (None, "", "None"):
+        filepath = manager.save_session(make_session("no id", session_id=session_id))
+        assert not filepath.endswith("_None.json")
+
+    with pytest.raises(ValueError):
+        manager.backend.write_session(make_session("no id"))
@@ -0,0 +1,78 @@
+"""
+Tests for the background write-behind session saver
+"""
+
+import os
+import sys
+import threading
+
+# Add the app directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_manager import HistoryManager
+from history_writer import SessionWriter
+from test_history_manager import make_session
+
+
+class CountingManager(HistoryManager):
+    """HistoryManager that records how often it actually writes"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writes = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def save_session(self, session_data):
+        self.gate.wait()
+        self.writes += 1
+        return super().save_session(session_data)
+
+
+def test_pending_saves_of_one_session_are_coalesced(tmp_path):
+    manager = CountingManager(history_dir=str(tmp_path))
+    writer = SessionWriter(manager, debounce=60)
+    session = make_session(session_id="coalesce1")
+    futures = []
+    for n in range(5):
+        payload = dict(session, chat_history=session['chat_history'] + [{'role': 'user', 'content': f"msg {n}"}])
+        futures.append(writer.submit(payload))
+
+    assert manager.writes == 0
+    assert writer.flush(timeout=5)
+    assert manager.writes == 1
+    filepath = futures[0].result()
+    assert all(future.result() == filepath for future in futures)
+    assert manager.load_session(filepath)['chat_history'][-1]['content'] == "msg 4"
+    writer.close()
+
+
+def test_submit_assigns_session_id_and_writes_after_debounce(tmp_path):
+    manager = CountingManager(history_dir=str(tmp_path))
+    writer = SessionWriter(manager, debounce=0.01)
+    session = make_session()
+    future = writer.submit(session)
+
+    assert session['session_id']
+    assert future.result(timeout=5).endswith(f"_{session['session_id']}.json")
+    writer.close()
+
+
+def test_bounded_queue_and_discard(tmp_path):
+    manager = CountingManager(history_dir=str(tmp_path))
+    writer = SessionWriter(manager, debounce=60, max_pending=2)
+    writer.submit(make_session("kept", session_id="kept0001"))
+    dropped = writer.submit(make_session("dropped", session_id="drop0001"))
+
+    blocked = threading.Thread(target=writer.submit, args=(make_session("third", session_id="third001"),))
+    blocked.start()
+    blocked.join(timeout=0.2)
+    assert blocked.is_alive()
+
+    assert writer.discard("drop0001")
+    blocked.join(timeout=5)
+    assert not blocked.is_alive()
+    assert dropped.cancelled()
+
+    writer.close()
+    assert sorted(s['title'] for s in manager.list_sessions()) == ["kept", "third"]